@@ -14,30 +14,35 @@ PARSING_SITES = {
         "name": "Куфар - Jawa (Беларусь)",
         "base_url": "https://auto.kufar.by",
         "search_url": "https://auto.kufar.by/l/motocikl?brn=264&cur=BYR&ot=1&query=%D1%8F%D0%B2%D0%B0&sort=lst.d",
+        "strategy": "next_data",  # JSON выдачи из __NEXT_DATA__, селекторы - запасной путь
         "selectors": {
             "items": "article[data-testid='listing-item']",
             "title": "h3[data-testid='listing-title']",
             "price": "span[data-testid='listing-price']",
             "link": "a[data-testid='listing-link']",
             "image": "img[data-testid='listing-image']",
+            "next_page": "a[data-testid*='pagination-next']",
         },
     },
     "kufar_cezet": {
         "name": "Куфар - Cezet (Беларусь)",
         "base_url": "https://auto.kufar.by",
         "search_url": "https://auto.kufar.by/l/motocikl-cezet?cur=BYR&ot=1&query=%D1%8F%D0%B2%D0%B0&sort=lst.d",
+        "strategy": "next_data",
         "selectors": {
             "items": "article[data-testid='listing-item']",
             "title": "h3[data-testid='listing-title']",
             "price": "span[data-testid='listing-price']",
             "link": "a[data-testid='listing-link']",
             "image": "img[data-testid='listing-image']",
+            "next_page": "a[data-testid*='pagination-next']",
         },
     },
     "av_by_jawa": {
         "name": "AV.by - Jawa (Беларусь)",
         "base_url": "https://moto.av.by",
         "search_url": "https://moto.av.by/bike/jawa",
+        "page_param": "page",
         "selectors": {
             "items": ".listing-item",
             "title": ".listing-item__title",
@@ -50,6 +55,7 @@ PARSING_SITES = {
         "name": "AV.by - Cezet (Беларусь)",
         "base_url": "https://moto.av.by",
         "search_url": "https://moto.av.by/bike/cezet",
+        "page_param": "page",
         "selectors": {
             "items": ".listing-item",
             "title": ".listing-item__title",
@@ -62,6 +68,7 @@ PARSING_SITES = {
         "name": "abw.by (Беларусь)",
         "base_url": "https://abw.by",
         "search_url": "https://abw.by/moto/brand_jawa",
+        "page_param": "page",
         "selectors": {
             "items": ".catalog-item",
             "title": ".catalog-item__title",
@@ -99,9 +106,63 @@ SEARCH_KEYWORDS = [
 ]
 
 # Настройки парсинга
-PARSING_INTERVAL = 30  # минуты
-MAX_ITEMS_PER_SITE = 20
-REQUEST_DELAY = 2  # секунды между запросами
+PARSING_INTERVAL = 30  # минуты, начальный интервал опроса каждого сайта
+POLL_MIN_INTERVAL = 10  # минуты, минимальный интервал опроса сайта
+POLL_MAX_INTERVAL = 120  # минуты, максимальный интервал опроса сайта
+POLL_BUDGET_PER_HOUR = 10  # опросов всех сайтов в час суммарно
+POLL_TARGET_EVENTS = 1.0  # ожидаемых новых объявлений за один опрос
+POLL_SMOOTHING = 0.3  # вес нового наблюдения в оценке активности сайта
+MAX_ITEMS_PER_SITE = 20  # объявлений с сайта при разборе без обхода страниц
+MAX_PAGES_PER_SITE = 5  # страниц за обычный цикл (обход останавливается раньше)
+BACKFILL_MAX_PAGES = 50  # страниц при разовой глубокой загрузке
+REQUEST_DELAY = 2  # секунды между запросами к одному хосту
+REQUEST_TIMEOUT = 30  # секунды на один запрос (максимум)
+MIN_REQUEST_TIMEOUT = 5  # секунды, нижняя граница адаптивного таймаута
+TIMEOUT_LATENCY_FACTOR = 3  # таймаут = p95 задержки хоста * множитель
+FETCH_RETRIES = 2  # повторов запроса при сетевых ошибках, 429 и 5xx
+RETRY_BACKOFF_BASE = 1.0  # секунды, база экспоненциальной задержки повтора
+RETRY_BACKOFF_MAX = 10.0  # секунды, максимальная задержка повтора
+BREAKER_FAILURE_THRESHOLD = 3  # ошибок подряд до отключения хоста
+BREAKER_OPEN_SECONDS = 300  # на сколько отключается хост
+HEALTH_LATENCY_WINDOW = 50  # последних запросов для оценки задержек
+HEALTH_MIN_SAMPLES = 5  # запросов до перехода на адаптивный таймаут
+HEALTH_SMOOTHING = 0.2  # вес нового запроса в доле ошибок
+PIPELINE_QUEUE_SIZE = 4  # страниц в очереди между загрузкой и сохранением
+HTML_BACKEND = "lxml"  # "lxml" или "html.parser"
+DETAILS_WORKERS = 4  # потоков для загрузки страниц объявлений
+DETAILS_PER_HOST = 2  # одновременных запросов деталей к одному хосту
+DETAILS_CACHE_SIZE = 1000  # URL в кеше деталей
+SEARCH_FRESHNESS_MINUTES = 60  # /search перепарсит сайт, если данные старше
+SEARCH_CANDIDATES = 200  # сколько самых свежих совпадений ранжировать при поиске
+SEARCH_RECENCY_WEIGHT = 0.5  # штраф к bm25 за каждый день возраста объявления
+
+# Курсы валют для фильтра по цене (НБРБ)
+EXCHANGE_RATES_URL = "https://api.nbrb.by/exrates/rates?periodicity=0"
+EXCHANGE_RATE_CURRENCIES = ("USD", "EUR")  # валюты цен, кроме BYN
+EXCHANGE_RATES_REFRESH_HOURS = 12  # как часто обновлять курсы
 
 # Настройки базы данных
 DATABASE_PATH = "motorcycle_ads.db"
+HTTP_CACHE_PATH = "http_cache.db"  # кеш страниц для условных запросов
+DB_BUSY_TIMEOUT = 30  # ожидание блокировки записи (секунды)
+DB_CACHE_SIZE_KB = 16384  # страничный кеш SQLite на соединение (КБ)
+DB_MMAP_SIZE = 256 * 1024 * 1024  # отображение файла базы в память (байты)
+DB_CACHED_STATEMENTS = 256  # подготовленные запросы, переиспользуемые соединением
+DB_READER_THREADS = 4  # потоков чтения у обработчиков бота (запись - один поток)
+ADS_PAGE_SIZE = 10  # объявлений на странице /latest и /sites
+STATS_DAYS = 7  # дней в разбивке новых объявлений по дням (/stats)
+AD_CACHE_SIZE = 1000  # объявлений в кеше карточек (get_advertisement)
+SIMHASH_MAX_DISTANCE = 3  # битов различия отпечатков у одного объявления на разных сайтах
+CLUSTER_PRICE_TOLERANCE = 0.1  # допустимая разница цен повторов (доля)
+CLUSTER_MAX_CANDIDATES = 100  # кандидатов в повторы, проверяемых для объявления
+AD_STATE_CACHE_SIZE = 20000  # объявлений в кеше последних цен и заголовков
+PRICE_DROPS_HOURS = 24  # за сколько часов показывать снижения цен (/drops)
+
+# Хранение и архив старых объявлений
+RETENTION_DAYS = 30  # объявления старше удаляются (после архивирования)
+RETENTION_INTERVAL_HOURS = 24  # как часто запускать очистку
+RETENTION_BATCH_SIZE = 500  # объявлений в одной транзакции удаления
+RETENTION_PAUSE = 0.05  # секунды между пачками: запись не блокируется надолго
+RETENTION_VACUUM_PAGES = 1000  # страниц, возвращаемых за один шаг incremental_vacuum
+ARCHIVE_DIR = "archive"  # файлы архива по дням: ГГГГ-ММ-ДД.jsonl.zst (.jsonl.gz)
+ARCHIVE_ZSTD_LEVEL = 10  # уровень сжатия zstd
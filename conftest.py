@@ -0,0 +1,78 @@
+"""
+Общие помощники тестов: временная база данных и примеры объявлений.
+
+Модуль подхватывается pytest, а ``main()`` тестовых файлов импортирует
+его напрямую (``from conftest import with_database``).
+"""
+
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import Database
+
+# Семь разных объявлений для тестов лент и прочитанного
+SAMPLE_TITLES = [
+    "Jawa 350", "CZ 175", "Ява 638", "Чезет 472", "Jawa 634", "CZ 125", "Ява 640"
+]
+
+
+def add_sample_ads(db: Database):
+    """Семь разных объявлений: объявление i добавлено в 2024-01-0i,
+    кроме второго - оно самое свежее.
+    """
+    db.add_advertisements_batch(
+        [
+            {
+                "site_name": "Куфар" if number % 2 else "AV.by",
+                "title": title,
+                "price": f"{number * 100} р.",
+                "link": f"https://example.com/ad/{number}",
+            }
+            for number, title in enumerate(SAMPLE_TITLES, 1)
+        ]
+    )
+    with db._connection() as conn:
+        conn.execute(
+            "UPDATE advertisements SET created_at = "
+            "CASE id WHEN 2 THEN '2024-01-09 00:00:00' "
+            "ELSE '2024-01-0' || id || ' 00:00:00' END"
+        )
+    db.row_cache.clear()
+
+
+@contextmanager
+def temp_database() -> Iterator[Database]:
+    """Пустая база во временном каталоге, закрывается и удаляется после"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "test.db"))
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+def with_database(test: Optional[Callable] = None, *, setup: Optional[Callable] = None):
+    """Запуск теста ``test(db)`` на временной базе как ``test()``.
+
+    ``setup(db)`` заполняет базу перед тестом. Применяется как
+    ``@with_database`` или ``@with_database(setup=...)``.
+    """
+
+    def decorate(test: Callable) -> Callable:
+        def run():
+            with temp_database() as db:
+                if setup is not None:
+                    setup(db)
+                test(db)
+
+        # Без functools.wraps: pytest по __wrapped__ искал бы фикстуру db
+        run.__name__ = test.__name__
+        run.__doc__ = test.__doc__
+        return run
+
+    return decorate if test is None else decorate(test)
@@ -1,34 +1,471 @@
+import hashlib
+import math
+import re
 import sqlite3
-from typing import Dict, List
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
 
 import config
+from prices import parse_price
+from simhash import (
+    BAND_BITS,
+    BAND_MASK,
+    SIMHASH_BANDS,
+    band_values,
+    hamming_distance,
+    simhash,
+)
+
+# Колонки, добавленные в advertisements после первой версии схемы
+ADVERTISEMENT_EXTRA_COLUMNS = {
+    "keywords": "TEXT",
+    "year": "TEXT",
+    "mileage": "TEXT",
+    "condition": "TEXT",
+    "details_fetched_at": "TIMESTAMP",
+    "external_id": "TEXT",
+    "price_minor": "INTEGER",
+    "price_currency": "TEXT",
+    "simhash": "INTEGER",
+    "cluster_id": "INTEGER",
+}
+
+# Значения user_settings по умолчанию: фильтр по цене не задан
+DEFAULT_MIN_PRICE = 0
+DEFAULT_MAX_PRICE = 999999
+
+# Не больше параметров в одном IN (...), чем допускает SQLite
+BATCH_CHUNK_SIZE = 500
+
+# Таблица объявлений; ident - идентичность объявления (``ad_identity``)
+ADVERTISEMENTS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        site_name TEXT NOT NULL,
+        title TEXT NOT NULL,
+        price TEXT,
+        link TEXT NOT NULL,
+        image_url TEXT,
+        description TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        is_new BOOLEAN DEFAULT TRUE,
+        keywords TEXT,
+        year TEXT,
+        mileage TEXT,
+        condition TEXT,
+        details_fetched_at TIMESTAMP,
+        external_id TEXT,
+        price_minor INTEGER,
+        price_currency TEXT,
+        simhash INTEGER,
+        cluster_id INTEGER,
+        ident BLOB NOT NULL UNIQUE
+    )
+"""
+
+INSERT_ADVERTISEMENT_SQL = """
+    INSERT OR IGNORE INTO advertisements
+    (site_name, title, price, link, image_url, description, keywords,
+     external_id, price_minor, price_currency, ident, simhash, cluster_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+# Написания марок, которые при поиске считаются одним словом
+SEARCH_SYNONYMS = [
+    (re.compile(r"\bяв(?:а|ы|у|е|ой|ою)\b"), "jawa"),
+    (re.compile(r"\b(?:чезет\w*|cezet)\b"), "cz"),
+]
+SEARCH_TOKEN_RE = re.compile(r"\w+")
+# Вес совпадения в заголовке относительно описания при ранжировании
+SEARCH_TITLE_WEIGHT = 2.0
+
+
+def normalize_search_text(text: Optional[str]) -> str:
+    """Текст для полнотекстового индекса и запросов.
+
+    Регистр и ё/е не различаются, «ява» превращается в ``jawa``,
+    «чезет» и ``cezet`` - в ``cz``.
+    """
+    if not text:
+        return ""
+    text = text.casefold().replace("ё", "е")
+    for pattern, replacement in SEARCH_SYNONYMS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+# Слова, которыми копии одного объявления обычно и отличаются
+FINGERPRINT_STOP_WORDS = {
+    "в", "на", "и", "с", "г", "год", "года", "гв", "продам", "продаю", "срочно", "торг",
+}
+
+
+def ad_fingerprint(title: Optional[str], description: Optional[str]) -> int:
+    """SimHash нормализованных слов заголовка (с двойным весом) и описания"""
+
+    def words(text: Optional[str]) -> List[str]:
+        return [
+            word
+            for word in SEARCH_TOKEN_RE.findall(normalize_search_text(text))
+            if word not in FINGERPRINT_STOP_WORDS
+        ]
+
+    return simhash(words(title) * 2 + words(description))
+
+
+# Параметры ссылки, которые не меняют само объявление (метки переходов)
+TRACKING_PARAM_RE = re.compile(r"^(?:utm_\w+|rank|searchid|fbclid|gclid)$", re.IGNORECASE)
+
+# Размер идентичности объявления в байтах
+AD_IDENT_SIZE = 16
+
+
+def canonical_ad_key(link: str) -> str:
+    """Каноническая запись объявления: нормализованная ссылка без меток.
+
+    Не зависит от названия сайта в конфиге, от заголовка и от того,
+    как объявление извлечено со страницы (встроенные данные Куфара или
+    CSS-селекторы), поэтому одно объявление из разных поисковых запросов
+    (kufar_jawa и kufar_cezet) и после правки заголовка остается тем же.
+    """
+    parts = urlsplit(link.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+
+    query = sorted(
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not TRACKING_PARAM_RE.match(name)
+    )
+    key = host + (parts.path.rstrip("/") or "/")
+    if query:
+        key += "?" + urlencode(query)
+    return key
+
+
+def ad_identity(ad_data: Dict) -> bytes:
+    """Идентичность объявления - blake2b-хеш канонической записи"""
+    key = canonical_ad_key(ad_data["link"])
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=AD_IDENT_SIZE).digest()
+
+
+class RowCache:
+    """LRU-кеш строк объявлений по id.
+
+    Один кеш на файл базы (``row_cache``), поэтому изменения через любой
+    экземпляр ``Database`` сбрасывают устаревшие строки для всех.
+    """
+
+    def __init__(self, maxsize: int = config.AD_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._rows: "OrderedDict[int, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, ad_id: int) -> Optional[Dict]:
+        with self._lock:
+            row = self._rows.get(ad_id)
+            if row is None:
+                return None
+            self._rows.move_to_end(ad_id)
+            return dict(row)
+
+    def put(self, ad_id: int, row: Dict):
+        with self._lock:
+            self._rows[ad_id] = dict(row)
+            self._rows.move_to_end(ad_id)
+            if len(self._rows) > self.maxsize:
+                self._rows.popitem(last=False)
+
+    def invalidate(self, ad_id: int):
+        with self._lock:
+            self._rows.pop(ad_id, None)
+
+    def invalidate_where(self, predicate: Callable[[Dict], bool]):
+        """Сброс всех строк, для которых ``predicate`` истинен"""
+        with self._lock:
+            for ad_id in [ad_id for ad_id, row in self._rows.items() if predicate(row)]:
+                del self._rows[ad_id]
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+
+
+# Последнее известное состояние объявления: (id, заголовок, price_minor, price_currency)
+AdState = Tuple[int, str, Optional[int], Optional[str]]
+
+
+class AdStateCache:
+    """LRU-кеш последнего известного состояния объявлений по ident.
+
+    Повторно увиденное объявление сравнивается с ним без обращения
+    к базе; в базу идут только объявления не из кеша и изменения.
+    """
+
+    def __init__(self, maxsize: int = config.AD_STATE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._states: "OrderedDict[bytes, AdState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, ident: bytes) -> Optional[AdState]:
+        with self._lock:
+            state = self._states.get(ident)
+            if state is not None:
+                self._states.move_to_end(ident)
+            return state
+
+    def put(self, ident: bytes, state: AdState):
+        with self._lock:
+            self._states[ident] = state
+            self._states.move_to_end(ident)
+            if len(self._states) > self.maxsize:
+                self._states.popitem(last=False)
+
+    def invalidate_where(self, predicate: Callable[[AdState], bool]):
+        """Сброс всех состояний, для которых ``predicate`` истинен"""
+        with self._lock:
+            for ident in [ident for ident, state in self._states.items() if predicate(state)]:
+                del self._states[ident]
+
+    def clear(self):
+        with self._lock:
+            self._states.clear()
+
+
+# Кандидат в повторы: (id, cluster_id, simhash, site_name, цена в BYN)
+ClusterCandidate = Tuple[int, int, int, str, Optional[float]]
+
+
+class ClusterIndex:
+    """Поиск кластеров для пачки новых объявлений.
+
+    Кандидаты по всем полосам отпечатков пачки читаются из
+    ``ad_simhash_bands`` заранее, несколькими запросами на пачку,
+    а не запросом на каждое объявление. Объявления, добавленные в этой
+    же пачке, дописываются в индекс в памяти (``add``). Для каждого
+    значения полосы берутся ``CLUSTER_MAX_CANDIDATES`` самых новых
+    объявлений.
+    """
+
+    def __init__(self, cursor, rates: Dict[str, float], fingerprints: Iterable[int]):
+        self.rates = rates
+        self._bands: Dict[Tuple[int, int], List[ClusterCandidate]] = {}
+
+        keys = list({key for fingerprint in fingerprints for key in band_values(fingerprint)})
+        for i in range(0, len(keys), BATCH_CHUNK_SIZE):
+            chunk = keys[i : i + BATCH_CHUNK_SIZE]
+            values = ", ".join("(?, ?)" for _ in chunk)
+            cursor.execute(
+                f"""
+                WITH wanted (band, value) AS (VALUES {values}),
+                ranked AS (
+                    SELECT b.band, b.value, b.ad_id, ROW_NUMBER() OVER (
+                        PARTITION BY b.band, b.value ORDER BY b.ad_id DESC
+                    ) AS position
+                    FROM wanted w
+                    JOIN ad_simhash_bands b ON b.band = w.band AND b.value = w.value
+                )
+                SELECT r.band, r.value, a.id, a.cluster_id, a.simhash, a.site_name,
+                       a.price_minor, a.price_currency
+                FROM ranked r
+                JOIN advertisements a ON a.id = r.ad_id
+                WHERE r.position <= ?
+            """,
+                [*(part for key in chunk for part in key), config.CLUSTER_MAX_CANDIDATES],
+            )
+            for band, value, ad_id, cluster_id, fingerprint, site_name, *price in cursor:
+                self._bands.setdefault((band, value), []).append(
+                    (ad_id, cluster_id, fingerprint, site_name, self._price_in_byn(*price))
+                )
+
+    def find(
+        self,
+        fingerprint: int,
+        site_name: str,
+        price_minor: Optional[int],
+        price_currency: Optional[str],
+    ) -> Optional[int]:
+        """Кластер самого похожего объявления или None.
+
+        Похожим считается объявление с другого сайта, отличающееся не
+        больше чем на ``SIMHASH_MAX_DISTANCE`` битов, с известной ценой
+        в пределах ``CLUSTER_PRICE_TOLERANCE``. Из нескольких выбирается
+        ближайшее по отпечатку, при равенстве - самое раннее.
+        """
+        price = self._price_in_byn(price_minor, price_currency)
+        if price is None:
+            return None
+
+        best = None
+        for key in band_values(fingerprint):
+            for ad_id, cluster_id, other_fingerprint, other_site, other_price in (
+                self._bands.get(key, ())
+            ):
+                if other_site == site_name or other_price is None:
+                    continue
+                if abs(price - other_price) > config.CLUSTER_PRICE_TOLERANCE * max(
+                    price, other_price
+                ):
+                    continue
+                distance = hamming_distance(fingerprint, other_fingerprint)
+                if distance > config.SIMHASH_MAX_DISTANCE:
+                    continue
+                if best is None or (distance, ad_id) < best[:2]:
+                    best = (distance, ad_id, cluster_id)
+
+        return best[2] if best else None
+
+    def add(
+        self,
+        ad_id: int,
+        cluster_id: int,
+        fingerprint: int,
+        site_name: str,
+        price_minor: Optional[int],
+        price_currency: Optional[str],
+    ):
+        """Объявление, добавленное в базу в этой пачке"""
+        candidate = (
+            ad_id,
+            cluster_id,
+            fingerprint,
+            site_name,
+            self._price_in_byn(price_minor, price_currency),
+        )
+        for key in band_values(fingerprint):
+            self._bands.setdefault(key, []).append(candidate)
+
+    def _price_in_byn(
+        self, price_minor: Optional[int], price_currency: Optional[str]
+    ) -> Optional[float]:
+        """Цена в BYN или None, если цена или курс неизвестны"""
+        if price_minor is None or price_currency not in self.rates:
+            return None
+        return price_minor * self.rates[price_currency] / 100
+
+
+_shared_caches: Dict[Tuple[type, str], object] = {}
+_shared_caches_lock = threading.Lock()
+
+
+def _shared_cache(cache_class: type, db_path: str):
+    with _shared_caches_lock:
+        cache = _shared_caches.get((cache_class, db_path))
+        if cache is None:
+            cache = _shared_caches[(cache_class, db_path)] = cache_class()
+        return cache
+
+
+def row_cache(db_path: str) -> RowCache:
+    """Общий кеш строк для файла базы"""
+    return _shared_cache(RowCache, db_path)
+
+
+def ad_state_cache(db_path: str) -> AdStateCache:
+    """Общий кеш состояний объявлений для файла базы"""
+    return _shared_cache(AdStateCache, db_path)
 
 
 class Database:
+    """Хранилище объявлений в SQLite.
+
+    Каждый поток работает через свое постоянное соединение, открытое один
+    раз. База переводится в режим WAL, поэтому чтение не ждет записи,
+    а подготовленные запросы переиспользуются соединением.
+    """
+
     def __init__(self, db_path: str = config.DATABASE_PATH):
         self.db_path = db_path
+        self._local = threading.local()
+        self.row_cache = row_cache(db_path)
+        self.state_cache = ad_state_cache(db_path)
         self.init_database()
 
+    def _connection(self) -> sqlite3.Connection:
+        """Соединение текущего потока (открывается при первом обращении)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=config.DB_BUSY_TIMEOUT,
+                cached_statements=config.DB_CACHED_STATEMENTS,
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute(f"PRAGMA mmap_size = {int(config.DB_MMAP_SIZE)}")
+            conn.execute(f"PRAGMA cache_size = -{int(config.DB_CACHE_SIZE_KB)}")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Закрытие соединения текущего потока"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
     def init_database(self):
         """Инициализация базы данных и создание таблиц"""
-        with sqlite3.connect(self.db_path) as conn:
+        self._enable_incremental_vacuum()
+
+        with self._connection() as conn:
             cursor = conn.cursor()
 
             # Таблица для объявлений
+            cursor.execute(ADVERTISEMENTS_TABLE_SQL.format(table="advertisements"))
+
+            added = self._add_missing_columns(
+                cursor, "advertisements", ADVERTISEMENT_EXTRA_COLUMNS
+            )
+            if "price_minor" in added:
+                self._fill_prices(cursor)
+            # "Договорная" на Куфаре раньше сохранялась как нулевая цена
             cursor.execute("""
-                CREATE TABLE IF NOT EXISTS advertisements (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    site_name TEXT NOT NULL,
-                    title TEXT NOT NULL,
-                    price TEXT,
-                    link TEXT NOT NULL,
-                    image_url TEXT,
-                    description TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    is_new BOOLEAN DEFAULT TRUE,
-                    hash TEXT UNIQUE
-                )
+                UPDATE advertisements SET price_minor = NULL, price_currency = NULL
+                WHERE price_minor = 0
+            """)
+
+            rebuilt = self._migrate_to_ident(cursor)
+
+            # Индексы под выборки новых объявлений, объявлений сайта и очистку
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_ads_is_new_created
+                ON advertisements (is_new, created_at)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_ads_site_created
+                ON advertisements (site_name, created_at)
             """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_ads_created
+                ON advertisements (created_at)
+            """)
+            # Лента упорядочена по дате, поэтому фильтр по цене проверяется
+            # при обходе idx_ads_created: индекс по цене отдавал бы строки
+            # не в том порядке и требовал сортировки всего диапазона цен
+            cursor.execute("DROP INDEX IF EXISTS idx_ads_price")
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_ads_cluster
+                ON advertisements (cluster_id)
+            """)
+
+            self._init_clusters(cursor)
+
+            self._init_search_index(cursor)
+            self._init_statistics(cursor)
+
+            if rebuilt:
+                # Слитые повторы ушли из таблицы без триггеров удаления
+                cursor.execute("""
+                    DELETE FROM advertisements_fts
+                    WHERE rowid NOT IN (SELECT id FROM advertisements)
+                """)
+                self._recount_statistics(cursor)
 
             # Таблица для настроек пользователей
             cursor.execute("""
@@ -41,44 +478,706 @@ class Database:
                 )
             """)
 
+            # Курсы валют: рублей BYN за единицу валюты
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS exchange_rates (
+                    currency TEXT PRIMARY KEY,
+                    rate REAL NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            # Граница прочитанного для каждого пользователя: объявления
+            # с id больше last_seen_id для него новые
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS user_read_state (
+                    user_id INTEGER PRIMARY KEY,
+                    last_seen_id INTEGER NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+
+            # Время последнего успешного парсинга каждого сайта
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS site_status (
+                    site_key TEXT PRIMARY KEY,
+                    last_parsed_at TIMESTAMP
+                )
+            """)
+
+            self._init_observations(cursor)
+            self._rekey_by_link(cursor)
+
+            # Кластеры считаются по курсам валют, поэтому после их таблицы
+            if "cluster_id" in added or rebuilt:
+                self._fill_clusters(cursor)
+
             conn.commit()
 
+    def _init_statistics(self, cursor):
+        """Счетчики объявлений, которые триггеры обновляют при каждой записи.
+
+        ``site_stats`` - всего и новых объявлений по сайтам, ``daily_stats`` -
+        сколько объявлений добавлено за день на каждом сайте (при удалении
+        старых объявлений история по дням сохраняется).
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'site_stats'")
+        exists = cursor.fetchone() is not None
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS site_stats (
+                site_name TEXT PRIMARY KEY,
+                total INTEGER NOT NULL DEFAULT 0,
+                new INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS daily_stats (
+                day TEXT NOT NULL,
+                site_name TEXT NOT NULL,
+                added INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, site_name)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS advertisements_stats_insert
+            AFTER INSERT ON advertisements BEGIN
+                INSERT INTO site_stats (site_name, total, new)
+                VALUES (new.site_name, 1, CASE WHEN new.is_new THEN 1 ELSE 0 END)
+                ON CONFLICT(site_name) DO UPDATE SET
+                    total = total + 1,
+                    new = new + excluded.new;
+                INSERT INTO daily_stats (day, site_name, added)
+                VALUES (date(new.created_at), new.site_name, 1)
+                ON CONFLICT(day, site_name) DO UPDATE SET added = added + 1;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS advertisements_stats_update
+            AFTER UPDATE OF is_new ON advertisements BEGIN
+                UPDATE site_stats
+                SET new = new
+                    + CASE WHEN new.is_new THEN 1 ELSE 0 END
+                    - CASE WHEN old.is_new THEN 1 ELSE 0 END
+                WHERE site_name = new.site_name;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS advertisements_stats_delete
+            AFTER DELETE ON advertisements BEGIN
+                UPDATE site_stats
+                SET total = total - 1,
+                    new = new - CASE WHEN old.is_new THEN 1 ELSE 0 END
+                WHERE site_name = old.site_name;
+            END
+        """)
+
+        if not exists:
+            self._recount_statistics(cursor)
+
+    def _enable_incremental_vacuum(self):
+        """Режим auto_vacuum = INCREMENTAL: место от удаленных объявлений
+        можно вернуть файловой системе (``incremental_vacuum``).
+
+        У существующего файла режим меняется только полным VACUUM, он
+        выполняется один раз.
+        """
+        conn = self._connection()
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:  # INCREMENTAL
+            return
+        print("Перевод базы в режим incremental auto_vacuum...")
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+
+    @staticmethod
+    def _init_observations(cursor):
+        """История изменений объявлений: строка только при изменении.
+
+        В строке - новые значения изменившихся полей (остальные NULL)
+        и ``price_change`` - разница цен в минимальных единицах, если
+        валюта та же. Частичный индекс покрывает только снижения цены.
+        """
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ad_observations (
+                ad_id INTEGER NOT NULL,
+                observed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                title TEXT,
+                price TEXT,
+                price_minor INTEGER,
+                price_currency TEXT,
+                price_change INTEGER,
+                PRIMARY KEY (ad_id, observed_at)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_observations_drops
+            ON ad_observations (observed_at)
+            WHERE price_change < 0
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS advertisements_observations_delete
+            AFTER DELETE ON advertisements BEGIN
+                DELETE FROM ad_observations WHERE ad_id = old.id;
+            END
+        """)
+
+    @staticmethod
+    def _init_clusters(cursor):
+        """Полосы SimHash объявлений для поиска почти одинаковых.
+
+        Строка на каждую полосу отпечатка; триггер удаляет полосы вместе
+        с объявлением.
+        """
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ad_simhash_bands (
+                band INTEGER NOT NULL,
+                value INTEGER NOT NULL,
+                ad_id INTEGER NOT NULL,
+                PRIMARY KEY (band, value, ad_id)
+            ) WITHOUT ROWID
+        """)
+        deletes = "\n".join(
+            f"""
+                DELETE FROM ad_simhash_bands
+                WHERE band = {band}
+                    AND value = (old.simhash >> {band * BAND_BITS}) & {BAND_MASK}
+                    AND ad_id = old.id;"""
+            for band in range(SIMHASH_BANDS)
+        )
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS advertisements_clusters_delete
+            AFTER DELETE ON advertisements BEGIN{deletes}
+            END
+        """)
+
+    def _fill_clusters(self, cursor):
+        """Отпечатки и кластеры для объявлений, сохраненных до их появления"""
+        print("Поиск повторов среди сохраненных объявлений...")
+        cursor.execute("DELETE FROM ad_simhash_bands")
+        cursor.execute("""
+            SELECT id, site_name, title, description, price_minor, price_currency
+            FROM advertisements
+            ORDER BY id
+        """)
+        rows = cursor.fetchall()
+        # Полосы пустые: все кандидаты - уже обработанные объявления в памяти
+        clusters = ClusterIndex(cursor, self._exchange_rates(cursor), [])
+        for ad_id, site_name, title, description, *price in rows:
+            fingerprint = ad_fingerprint(title, description)
+            cluster_id = clusters.find(fingerprint, site_name, *price) or ad_id
+            cursor.execute(
+                "UPDATE advertisements SET simhash = ?, cluster_id = ? WHERE id = ?",
+                (fingerprint, cluster_id, ad_id),
+            )
+            self._add_bands(cursor, ad_id, fingerprint)
+            clusters.add(ad_id, cluster_id, fingerprint, site_name, *price)
+
+    @staticmethod
+    def _add_bands(cursor, ad_id: int, fingerprint: int):
+        cursor.executemany(
+            "INSERT OR IGNORE INTO ad_simhash_bands (band, value, ad_id) VALUES (?, ?, ?)",
+            [(band, value, ad_id) for band, value in band_values(fingerprint)],
+        )
+
+    @staticmethod
+    def _remove_bands(cursor, ad_id: int, fingerprint: int):
+        cursor.executemany(
+            "DELETE FROM ad_simhash_bands WHERE band = ? AND value = ? AND ad_id = ?",
+            [(band, value, ad_id) for band, value in band_values(fingerprint)],
+        )
+
+    def _reindex_title(self, cursor, ad_id: int):
+        """Полнотекстовый индекс, отпечаток и полосы после смены заголовка.
+
+        Кластер объявления не меняется: по новому отпечатку к нему
+        находятся следующие объявления.
+        """
+        cursor.execute(
+            "SELECT title, description, simhash FROM advertisements WHERE id = ?",
+            (ad_id,),
+        )
+        title, description, old_fingerprint = cursor.fetchone()
+        self._index_for_search(cursor, ad_id, title, description)
+
+        fingerprint = ad_fingerprint(title, description)
+        if fingerprint == old_fingerprint:
+            return
+        if old_fingerprint is not None:
+            self._remove_bands(cursor, ad_id, old_fingerprint)
+        cursor.execute(
+            "UPDATE advertisements SET simhash = ? WHERE id = ?", (fingerprint, ad_id)
+        )
+        self._add_bands(cursor, ad_id, fingerprint)
+
+    @staticmethod
+    def _recount_statistics(cursor):
+        """Пересчет счетчиков по самим объявлениям"""
+        cursor.execute("DELETE FROM site_stats")
+        cursor.execute("""
+            INSERT INTO site_stats (site_name, total, new)
+            SELECT site_name, COUNT(*), SUM(CASE WHEN is_new THEN 1 ELSE 0 END)
+            FROM advertisements
+            GROUP BY site_name
+        """)
+        cursor.execute("DELETE FROM daily_stats")
+        cursor.execute("""
+            INSERT INTO daily_stats (day, site_name, added)
+            SELECT date(created_at), site_name, COUNT(*)
+            FROM advertisements
+            GROUP BY date(created_at), site_name
+        """)
+
+    def recompute_statistics(self):
+        """Точный пересчет статистики (читает всю таблицу объявлений).
+
+        Дни, объявления которых уже удалены очисткой, из разбивки пропадут.
+        """
+        with self._connection() as conn:
+            self._recount_statistics(conn.cursor())
+
+    @staticmethod
+    def _init_search_index(cursor):
+        """Полнотекстовый индекс объявлений (FTS5).
+
+        В индекс попадает нормализованный текст (``normalize_search_text``),
+        rowid совпадает с id объявления. Строки индекса пишутся из Python
+        в той же транзакции, что и объявление (``_index_for_search``):
+        триггеры с функцией нормализации работали бы только в соединениях,
+        где она зарегистрирована. Триггер удаления функции не требует.
+        """
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'advertisements_fts'"
+        )
+        exists = cursor.fetchone() is not None
+
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS advertisements_fts
+            USING fts5(title, description)
+        """)
+        # Триггеры прежних версий вызывали normalize_search()
+        cursor.execute("DROP TRIGGER IF EXISTS advertisements_fts_insert")
+        cursor.execute("DROP TRIGGER IF EXISTS advertisements_fts_update")
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS advertisements_fts_delete
+            AFTER DELETE ON advertisements BEGIN
+                DELETE FROM advertisements_fts WHERE rowid = old.id;
+            END
+        """)
+
+        if not exists:
+            # Объявления, сохраненные до появления индекса
+            cursor.execute("SELECT id, title, description FROM advertisements")
+            cursor.executemany(
+                "INSERT INTO advertisements_fts (rowid, title, description) VALUES (?, ?, ?)",
+                [
+                    (ad_id, normalize_search_text(title), normalize_search_text(description))
+                    for ad_id, title, description in cursor.fetchall()
+                ],
+            )
+
+    @staticmethod
+    def _index_for_search(
+        cursor, ad_id: int, title: Optional[str], description: Optional[str]
+    ):
+        """Запись нормализованного текста объявления в полнотекстовый индекс"""
+        cursor.execute(
+            "DELETE FROM advertisements_fts WHERE rowid = ?", (ad_id,)
+        )
+        cursor.execute(
+            "INSERT INTO advertisements_fts (rowid, title, description) VALUES (?, ?, ?)",
+            (ad_id, normalize_search_text(title), normalize_search_text(description)),
+        )
+
+    @staticmethod
+    def _add_missing_columns(cursor, table: str, columns: Dict[str, str]) -> List[str]:
+        """Добавление в существующую таблицу недостающих колонок"""
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing = {row[1] for row in cursor.fetchall()}
+
+        added = []
+        for name, column_type in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+                added.append(name)
+        return added
+
+    @staticmethod
+    def _migrate_to_ident(cursor) -> bool:
+        """Перестройка таблицы со старым текстовым ``hash`` на ``ident``.
+
+        Повторы одного объявления (например, с kufar_jawa и kufar_cezet)
+        сливаются: остается самая ранняя запись. Возвращает True, если
+        таблица перестроена.
+        """
+        cursor.execute("PRAGMA table_info(advertisements)")
+        columns = [row[1] for row in cursor.fetchall()]
+        if "hash" not in columns:
+            return False
+
+        print("Перестройка таблицы объявлений под новую идентичность...")
+        cursor.connection.create_function(
+            "ad_ident", 1, lambda link: ad_identity({"link": link}), deterministic=True
+        )
+        cursor.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'advertisements'"
+        )
+        row = cursor.fetchone()
+        last_id = row[0] if row else 0
+
+        copied = [name for name in columns if name != "hash"]
+        cursor.execute(ADVERTISEMENTS_TABLE_SQL.format(table="advertisements_new"))
+        column_list = ", ".join(copied)
+        cursor.execute(f"""
+            INSERT OR IGNORE INTO advertisements_new ({column_list}, ident)
+            SELECT {column_list}, ad_ident(link)
+            FROM advertisements
+            ORDER BY id
+        """)
+        # Индексы и триггеры старой таблицы удаляются вместе с ней
+        cursor.execute("DROP TABLE advertisements")
+        cursor.execute("ALTER TABLE advertisements_new RENAME TO advertisements")
+        # id не должны повторно выдаваться: на них держатся границы прочитанного
+        cursor.execute(
+            "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'advertisements'",
+            (last_id,),
+        )
+        return True
+
+    @staticmethod
+    def _rekey_by_link(cursor):
+        """Перевод объявлений Куфара с идентичности по номеру на сайте
+        (``host#id``) на идентичность по ссылке.
+
+        Если то же объявление уже сохранено по ссылке (через CSS-селекторы),
+        остается более ранняя запись, а повтор удаляется вместе со своими
+        данными триггерами удаления.
+        """
+        # Самое свежее объявление с номером уже по ссылке - перевод сделан
+        cursor.execute("""
+            SELECT link, ident FROM advertisements
+            WHERE external_id IS NOT NULL
+            ORDER BY id DESC LIMIT 1
+        """)
+        row = cursor.fetchone()
+        if row is None or ad_identity({"link": row[0]}) == row[1]:
+            return
+
+        print("Перевод объявлений Куфара на идентичность по ссылке...")
+        cursor.execute("""
+            SELECT id, link, ident FROM advertisements
+            WHERE external_id IS NOT NULL
+            ORDER BY id
+        """)
+        for ad_id, link, ident in cursor.fetchall():
+            new_ident = ad_identity({"link": link})
+            if new_ident == ident:
+                continue
+            cursor.execute("SELECT id FROM advertisements WHERE ident = ?", (new_ident,))
+            other = cursor.fetchone()
+            if other is not None and other[0] < ad_id:
+                cursor.execute("DELETE FROM advertisements WHERE id = ?", (ad_id,))
+                continue
+            if other is not None:
+                cursor.execute("DELETE FROM advertisements WHERE id = ?", (other[0],))
+            cursor.execute(
+                "UPDATE advertisements SET ident = ? WHERE id = ?", (new_ident, ad_id)
+            )
+
+    @staticmethod
+    def _fill_prices(cursor):
+        """Разбор цен объявлений, сохраненных до появления price_minor"""
+        cursor.execute("SELECT id, price FROM advertisements WHERE price != ''")
+        cursor.executemany(
+            "UPDATE advertisements SET price_minor = ?, price_currency = ? WHERE id = ?",
+            [(*parse_price(row[1]), row[0]) for row in cursor.fetchall()],
+        )
+
+    @staticmethod
+    def _ad_price(ad_data: Dict) -> Tuple[Optional[int], Optional[str]]:
+        """Цена объявления в минимальных единицах и ее валюта"""
+        # Точная цена могла прийти со страницы (Куфар), иначе разбираем текст
+        if "price_minor" in ad_data:
+            return ad_data["price_minor"], ad_data.get("price_currency")
+        return parse_price(ad_data.get("price"))
+
+    def _insert_advertisement(
+        self,
+        cursor,
+        ad_data: Dict,
+        ident: bytes,
+        fingerprint: int,
+        clusters: ClusterIndex,
+    ) -> AdState:
+        """Вставка объявления с привязкой к кластеру почти одинаковых.
+
+        Записывает в ``ad_data`` id и cluster_id (для первого объявления
+        кластера они совпадают). Возвращает состояние для кеша - оно
+        кладется туда только после фиксации транзакции.
+        """
+        price_minor, price_currency = self._ad_price(ad_data)
+        cluster_id = clusters.find(
+            fingerprint, ad_data["site_name"], price_minor, price_currency
+        )
+
+        cursor.execute(
+            INSERT_ADVERTISEMENT_SQL,
+            self._ad_row(
+                ad_data, ident, price_minor, price_currency, fingerprint, cluster_id
+            ),
+        )
+        ad_data["id"] = cursor.lastrowid
+        if cluster_id is None:
+            cluster_id = ad_data["id"]
+            cursor.execute(
+                "UPDATE advertisements SET cluster_id = id WHERE id = ?", (ad_data["id"],)
+            )
+        ad_data["cluster_id"] = cluster_id
+        self._add_bands(cursor, ad_data["id"], fingerprint)
+        clusters.add(
+            ad_data["id"],
+            cluster_id,
+            fingerprint,
+            ad_data["site_name"],
+            price_minor,
+            price_currency,
+        )
+        self._index_for_search(
+            cursor, ad_data["id"], ad_data["title"], ad_data.get("description", "")
+        )
+        return ad_data["id"], ad_data["title"], price_minor, price_currency
+
+    @staticmethod
+    def _ad_row(
+        ad_data: Dict,
+        ident: bytes,
+        price_minor: Optional[int],
+        price_currency: Optional[str],
+        fingerprint: int,
+        cluster_id: Optional[int],
+    ) -> Tuple:
+        """Значения колонок для INSERT_ADVERTISEMENT_SQL"""
+        return (
+            ad_data["site_name"],
+            ad_data["title"],
+            ad_data.get("price", ""),
+            ad_data["link"],
+            ad_data.get("image_url", ""),
+            ad_data.get("description", ""),
+            ", ".join(ad_data.get("keywords", [])),
+            ad_data.get("external_id"),
+            price_minor,
+            price_currency,
+            ident,
+            fingerprint,
+            cluster_id,
+        )
+
     def add_advertisement(self, ad_data: Dict) -> bool:
         """Добавление нового объявления в базу данных"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
+            return bool(self.add_advertisements_batch([ad_data]))
+        except Exception as e:
+            print(f"Ошибка при добавлении объявления: {e}")
+            return False
+
+    def add_advertisements_batch(self, ads: Iterable[Dict]) -> List[Dict]:
+        """Добавление пачки объявлений одной транзакцией.
 
-                # Создаем хеш для уникальности объявления
-                ad_hash = f"{ad_data['site_name']}_{ad_data['title']}_{ad_data['link']}"
+        Возвращает объявления, которых раньше не было в базе (повторы
+        внутри пачки отбрасываются), с заполненными id и cluster_id.
+        У уже известных объявлений записываются изменения заголовка
+        и цены (``ad_observations``). Если все объявления пачки есть
+        в кеше состояний и не изменились, к базе обращения нет.
+        """
+        batch = {}
+        for ad in ads:
+            batch.setdefault(ad_identity(ad), ad)
 
+        changes = []
+        uncached = []
+        for ident, ad in batch.items():
+            state = self.state_cache.get(ident)
+            if state is None:
+                uncached.append(ident)
+            elif self._ad_changed(ad, state):
+                changes.append((ident, ad, state))
+        if not uncached and not changes:
+            return []
+
+        conn = self._connection()
+        with conn:
+            # Блокировка записи сразу: между проверкой и вставкой
+            # другой поток не добавит те же объявления
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.cursor()
+
+            known = {}
+            for i in range(0, len(uncached), BATCH_CHUNK_SIZE):
+                chunk = uncached[i : i + BATCH_CHUNK_SIZE]
+                placeholders = ", ".join("?" * len(chunk))
                 cursor.execute(
-                    """
-                    INSERT OR IGNORE INTO advertisements 
-                    (site_name, title, price, link, image_url, description, hash)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    f"""
+                    SELECT ident, id, title, price_minor, price_currency
+                    FROM advertisements WHERE ident IN ({placeholders})
                 """,
+                    chunk,
+                )
+                for row in cursor.fetchall():
+                    known[row[0]] = tuple(row[1:])
+
+            new_ads = []
+            states: Dict[bytes, AdState] = {}
+            fingerprints = {
+                ident: ad_fingerprint(batch[ident]["title"], batch[ident].get("description"))
+                for ident in uncached
+                if ident not in known
+            }
+            # Кандидаты в повторы для всей пачки - одним проходом по полосам
+            clusters = ClusterIndex(
+                cursor, self._exchange_rates(cursor), fingerprints.values()
+            )
+            for ident in uncached:
+                ad = batch[ident]
+                state = known.get(ident)
+                if state is None:
+                    states[ident] = self._insert_advertisement(
+                        cursor, ad, ident, fingerprints[ident], clusters
+                    )
+                    new_ads.append(ad)
+                    continue
+                states[ident] = state
+                if self._ad_changed(ad, state):
+                    changes.append((ident, ad, state))
+
+            states.update(self._record_changes(cursor, changes))
+
+        # Кеши обновляются только после фиксации: при откате в них не
+        # останутся объявления, которых нет в базе
+        for ident, state in states.items():
+            self.state_cache.put(ident, state)
+        for _, _, (ad_id, *_) in changes:
+            self.row_cache.invalidate(ad_id)
+        return new_ads
+
+    def _ad_changed(self, ad_data: Dict, state: AdState) -> bool:
+        """Отличается ли объявление от последнего известного состояния"""
+        return (ad_data["title"], *self._ad_price(ad_data)) != state[1:]
+
+    def _record_changes(
+        self, cursor, changes: List[Tuple[bytes, Dict, AdState]]
+    ) -> Dict[bytes, AdState]:
+        """Запись изменений известных объявлений в историю и в саму строку.
+
+        Возвращает новые состояния объявлений для кеша.
+        """
+        states = {}
+        observations = []
+        for ident, ad_data, (ad_id, title, price_minor, price_currency) in changes:
+            new_minor, new_currency = self._ad_price(ad_data)
+            price_changed = (new_minor, new_currency) != (price_minor, price_currency)
+            price_change = None
+            if (
+                price_changed
+                and new_currency == price_currency
+                and None not in (new_minor, price_minor)
+            ):
+                price_change = new_minor - price_minor
+
+            observations.append(
+                (
+                    ad_id,
+                    ad_data["title"] if ad_data["title"] != title else None,
+                    ad_data.get("price", "") if price_changed else None,
+                    new_minor if price_changed else None,
+                    new_currency if price_changed else None,
+                    price_change,
+                )
+            )
+            cursor.execute(
+                """
+                UPDATE advertisements
+                SET title = ?, price = ?, price_minor = ?, price_currency = ?
+                WHERE id = ?
+            """,
+                (ad_data["title"], ad_data.get("price", ""), new_minor, new_currency, ad_id),
+            )
+            if ad_data["title"] != title:
+                self._reindex_title(cursor, ad_id)
+            states[ident] = (ad_id, ad_data["title"], new_minor, new_currency)
+
+        # Два изменения за одну секунду сливаются в одно
+        cursor.executemany(
+            """
+            INSERT INTO ad_observations
+            (ad_id, title, price, price_minor, price_currency, price_change)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(ad_id, observed_at) DO UPDATE SET
+                title = COALESCE(excluded.title, title),
+                price_minor = CASE WHEN excluded.price IS NULL
+                    THEN price_minor ELSE excluded.price_minor END,
+                price_currency = CASE WHEN excluded.price IS NULL
+                    THEN price_currency ELSE excluded.price_currency END,
+                price_change = CASE
+                    WHEN price_change IS NULL AND excluded.price_change IS NULL
+                    THEN NULL
+                    ELSE COALESCE(price_change, 0) + COALESCE(excluded.price_change, 0)
+                    END,
+                price = COALESCE(excluded.price, price)
+        """,
+            observations,
+        )
+        return states
+
+    def save_advertisement_details(self, enriched: List[Tuple[Dict, Dict]]):
+        """Сохранение деталей (год, пробег, состояние) для объявлений"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                """
+                UPDATE advertisements
+                SET year = ?, mileage = ?, condition = ?,
+                    details_fetched_at = CURRENT_TIMESTAMP
+                WHERE ident = ?
+            """,
+                [
                     (
-                        ad_data["site_name"],
-                        ad_data["title"],
-                        ad_data.get("price", ""),
-                        ad_data["link"],
-                        ad_data.get("image_url", ""),
-                        ad_data.get("description", ""),
-                        ad_hash,
-                    ),
+                        details.get("year"),
+                        details.get("mileage"),
+                        details.get("condition"),
+                        ad_identity(ad_data),
+                    )
+                    for ad_data, details in enriched
+                ],
+            )
+            conn.commit()
+
+        idents = {ad_identity(ad_data) for ad_data, _ in enriched}
+        self.row_cache.invalidate_where(lambda row: row["ident"] in idents)
+
+    def filter_new_advertisements(self, ads: List[Dict]) -> List[Dict]:
+        """Объявления из списка, которых еще нет в базе"""
+        if not ads:
+            return []
+
+        idents = [ad_identity(ad) for ad in ads]
+        # Объявления из кеша состояний уже есть в базе
+        known = {ident for ident in idents if self.state_cache.get(ident) is not None}
+        unknown = [ident for ident in idents if ident not in known]
+        if unknown:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                placeholders = ", ".join("?" * len(unknown))
+                cursor.execute(
+                    f"SELECT ident FROM advertisements WHERE ident IN ({placeholders})",
+                    unknown,
                 )
+                known.update(row[0] for row in cursor.fetchall())
 
-                conn.commit()
-                return cursor.rowcount > 0
-        except Exception as e:
-            print(f"Ошибка при добавлении объявления: {e}")
-            return False
+        return [ad for ad, ident in zip(ads, idents) if ident not in known]
 
     def get_new_advertisements(self, limit: int = 50) -> List[Dict]:
         """Получение новых объявлений"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._connection() as conn:
             cursor = conn.cursor()
 
             cursor.execute(
@@ -94,9 +1193,132 @@ class Database:
             rows = cursor.fetchall()
             return [dict(row) for row in rows]
 
+    def get_unread_advertisements(
+        self,
+        user_id: int,
+        after_id: int = 0,
+        limit: int = 10,
+        price_range: Optional[Tuple[int, int]] = None,
+        one_per_cluster: bool = False,
+    ) -> Tuple[List[Dict], bool]:
+        """Страница объявлений, новых для пользователя (старые первыми).
+
+        Объявления идут по возрастанию id после границы прочитанного и
+        ``after_id`` (последнего показанного), поэтому после показа
+        страницы границу можно сдвинуть на ее последнее объявление, не
+        пропустив непоказанных. Фильтры - как у ``get_advertisements_page``.
+        Возвращает объявления и признак следующей страницы.
+        """
+        with self._connection() as conn:
+            db_cursor = conn.cursor()
+
+            conditions, params = self._feed_conditions(
+                db_cursor, None, price_range, one_per_cluster
+            )
+            conditions.append("""
+                id > MAX(?, COALESCE(
+                    (SELECT last_seen_id FROM user_read_state WHERE user_id = ?), 0
+                ))
+            """)
+            params.extend([after_id, user_id])
+
+            db_cursor.execute(
+                f"""
+                SELECT * FROM advertisements
+                WHERE {' AND '.join(conditions)}
+                ORDER BY id
+                LIMIT ?
+            """,
+                [*params, limit + 1],
+            )
+            rows = [dict(row) for row in db_cursor.fetchall()]
+
+        return rows[:limit], len(rows) > limit
+
+    def get_last_seen_id(self, user_id: int) -> int:
+        """id последнего объявления, прочитанного пользователем"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT last_seen_id FROM user_read_state WHERE user_id = ?", (user_id,)
+            )
+            row = cursor.fetchone()
+            return row[0] if row else 0
+
+    def count_unread_advertisements(
+        self,
+        user_id: int,
+        price_range: Optional[Tuple[int, int]] = None,
+        one_per_cluster: bool = False,
+    ) -> int:
+        """Количество объявлений, новых для пользователя, с теми же
+        фильтрами, что у ``get_unread_advertisements``
+        """
+        with self._connection() as conn:
+            cursor = conn.cursor()
+
+            conditions, params = self._feed_conditions(
+                cursor, None, price_range, one_per_cluster
+            )
+            conditions.append("""
+                id > COALESCE(
+                    (SELECT last_seen_id FROM user_read_state WHERE user_id = ?), 0
+                )
+            """)
+            params.append(user_id)
+
+            cursor.execute(
+                f"SELECT COUNT(*) FROM advertisements WHERE {' AND '.join(conditions)}",
+                params,
+            )
+            return cursor.fetchone()[0]
+
+    def start_read_mark(self, user_id: int, unread: int):
+        """Граница прочитанного для нового пользователя: новыми для него
+        считаются только ``unread`` последних объявлений, а не вся база.
+        Уже поставленную границу не меняет.
+        """
+        with self._connection() as conn:
+            conn.execute(
+                """
+                INSERT INTO user_read_state (user_id, last_seen_id)
+                SELECT ?, MAX(COALESCE(MAX(id), 0) - ?, 0) FROM advertisements
+                -- WHERE нужен SQLite, чтобы не спутать ON с условием соединения
+                WHERE true
+                ON CONFLICT(user_id) DO NOTHING
+            """,
+                (user_id, unread),
+            )
+
+    def mark_read_up_to(self, user_id: int, ad_id: int):
+        """Отметить прочитанными все объявления пользователя до ``ad_id``.
+
+        ``ad_id`` - последнее объявление показанной страницы
+        ``get_unread_advertisements``: все непрочитанные до него на ней были.
+        """
+        with self._connection() as conn:
+            conn.execute(
+                """
+                INSERT INTO user_read_state (user_id, last_seen_id, updated_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    last_seen_id = MAX(last_seen_id, excluded.last_seen_id),
+                    updated_at = CURRENT_TIMESTAMP
+            """,
+                (user_id, ad_id),
+            )
+
+    def mark_all_read(self, user_id: int):
+        """Отметить прочитанными все объявления пользователя"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM advertisements")
+            last_id = cursor.fetchone()[0]
+        self.mark_read_up_to(user_id, last_id)
+
     def mark_as_viewed(self, ad_id: int):
         """Отметить объявление как просмотренное"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 """
@@ -108,79 +1330,440 @@ class Database:
             )
             conn.commit()
 
-    def get_advertisements_by_site(self, site_name: str, limit: int = 20) -> List[Dict]:
-        """Получение объявлений по конкретному сайту"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        self.row_cache.invalidate(ad_id)
+
+    def get_advertisement(self, ad_id: int) -> Optional[Dict]:
+        """Объявление по id (из кеша или по первичному ключу)"""
+        ad = self.row_cache.get(ad_id)
+        if ad is not None:
+            return ad
+
+        with self._connection() as conn:
             cursor = conn.cursor()
+            cursor.execute("SELECT * FROM advertisements WHERE id = ?", (ad_id,))
+            row = cursor.fetchone()
+
+        if row is None:
+            return None
+        ad = dict(row)
+        self.row_cache.put(ad_id, ad)
+        return ad
+
+    def get_advertisements_page(
+        self,
+        site_name: Optional[str] = None,
+        cursor: Optional[Tuple[str, int]] = None,
+        direction: str = "next",
+        limit: int = 10,
+        price_range: Optional[Tuple[int, int]] = None,
+        one_per_cluster: bool = False,
+    ) -> Tuple[List[Dict], bool]:
+        """Страница объявлений (свежие первыми) с пагинацией по ключу (created_at, id).
+
+        ``cursor`` - (created_at, id) последнего объявления текущей страницы
+        для ``direction="next"`` (более старые) или первого для ``"prev"``
+        (более свежие). Возвращает объявления и признак того, что в этом
+        направлении есть еще страница. Любая страница стоит одного
+        поиска по индексу, как и первая.
+
+        ``price_range`` - (от, до) в целых BYN; объявления без цены
+        и в валютах без курса не отбрасываются. ``one_per_cluster`` оставляет
+        от каждого кластера почти одинаковых объявлений только последнее.
+        """
+        with self._connection() as conn:
+            db_cursor = conn.cursor()
+
+            conditions, params = self._feed_conditions(
+                db_cursor, site_name, price_range, one_per_cluster
+            )
+            if cursor is not None:
+                comparison = ">" if direction == "prev" else "<"
+                conditions.append(f"(created_at, id) {comparison} (?, ?)")
+                params.extend(cursor)
+
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            order = "ASC" if direction == "prev" else "DESC"
+
+            db_cursor.execute(
+                f"""
+                SELECT * FROM advertisements
+                {where}
+                ORDER BY created_at {order}, id {order}
+                LIMIT ?
+            """,
+                [*params, limit + 1],
+            )
+            rows = [dict(row) for row in db_cursor.fetchall()]
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if direction == "prev":
+            rows.reverse()
+        return rows, has_more
+
+    def get_price_drops(self, hours: int = 24, limit: int = 20) -> List[Dict]:
+        """Снижения цены за последние ``hours`` часов (свежие первыми).
 
+        К строке объявления добавляются ``dropped_at``, ``old_price_minor``
+        и ``price_change`` (отрицательная разница в минимальных единицах).
+        """
+        with self._connection() as conn:
+            cursor = conn.cursor()
             cursor.execute(
                 """
-                SELECT * FROM advertisements 
-                WHERE site_name = ? 
-                ORDER BY created_at DESC 
+                SELECT advertisements.*,
+                    o.observed_at AS dropped_at,
+                    o.price_minor - o.price_change AS old_price_minor,
+                    o.price_change
+                FROM ad_observations AS o
+                JOIN advertisements ON advertisements.id = o.ad_id
+                WHERE o.price_change < 0
+                    AND o.observed_at >= datetime('now', ?)
+                ORDER BY o.observed_at DESC
                 LIMIT ?
             """,
-                (site_name, limit),
+                (f"-{int(hours)} hours", limit),
             )
+            return [dict(row) for row in cursor.fetchall()]
 
-            rows = cursor.fetchall()
-            return [dict(row) for row in rows]
+    def get_cluster_sources(self, cluster_ids: Iterable[int]) -> Dict[int, List[Dict]]:
+        """Объявления кластеров (сайт, цена, ссылка) в порядке добавления"""
+        cluster_ids = list(set(cluster_ids))
+        sources: Dict[int, List[Dict]] = {cluster_id: [] for cluster_id in cluster_ids}
+        if not cluster_ids:
+            return sources
 
-    def search_advertisements(self, query: str, limit: int = 20) -> List[Dict]:
-        """Поиск объявлений по ключевому слову"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            placeholders = ", ".join("?" * len(cluster_ids))
+            cursor.execute(
+                f"""
+                SELECT id, cluster_id, site_name, price, link FROM advertisements
+                WHERE cluster_id IN ({placeholders})
+            """,
+                cluster_ids,
+            )
+            for row in sorted(cursor.fetchall(), key=lambda row: row["id"]):
+                sources[row["cluster_id"]].append(dict(row))
+        return sources
+
+    def _feed_conditions(
+        self,
+        cursor,
+        site_name: Optional[str],
+        price_range: Optional[Tuple[int, int]],
+        one_per_cluster: bool,
+    ) -> Tuple[List[str], List]:
+        """Условия WHERE и их параметры для ленты объявлений"""
+        filters = []
+        filter_params: List = []
+        if site_name is not None:
+            filters.append("site_name = ?")
+            filter_params.append(site_name)
+        if price_range is not None:
+            condition, price_params = self._price_condition(cursor, *price_range)
+            filters.append(condition)
+            filter_params.extend(price_params)
+
+        conditions = list(filters)
+        params = list(filter_params)
+        if one_per_cluster:
+            # Представитель кластера - последнее объявление среди
+            # подходящих под фильтры: колонки без префикса в подзапросе
+            # относятся к newer
+            newer_filters = "".join(f" AND {condition}" for condition in filters)
+            conditions.append(f"""
+                NOT EXISTS (
+                    SELECT 1 FROM advertisements AS newer
+                    WHERE newer.cluster_id = advertisements.cluster_id
+                        AND newer.id > advertisements.id{newer_filters}
+                )
+            """)
+            params.extend(filter_params)
+        return conditions, params
+
+    def _price_condition(self, cursor, min_price: int, max_price: int) -> Tuple[str, List]:
+        """Условие на цену в BYN по колонкам price_minor/price_currency.
+
+        Границы переводятся в каждую валюту по курсу, поэтому сравнивается
+        сама сохраненная сумма, без пересчета каждой строки. Условие
+        проверяется по пути обхода ленты по дате.
+        """
+        rates = self._exchange_rates(cursor)
+        placeholders = ", ".join("?" * len(rates))
+        parts = ["price_minor IS NULL", f"price_currency NOT IN ({placeholders})"]
+        params: List = list(rates)
+
+        for currency, rate in rates.items():
+            parts.append("(price_currency = ? AND price_minor BETWEEN ? AND ?)")
+            params.extend(
+                [
+                    currency,
+                    math.floor(min_price * 100 / rate),
+                    math.ceil(max_price * 100 / rate),
+                ]
+            )
+        return f"({' OR '.join(parts)})", params
+
+    @staticmethod
+    def _exchange_rates(cursor) -> Dict[str, float]:
+        cursor.execute("SELECT currency, rate FROM exchange_rates")
+        rates = {row[0]: row[1] for row in cursor.fetchall()}
+        rates["BYN"] = 1.0
+        return rates
+
+    def get_exchange_rates(self) -> Dict[str, float]:
+        """Сохраненные курсы: рублей BYN за единицу валюты"""
+        with self._connection() as conn:
+            return self._exchange_rates(conn.cursor())
+
+    def save_exchange_rates(self, rates: Dict[str, float]):
+        """Сохранение курсов валют"""
+        with self._connection() as conn:
+            conn.executemany(
+                """
+                INSERT INTO exchange_rates (currency, rate, updated_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(currency) DO UPDATE SET
+                    rate = excluded.rate,
+                    updated_at = CURRENT_TIMESTAMP
+            """,
+                list(rates.items()),
+            )
+
+    def get_price_range(self, user_id: int) -> Optional[Tuple[int, int]]:
+        """Диапазон цен пользователя в BYN или ``None``, если он не задан"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT min_price, max_price FROM user_settings WHERE user_id = ?",
+                (user_id,),
+            )
+            row = cursor.fetchone()
+
+        if row is None or (row[0], row[1]) == (DEFAULT_MIN_PRICE, DEFAULT_MAX_PRICE):
+            return None
+        return row[0], row[1]
+
+    def set_price_range(
+        self,
+        user_id: int,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+    ):
+        """Сохранение диапазона цен пользователя (без аргументов - сброс)"""
+        min_price = DEFAULT_MIN_PRICE if min_price is None else min_price
+        max_price = DEFAULT_MAX_PRICE if max_price is None else max_price
+        with self._connection() as conn:
+            conn.execute(
+                """
+                INSERT INTO user_settings (user_id, min_price, max_price)
+                VALUES (?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    min_price = excluded.min_price,
+                    max_price = excluded.max_price
+            """,
+                (user_id, min_price, max_price),
+            )
+
+    def get_advertisements_by_site(self, site_name: str, limit: int = 20) -> List[Dict]:
+        """Получение объявлений по конкретному сайту"""
+        with self._connection() as conn:
             cursor = conn.cursor()
 
             cursor.execute(
                 """
                 SELECT * FROM advertisements 
-                WHERE title LIKE ? OR description LIKE ?
+                WHERE site_name = ? 
                 ORDER BY created_at DESC 
                 LIMIT ?
             """,
-                (f"%{query}%", f"%{query}%", limit),
+                (site_name, limit),
             )
 
             rows = cursor.fetchall()
             return [dict(row) for row in rows]
 
-    def get_statistics(self) -> Dict:
-        """Получение статистики по объявлениям"""
-        with sqlite3.connect(self.db_path) as conn:
+    def search_advertisements(self, query: str, limit: int = 20) -> List[Dict]:
+        """Поиск объявлений по словам запроса (полнотекстовый индекс).
+
+        Ранжируются только ``SEARCH_CANDIDATES`` самых свежих совпадений:
+        ``ORDER BY rank`` по всему индексу считал бы bm25() для каждого
+        совпадения (сотни миллисекунд для «jawa» на 300 тыс. объявлений).
+        Кандидаты берутся по убыванию rowid, bm25() считается только для
+        них (заголовок весит вдвое больше описания), к оценке добавляется
+        штраф за возраст объявления.
+        """
+        tokens = SEARCH_TOKEN_RE.findall(normalize_search_text(query))
+        if not tokens:
+            return []
+        # Слова целиком: префиксный поиск собирает списки всех подходящих слов
+        match = " AND ".join('"%s"' % token for token in tokens)
+
+        with self._connection() as conn:
             cursor = conn.cursor()
+            # Граница окна кандидатов - rowid самого старого из них: условие
+            # на rowid FTS5 проверяет по списку документов, не вычисляя bm25()
+            cursor.execute(
+                f"""
+                WITH candidates AS (
+                    SELECT rowid AS id FROM advertisements_fts
+                    WHERE advertisements_fts MATCH ?1
+                    ORDER BY rowid DESC
+                    LIMIT ?2
+                )
+                SELECT a.*, julianday('now') - julianday(a.created_at) AS age_days,
+                       bm25(advertisements_fts, {SEARCH_TITLE_WEIGHT}, 1.0) AS relevance
+                FROM advertisements_fts
+                JOIN advertisements a ON a.id = advertisements_fts.rowid
+                WHERE advertisements_fts MATCH ?1
+                    AND advertisements_fts.rowid >= (SELECT MIN(id) FROM candidates)
+            """,
+                (match, config.SEARCH_CANDIDATES),
+            )
+            candidates = cursor.fetchall()
 
-            # Общее количество объявлений
-            cursor.execute("SELECT COUNT(*) FROM advertisements")
-            total_ads = cursor.fetchone()[0]
+        # bm25() отрицательна: чем меньше, тем релевантнее
+        ranked = sorted(
+            candidates,
+            key=lambda row: row["relevance"]
+            + config.SEARCH_RECENCY_WEIGHT * (row["age_days"] or 0),
+        )
+        ads = []
+        for row in ranked[:limit]:
+            ad = dict(row)
+            del ad["relevance"], ad["age_days"]
+            ads.append(ad)
+        return ads
 
-            # Количество новых объявлений
-            cursor.execute("SELECT COUNT(*) FROM advertisements WHERE is_new = TRUE")
-            new_ads = cursor.fetchone()[0]
+    def get_statistics(self, days: int = config.STATS_DAYS) -> Dict:
+        """Получение статистики по объявлениям из счетчиков.
+
+        ``daily`` - новые объявления за последние ``days`` дней:
+        ``{день: {сайт: количество}}``, свежие дни первыми.
+        """
+        with self._connection() as conn:
+            cursor = conn.cursor()
 
             # Количество объявлений по сайтам
-            cursor.execute("""
-                SELECT site_name, COUNT(*) as count 
-                FROM advertisements 
-                GROUP BY site_name
-            """)
-            site_stats = dict(cursor.fetchall())
+            cursor.execute("SELECT site_name, total, new FROM site_stats WHERE total > 0")
+            rows = cursor.fetchall()
+            site_stats = {row["site_name"]: row["total"] for row in rows}
+
+            # Новые объявления по дням
+            cursor.execute(
+                """
+                SELECT day, site_name, added FROM daily_stats
+                WHERE day > date('now', ?)
+                ORDER BY day DESC
+            """,
+                (f"-{int(days)} days",),
+            )
+            daily = {}
+            for row in cursor.fetchall():
+                daily.setdefault(row["day"], {})[row["site_name"]] = row["added"]
 
             return {
-                "total_ads": total_ads,
-                "new_ads": new_ads,
+                "total_ads": sum(row["total"] for row in rows),
+                "new_ads": sum(row["new"] for row in rows),
                 "site_stats": site_stats,
+                "daily": daily,
             }
 
-    def cleanup_old_ads(self, days: int = 30):
-        """Очистка старых объявлений"""
-        with sqlite3.connect(self.db_path) as conn:
+    def mark_sites_parsed(self, site_keys: List[str]):
+        """Отметить сайты как только что успешно распарсенные"""
+        with self._connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(
+            cursor.executemany(
                 """
-                DELETE FROM advertisements 
-                WHERE created_at < datetime('now', '-{} days')
-            """.format(days)
+                INSERT INTO site_status (site_key, last_parsed_at)
+                VALUES (?, CURRENT_TIMESTAMP)
+                ON CONFLICT(site_key) DO UPDATE SET last_parsed_at = CURRENT_TIMESTAMP
+            """,
+                [(site_key,) for site_key in site_keys],
             )
             conn.commit()
+
+    def get_stale_sites(self, site_keys: List[str], max_age_minutes: int) -> List[str]:
+        """Сайты, данные которых старше ``max_age_minutes`` или отсутствуют"""
+        if not site_keys:
+            return []
+
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            placeholders = ", ".join("?" * len(site_keys))
+            cursor.execute(
+                f"""
+                SELECT site_key FROM site_status
+                WHERE site_key IN ({placeholders})
+                  AND last_parsed_at >= datetime('now', ?)
+            """,
+                [*site_keys, f"-{int(max_age_minutes)} minutes"],
+            )
+            fresh = {row[0] for row in cursor.fetchall()}
+
+        return [site_key for site_key in site_keys if site_key not in fresh]
+
+    def get_expired_advertisements(
+        self, after_id: int, cutoff: str, limit: int = 500
+    ) -> List[Dict]:
+        """Следующая пачка объявлений, добавленных раньше ``cutoff``.
+
+        id растут вместе с created_at, поэтому устаревшие объявления - это
+        начало таблицы по id: читается не больше ``limit`` строк с id больше
+        ``after_id`` до первого еще не устаревшего объявления. К каждому
+        объявлению добавляется его история изменений (``observations``).
+        """
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT * FROM advertisements WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id, limit),
+            )
+            rows = []
+            for row in cursor.fetchall():
+                if row["created_at"] >= cutoff:
+                    break
+                rows.append(dict(row, observations=[]))
+            if not rows:
+                return rows
+
+            by_id = {row["id"]: row for row in rows}
+            cursor.execute(
+                "SELECT * FROM ad_observations WHERE ad_id BETWEEN ? AND ?",
+                (rows[0]["id"], rows[-1]["id"]),
+            )
+            for observation in cursor.fetchall():
+                by_id[observation["ad_id"]]["observations"].append(dict(observation))
+        return rows
+
+    def delete_advertisements_range(self, first_id: int, last_id: int, cutoff: str) -> int:
+        """Удаление объявлений с id от ``first_id`` до ``last_id``, добавленных
+        раньше ``cutoff``, одной короткой транзакцией. Возвращает число
+        удаленных.
+        """
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                DELETE FROM advertisements
+                WHERE id BETWEEN ? AND ? AND created_at < ?
+            """,
+                (first_id, last_id, cutoff),
+            )
+            deleted = cursor.rowcount
+
+        self.row_cache.invalidate_where(lambda row: first_id <= row["id"] <= last_id)
+        self.state_cache.invalidate_where(lambda state: first_id <= state[0] <= last_id)
+        return deleted
+
+    def incremental_vacuum(self, pages: int) -> int:
+        """Возврат файловой системе до ``pages`` (больше нуля) свободных
+        страниц. Возвращает, сколько страниц освобождено.
+        """
+        conn = self._connection()
+        free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        # execute() делает один шаг прагмы (одну страницу), executescript -
+        # до конца
+        conn.executescript(f"PRAGMA incremental_vacuum({max(int(pages), 1)});")
+        return free_before - conn.execute("PRAGMA freelist_count").fetchone()[0]
@@ -0,0 +1,93 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Методы Database, которые пишут в базу: выполняются по одному в потоке записи
+WRITE_METHODS = frozenset(
+    {
+        "add_advertisement",
+        "add_advertisements_batch",
+        "save_advertisement_details",
+        "mark_as_viewed",
+        "mark_read_up_to",
+        "mark_all_read",
+        "mark_sites_parsed",
+        "recompute_statistics",
+        "delete_advertisements_range",
+        "incremental_vacuum",
+        "save_exchange_rates",
+        "set_price_range",
+        "start_read_mark",
+    }
+)
+
+
+class DatabaseExecutor:
+    """Неблокирующий доступ к ``Database`` для обработчиков бота.
+
+    Запись идет через единственный поток (очередь записи), чтение - через
+    пул потоков. У каждого потока свое WAL-соединение, поэтому чтение
+    не ждет записи, а обработчик, который только пишет, не ждет вовсе.
+
+    ``submit`` возвращает ``Future``, ``run`` - то же для ``await``,
+    ``call`` ждет результат в текущем потоке.
+    """
+
+    def __init__(self, db, readers: int = config.DB_READER_THREADS):
+        self.db = db
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        self._readers = ThreadPoolExecutor(
+            max_workers=readers, thread_name_prefix="db-reader"
+        )
+
+    def submit(self, method: str, *args, **kwargs) -> Future:
+        """Вызов метода ``Database`` в потоке записи или чтения"""
+        func = getattr(self.db, method)
+        pool = self._writer if method in WRITE_METHODS else self._readers
+        return pool.submit(func, *args, **kwargs)
+
+    def call(self, method: str, *args, **kwargs):
+        """Вызов с ожиданием результата"""
+        return self.submit(method, *args, **kwargs).result()
+
+    async def run(self, method: str, *args, **kwargs):
+        """Вызов для asyncio-кода"""
+        return await asyncio.wrap_future(self.submit(method, *args, **kwargs))
+
+    def fire(self, method: str, *args, **kwargs) -> Future:
+        """Вызов без ожидания: ошибка только попадает в лог"""
+        future = self.submit(method, *args, **kwargs)
+        future.add_done_callback(self._log_failure(method))
+        return future
+
+    @staticmethod
+    def _log_failure(method: str):
+        def callback(future: Future):
+            if future.exception() is not None:
+                logger.error(f"Ошибка при выполнении {method}: {future.exception()}")
+
+        return callback
+
+    def shutdown(self, wait: bool = True):
+        """Остановка потоков (очередь записи дописывается до конца)"""
+        self._writer.shutdown(wait=wait)
+        self._readers.shutdown(wait=wait)
+
+
+class ExecutorDatabase:
+    """Объект с методами ``Database``, которые выполняет исполнитель.
+
+    Передается коду, принимающему ``db`` (например, конвейеру парсинга):
+    его запись идет через поток записи исполнителя, чтение - через пул.
+    """
+
+    def __init__(self, executor: DatabaseExecutor):
+        self._executor = executor
+
+    def __getattr__(self, method: str):
+        return functools.partial(self._executor.call, method)
@@ -0,0 +1,401 @@
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
+
+import soupsieve
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.dammit import EncodingDetector
+
+import config
+
+try:
+    from cssselect import HTMLTranslator
+    from lxml import etree
+    from lxml import html as lxml_html
+except ImportError:  # lxml необязателен, остается BeautifulSoup
+    lxml_html = None
+
+# Описание ищется одинаково на всех сайтах
+DESCRIPTION_SELECTOR = "p, .description, .desc"
+
+# Простые селекторы вида tag[attr='value'], tag[attr*='value'] и .class,
+# которые можно превратить в SoupStrainer
+_TAG_ATTR_RE = re.compile(r"^([\w-]+)?\[([\w-]+)(\*?)=['\"]([^'\"]*)['\"]\]$")
+_CLASS_RE = re.compile(r"^([\w-]+)?\.([\w-]+)$")
+
+# Данные выдачи, встроенные в страницу Next.js (стратегия "next_data")
+NEXT_DATA_MARKER = b'id="__NEXT_DATA__"'
+NEXT_DATA_END = b"</script>"
+KUFAR_IMAGE_URL = "https://rms.kufar.by/v1/list_thumbs_2x/{path}"
+
+
+def _find_next_data(content: bytes) -> Optional[Dict]:
+    """JSON из ``<script id="__NEXT_DATA__">`` без разбора HTML.
+
+    Документ просматривается один раз: поиск маркера, конца открывающего
+    тега и закрывающего ``</script>`` продолжается с места предыдущего.
+    """
+    marker = content.find(NEXT_DATA_MARKER)
+    if marker < 0:
+        return None
+    start = content.find(b">", marker)
+    if start < 0:
+        return None
+    end = content.find(NEXT_DATA_END, start)
+    if end < 0:
+        return None
+
+    try:
+        return json.loads(content[start + 1 : end])
+    except ValueError:
+        return None
+
+
+def _format_kufar_price(price_minor: int) -> str:
+    """Цена в копейках в том же виде, что и на странице"""
+    if not price_minor:
+        return "Договорная"
+    rubles, kopecks = divmod(price_minor, 100)
+    text = f"{rubles:,}".replace(",", " ")
+    if kopecks:
+        text += f",{kopecks:02d}"
+    return f"{text} р."
+
+
+def _kufar_ad(item: Dict, base_url: str) -> Optional[Dict]:
+    """Объявление из записи выдачи Куфара"""
+    title = (item.get("subject") or "").strip()
+    link = item.get("ad_link")
+    if not title or not link:
+        return None
+
+    ad = {
+        "title": title,
+        "link": urljoin(base_url, link),
+        "external_id": str(item["ad_id"]) if item.get("ad_id") else None,
+    }
+
+    price = item.get("price_byn")
+    if price is not None and str(price).isdigit():
+        # Ноль - "Договорная": цена неизвестна, а не равна нулю
+        ad["price_minor"] = int(price) or None
+        ad["price_currency"] = "BYN" if int(price) else None
+        ad["price"] = _format_kufar_price(int(price))
+
+    images = item.get("images") or []
+    if images and images[0].get("path"):
+        ad["image_url"] = KUFAR_IMAGE_URL.format(path=images[0]["path"])
+
+    if item.get("body_short"):
+        ad["description"] = item["body_short"].strip()
+
+    return ad
+
+
+def extract_next_data(
+    site_config: Dict, content: bytes
+) -> Optional[Tuple[List[Dict], Optional[str]]]:
+    """Объявления и следующая страница из встроенных данных Куфара.
+
+    Возвращает ``None``, если данных на странице нет или их формат
+    изменился (в том числе переименованы поля объявлений и ни одно не
+    извлеклось) - тогда используются CSS-селекторы.
+    """
+    data = _find_next_data(content)
+    try:
+        listing = data["props"]["initialState"]["listing"]
+        items = listing["ads"]
+    except (KeyError, TypeError):
+        return None
+    if not isinstance(items, list):
+        return None
+
+    ads = []
+    for item in items:
+        try:
+            ad = _kufar_ad(item, site_config["base_url"])
+        except (AttributeError, KeyError, TypeError) as e:
+            print(f"Ошибка при извлечении объявления: {e}")
+            continue
+        if ad is not None:
+            ads.append(ad)
+    if items and not ads:
+        return None
+
+    # Следующая страница задается курсором, а не номером
+    next_url = None
+    for page in listing.get("pagination") or []:
+        if page.get("label") == "next" and page.get("token"):
+            parts = urlparse(site_config["search_url"])
+            query = [(k, v) for k, v in parse_qsl(parts.query) if k != "cursor"]
+            query.append(("cursor", page["token"]))
+            next_url = urlunparse(parts._replace(query=urlencode(query)))
+            break
+
+    return ads, next_url
+
+
+class HtmlBackend:
+    """Базовый интерфейс извлечения объявлений со страницы поиска.
+
+    Селекторы всех сайтов компилируются один раз при создании бэкенда.
+    Наследники реализуют разбор документа и операции над элементами,
+    а обход объявлений общий, поэтому результат у бэкендов одинаковый.
+    """
+
+    name = "base"
+
+    def __init__(self, sites: Optional[Dict[str, Dict]] = None):
+        self.sites = sites if sites is not None else config.PARSING_SITES
+        self._selectors = {
+            site_key: self._compile_site(site_config)
+            for site_key, site_config in self.sites.items()
+        }
+
+    def _compile_site(self, site_config: Dict) -> Dict:
+        selectors = dict(site_config["selectors"], description=DESCRIPTION_SELECTOR)
+        compiled = {
+            field: self.compile(selector)
+            for field, selector in selectors.items()
+            if field != "items"
+        }
+        compiled["items"] = self.compile(selectors["items"], root=True)
+        if "next_page" in selectors:
+            compiled["next_page"] = self.compile(selectors["next_page"], root=True)
+        return compiled
+
+    def compile(self, selector: str, root: bool = False):
+        raise NotImplementedError
+
+    def parse(self, site_key: str, content: bytes):
+        raise NotImplementedError
+
+    def select_all(self, root, compiled) -> List:
+        raise NotImplementedError
+
+    def select_one(self, element, compiled):
+        raise NotImplementedError
+
+    def text(self, element) -> str:
+        raise NotImplementedError
+
+    def attr(self, element, name: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def page_text(self, content: bytes) -> str:
+        """Видимый текст всей страницы (без script/style)"""
+        raise NotImplementedError
+
+    def extract_ads(self, site_key: str, content: bytes) -> List[Dict]:
+        """Извлечение объявлений с HTML страницы"""
+        ads, _ = self.extract_page(site_key, content)
+        return ads
+
+    def extract_page(self, site_key: str, content: bytes) -> Tuple[List[Dict], Optional[str]]:
+        """Объявления страницы и ссылка на следующую страницу (если есть)"""
+        site_config = self.sites[site_key]
+
+        # Встроенные данные разбираются без построения DOM
+        if site_config.get("strategy") == "next_data":
+            result = extract_next_data(site_config, content)
+            if result is not None:
+                return result
+
+        selectors = self._selectors[site_key]
+        base_url = site_config["base_url"]
+        ads = []
+        next_url = None
+
+        # Находим все элементы объявлений
+        root = self.parse(site_key, content)
+        ad_elements = self.select_all(root, selectors["items"])
+
+        # Ссылка на следующую страницу выдачи
+        if "next_page" in selectors:
+            next_elem = self.select_one(root, selectors["next_page"])
+            if next_elem is not None and self.attr(next_elem, "href"):
+                next_url = urljoin(base_url, self.attr(next_elem, "href"))
+
+        for element in ad_elements:
+            try:
+                ad = {}
+
+                # Заголовок
+                title_elem = self.select_one(element, selectors["title"])
+                if title_elem is not None:
+                    ad["title"] = self.text(title_elem)
+
+                # Цена
+                price_elem = self.select_one(element, selectors["price"])
+                if price_elem is not None:
+                    ad["price"] = self.text(price_elem)
+
+                # Ссылка
+                link_elem = self.select_one(element, selectors["link"])
+                if link_elem is not None:
+                    link = self.attr(link_elem, "href")
+                    if link:
+                        ad["link"] = urljoin(base_url, link)
+
+                # Изображение
+                img_elem = self.select_one(element, selectors["image"])
+                if img_elem is not None:
+                    img_src = self.attr(img_elem, "src") or self.attr(
+                        img_elem, "data-src"
+                    )
+                    if img_src:
+                        ad["image_url"] = urljoin(base_url, img_src)
+
+                # Описание (если есть)
+                desc_elem = self.select_one(element, selectors["description"])
+                if desc_elem is not None:
+                    ad["description"] = self.text(desc_elem)
+
+                # Проверяем, что у нас есть минимум данных
+                if ad.get("title") and ad.get("link"):
+                    ads.append(ad)
+
+            except Exception as e:
+                print(f"Ошибка при извлечении объявления: {e}")
+                continue
+
+        return ads, next_url
+
+
+class BeautifulSoupBackend(HtmlBackend):
+    """Разбор через BeautifulSoup и html.parser.
+
+    Разбираются только объявления и ссылка на следующую страницу
+    (SoupStrainer по селекторам ``items`` и ``next_page``), селекторы
+    заранее скомпилированы soupsieve.
+    """
+
+    name = "html.parser"
+
+    def __init__(self, sites: Optional[Dict[str, Dict]] = None):
+        super().__init__(sites)
+        self._strainers = {
+            site_key: self._make_strainer(
+                [
+                    selector
+                    for field, selector in site_config["selectors"].items()
+                    if field in ("items", "next_page")
+                ]
+            )
+            for site_key, site_config in self.sites.items()
+        }
+
+    @staticmethod
+    def _parse_simple_selector(selector: str):
+        """(тег, атрибут, регулярка значения) для простого селектора"""
+        match = _TAG_ATTR_RE.match(selector)
+        if match:
+            tag, attr, contains, value = match.groups()
+            pattern = re.escape(value) if contains else "^%s$" % re.escape(value)
+            return tag, attr, re.compile(pattern)
+
+        match = _CLASS_RE.match(selector)
+        if match:
+            # При разборе class еще не разбит на список, сверяем по словам
+            tag, css_class = match.groups()
+            return tag, "class", re.compile(r"(?:^|\s)%s(?:\s|$)" % re.escape(css_class))
+
+        return None
+
+    @classmethod
+    def _make_strainer(cls, selectors: List[str]) -> Optional[SoupStrainer]:
+        """SoupStrainer для набора простых селекторов, иначе ``None``"""
+        rules = [cls._parse_simple_selector(selector) for selector in selectors]
+        if not rules or None in rules:
+            return None
+
+        def keep(name, attrs):
+            for tag, attr, value_re in rules:
+                value = attrs.get(attr)
+                if isinstance(value, list):
+                    value = " ".join(value)
+                if (tag is None or tag == name) and value and value_re.search(value):
+                    return True
+            return False
+
+        return SoupStrainer(keep)
+
+    def compile(self, selector: str, root: bool = False):
+        return soupsieve.compile(selector)
+
+    def parse(self, site_key: str, content: bytes):
+        return BeautifulSoup(
+            content, "html.parser", parse_only=self._strainers[site_key]
+        )
+
+    def select_all(self, root, compiled) -> List:
+        return compiled.select(root)
+
+    def select_one(self, element, compiled):
+        return compiled.select_one(element)
+
+    def text(self, element) -> str:
+        return element.get_text(strip=True)
+
+    def attr(self, element, name: str) -> Optional[str]:
+        return element.get(name)
+
+    def page_text(self, content: bytes) -> str:
+        return BeautifulSoup(content, "html.parser").get_text(" ")
+
+
+class LxmlBackend(HtmlBackend):
+    """Разбор через lxml: CSS-селекторы заранее переводятся в XPath"""
+
+    name = "lxml"
+
+    # Текст элемента без содержимого script/style, как get_text() в bs4
+    _TEXT = (
+        etree.XPath(".//text()[not(parent::script) and not(parent::style)]")
+        if lxml_html is not None
+        else None
+    )
+
+    def __init__(self, sites: Optional[Dict[str, Dict]] = None):
+        self._translator = HTMLTranslator()
+        super().__init__(sites)
+
+    def compile(self, selector: str, root: bool = False):
+        # select_one в bs4 ищет только среди потомков, но не сам элемент
+        prefix = "descendant-or-self::" if root else "descendant::"
+        return etree.XPath(self._translator.css_to_xpath(selector, prefix=prefix))
+
+    def parse(self, site_key: str, content: bytes):
+        encoding = (
+            EncodingDetector.find_declared_encoding(content, is_html=True) or "utf-8"
+        )
+        # Парсер создается на каждый вызов: страницы разбираются в разных потоках
+        parser = lxml_html.HTMLParser(encoding=encoding)
+        return lxml_html.document_fromstring(content, parser=parser)
+
+    def select_all(self, root, compiled) -> List:
+        return compiled(root)
+
+    def select_one(self, element, compiled):
+        found = compiled(element)
+        return found[0] if found else None
+
+    def text(self, element) -> str:
+        texts = (text.strip() for text in self._TEXT(element))
+        return "".join(text for text in texts if text)
+
+    def attr(self, element, name: str) -> Optional[str]:
+        return element.get(name)
+
+    def page_text(self, content: bytes) -> str:
+        return " ".join(self._TEXT(self.parse(None, content)))
+
+
+def create_backend(name: str = config.HTML_BACKEND) -> HtmlBackend:
+    """Создание бэкенда разбора по имени из конфигурации"""
+    if name == "lxml":
+        if lxml_html is not None:
+            return LxmlBackend()
+        print("lxml не установлен, используется html.parser")
+    return BeautifulSoupBackend()
@@ -0,0 +1,163 @@
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+from urllib.parse import urlparse
+
+import config
+
+# Состояния предохранителя
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class HostUnavailableError(Exception):
+    """Хост временно отключен предохранителем"""
+
+
+class HostHealth:
+    """Состояние хостов: ошибки, задержки и предохранители (circuit breaker).
+
+    После ``BREAKER_FAILURE_THRESHOLD`` ошибок подряд предохранитель хоста
+    размыкается на ``BREAKER_OPEN_SECONDS`` секунд: запросы к нему сразу
+    завершаются ``HostUnavailableError``. Затем пропускается один пробный
+    запрос - успех замыкает предохранитель, ошибка снова размыкает его.
+
+    ``clock`` - источник текущего времени (в тестах подменяется).
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self._hosts: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host_of(url: str) -> str:
+        return urlparse(url).netloc
+
+    def _host(self, host: str) -> Dict:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = {
+                "state": CLOSED,
+                "consecutive_failures": 0,
+                "requests": 0,
+                "errors": 0,
+                "error_rate": 0.0,
+                "latencies": deque(maxlen=config.HEALTH_LATENCY_WINDOW),
+                "open_until": 0.0,
+                "trial_in_flight": False,
+            }
+        return state
+
+    def before_request(self, url: str) -> bool:
+        """Проверка предохранителя перед запросом.
+
+        Возвращает ``True``, если запрос пропущен как пробный: после него
+        обязательно вызывается ``release_trial``, даже если запрос
+        завершился не сетевой ошибкой.
+        """
+        host = self.host_of(url)
+        with self._lock:
+            state = self._host(host)
+            if state["state"] == CLOSED:
+                return False
+
+            if state["state"] == OPEN and self.clock() >= state["open_until"]:
+                state["state"] = HALF_OPEN
+                state["trial_in_flight"] = False
+
+            if state["state"] == HALF_OPEN and not state["trial_in_flight"]:
+                state["trial_in_flight"] = True
+                return True
+
+            raise HostUnavailableError(
+                f"Хост {host} временно отключен после "
+                f"{state['consecutive_failures']} ошибок подряд"
+            )
+
+    def release_trial(self, url: str):
+        """Завершение пробного запроса.
+
+        Если пробный запрос прервался (отмена, ошибка разбора) без
+        ``record_success``/``record_failure``, следующий запрос снова
+        пропускается как пробный, а не блокируется навсегда.
+        """
+        with self._lock:
+            self._host(self.host_of(url))["trial_in_flight"] = False
+
+    def record_success(self, url: str, latency: float):
+        """Учет успешного запроса"""
+        with self._lock:
+            state = self._host(self.host_of(url))
+            state["requests"] += 1
+            state["latencies"].append(latency)
+            state["error_rate"] = self._smooth(state["error_rate"], 0.0)
+            state["consecutive_failures"] = 0
+            state["state"] = CLOSED
+            state["trial_in_flight"] = False
+
+    def record_failure(self, url: str):
+        """Учет неудачного запроса"""
+        with self._lock:
+            state = self._host(self.host_of(url))
+            state["requests"] += 1
+            state["errors"] += 1
+            state["error_rate"] = self._smooth(state["error_rate"], 1.0)
+            state["consecutive_failures"] += 1
+            state["trial_in_flight"] = False
+
+            if (
+                state["state"] == HALF_OPEN
+                or state["consecutive_failures"] >= config.BREAKER_FAILURE_THRESHOLD
+            ):
+                state["state"] = OPEN
+                state["open_until"] = self.clock() + config.BREAKER_OPEN_SECONDS
+
+    def timeout_for(self, url: str) -> float:
+        """Таймаут запроса по наблюдаемым задержкам хоста"""
+        with self._lock:
+            latencies = self._host(self.host_of(url))["latencies"]
+            if len(latencies) < config.HEALTH_MIN_SAMPLES:
+                return config.REQUEST_TIMEOUT
+            p95 = self._percentile(latencies, 0.95)
+
+        timeout = p95 * config.TIMEOUT_LATENCY_FACTOR
+        return min(max(timeout, config.MIN_REQUEST_TIMEOUT), config.REQUEST_TIMEOUT)
+
+    @staticmethod
+    def backoff_delay(attempt: int) -> float:
+        """Экспоненциальная задержка перед повтором со случайным разбросом"""
+        ceiling = min(config.RETRY_BACKOFF_MAX, config.RETRY_BACKOFF_BASE * 2**attempt)
+        return random.uniform(0, ceiling)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Состояние всех хостов для мониторинга"""
+        with self._lock:
+            return {
+                host: {
+                    "state": state["state"],
+                    "consecutive_failures": state["consecutive_failures"],
+                    "requests": state["requests"],
+                    "errors": state["errors"],
+                    "error_rate": round(state["error_rate"], 3),
+                    "latency_p50": self._percentile(state["latencies"], 0.5),
+                    "latency_p95": self._percentile(state["latencies"], 0.95),
+                    "open_until": state["open_until"] if state["state"] != CLOSED else None,
+                }
+                for host, state in self._hosts.items()
+            }
+
+    @staticmethod
+    def _smooth(previous: float, sample: float) -> float:
+        return config.HEALTH_SMOOTHING * sample + (1 - config.HEALTH_SMOOTHING) * previous
+
+    @staticmethod
+    def _percentile(values, fraction: float) -> Optional[float]:
+        if not values:
+            return None
+        ordered = sorted(values)
+        index = min(int(fraction * len(ordered)), len(ordered) - 1)
+        return round(ordered[index], 3)
@@ -0,0 +1,109 @@
+import hashlib
+import sqlite3
+import threading
+from typing import Dict
+
+import config
+
+
+class HttpCache:
+    """Постоянный кеш страниц поиска для условных GET-запросов.
+
+    Для каждого URL хранятся валидаторы ``ETag``/``Last-Modified`` и хеш
+    тела последнего ответа. Если сервер отвечает 304 или присылает
+    страницу с тем же хешем, страница считается неизменившейся и заново
+    не разбирается, поэтому само тело не хранится.
+    """
+
+    def __init__(self, db_path: str = config.HTTP_CACHE_PATH):
+        self.db_path = db_path
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self.init_cache()
+
+    def init_cache(self):
+        """Создание таблицы кеша"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS http_cache (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    content_hash TEXT,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            # Прежние версии хранили тела ответов - они больше не нужны
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(http_cache)")}
+            if "body" in columns:
+                conn.execute("UPDATE http_cache SET body = NULL WHERE body IS NOT NULL")
+            conn.commit()
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Заголовки If-None-Match/If-Modified-Since для URL"""
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT etag, last_modified FROM http_cache WHERE url = ?", (url,)
+            ).fetchone()
+
+        headers = {}
+        if row:
+            etag, last_modified = row
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def not_modified(self, site_key: str, url: str):
+        """Учет ответа 304 Not Modified"""
+        self._count(site_key, "hits")
+
+    def is_changed(self, site_key: str, url: str, body: bytes) -> bool:
+        """Отличается ли тело ответа 200 от сохраненного"""
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT content_hash FROM http_cache WHERE url = ?", (url,)
+            ).fetchone()
+        changed = not row or row[0] != hashlib.sha256(body).hexdigest()
+
+        self._count(site_key, "misses" if changed else "hits")
+        return changed
+
+    def save(self, url: str, headers, body: bytes):
+        """Сохранение валидаторов и хеша ответа 200.
+
+        Вызывается, когда объявления страницы уже обработаны: после этого
+        такая же страница считается неизменившейся.
+        """
+        content_hash = hashlib.sha256(body).hexdigest()
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(
+                """
+                INSERT INTO http_cache (url, etag, last_modified, content_hash)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    etag = excluded.etag,
+                    last_modified = excluded.last_modified,
+                    content_hash = excluded.content_hash,
+                    updated_at = CURRENT_TIMESTAMP
+            """,
+                (
+                    url,
+                    headers.get("ETag"),
+                    headers.get("Last-Modified"),
+                    content_hash,
+                ),
+            )
+            conn.commit()
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """Счетчики попаданий/промахов по сайтам"""
+        with self._lock:
+            return {site: dict(counts) for site, counts in self.stats.items()}
+
+    def _count(self, site_key: str, field: str):
+        with self._lock:
+            counts = self.stats.setdefault(site_key, {"hits": 0, "misses": 0})
+            counts[field] += 1
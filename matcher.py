@@ -0,0 +1,41 @@
+import re
+from typing import Iterable, List, Set
+
+
+class KeywordMatcher:
+    """Поиск всех ключевых слов в тексте за один проход.
+
+    Ключевые слова собираются в одно скомпилированное регулярное выражение
+    (длинные варианты первыми), обернутое в опережающую проверку: оно
+    пробуется с каждой позиции текста и находит самое длинное слово,
+    начинающееся в ней, даже если оно перекрывается с предыдущим
+    (``"мотоцикл jawa"`` и ``"jawa 350"``). Слова, входящие в найденное
+    (``"jawa"`` в ``"jawa 350"``), считаются совпавшими вместе с ним,
+    поэтому результат тот же, что у проверки каждого слова через ``in``.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        unique = {keyword.lower() for keyword in keywords if keyword}
+        self.keywords: List[str] = sorted(unique, key=lambda k: (-len(k), k))
+        alternatives = "|".join(map(re.escape, self.keywords)) or "(?!)"
+        self._pattern = re.compile(f"(?=({alternatives}))")
+        self._implied = {
+            keyword: {other for other in self.keywords if other in keyword}
+            for keyword in self.keywords
+        }
+
+    @staticmethod
+    def _join(texts: Iterable[str]) -> str:
+        # Перевод строки не дает словам склеиться на границе полей
+        return "\n".join(text for text in texts if text).lower()
+
+    def match(self, *texts: str) -> Set[str]:
+        """Все ключевые слова, встречающиеся хотя бы в одном из текстов"""
+        matched = set()
+        for found in self._pattern.finditer(self._join(texts)):
+            matched |= self._implied[found.group(1)]
+        return matched
+
+    def matches(self, *texts: str) -> bool:
+        """Есть ли в текстах хотя бы одно ключевое слово"""
+        return self._pattern.search(self._join(texts)) is not None
@@ -1,12 +1,83 @@
+import asyncio
+import queue
 import re
+import threading
 import time
-from typing import Dict, List, Optional
-from urllib.parse import urljoin
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
 
+import aiohttp
 import requests
-from bs4 import BeautifulSoup
 
 import config
+from extractors import create_backend
+from health import HostHealth
+from http_cache import HttpCache
+from matcher import KeywordMatcher
+
+# Расширенные ключевые слова для фильтрации объявлений
+JAWA_CZ_KEYWORDS = ["jawa", "ява", "cezet", "чезет", "cz", "чехословакия", "чешский"]
+
+# Ключевые слова для поиска (регистр не важен)
+MODEL_KEYWORDS = ["jawa", "ява", "cezet", "чезет", "cz"]
+
+# Ответы, после которых запрос имеет смысл повторить
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Извлечение деталей со страницы объявления
+YEAR_RE = re.compile(r"\b(19[5-9]\d|20[0-2]\d)\b")
+MILEAGE_RE = re.compile(r"(\d+)\s*(км|тыс\.?\s*км|тысяч\s*км)", re.IGNORECASE)
+CONDITION_KEYWORDS = ["отличное", "хорошее", "удовлетворительное", "требует ремонта"]
+CONDITION_RE = re.compile("|".join(map(re.escape, CONDITION_KEYWORDS)), re.IGNORECASE)
+
+
+class Page(list):
+    """Объявления одной страницы выдачи.
+
+    ``mark_stored`` вызывается, когда объявления страницы сохранены: только
+    тогда ответ попадает в HTTP-кеш. Если разбор или сохранение сорвались,
+    в следующем цикле страница будет разобрана заново.
+    """
+
+    def __init__(
+        self, ads: Iterable[Dict] = (), on_stored: Optional[Callable[[], None]] = None
+    ):
+        super().__init__(ads)
+        self.on_stored = on_stored
+
+    def mark_stored(self):
+        if self.on_stored is not None:
+            self.on_stored()
+            self.on_stored = None
+
+
+class HostRateLimiter:
+    """Ограничение частоты запросов отдельно для каждого хоста.
+
+    Запросы к одному хосту выполняются не чаще, чем раз в ``delay`` секунд,
+    а разные хосты друг друга не ждут.
+    """
+
+    def __init__(self, delay: float = config.REQUEST_DELAY):
+        self.delay = delay
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._last_request: Dict[str, float] = {}
+
+    async def wait(self, url: str):
+        """Дождаться своей очереди на запрос к хосту из ``url``"""
+        host = urlparse(url).netloc
+        lock = self._locks.setdefault(host, asyncio.Lock())
+
+        async with lock:
+            loop = asyncio.get_running_loop()
+            last_request = self._last_request.get(host)
+            if last_request is not None:
+                remaining = self.delay - (loop.time() - last_request)
+                if remaining > 0:
+                    await asyncio.sleep(remaining)
+            self._last_request[host] = loop.time()
 
 
 class MotorcycleParser:
@@ -17,8 +88,171 @@ class MotorcycleParser:
                 "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
             }
         )
+        self.cache = HttpCache()
+        self.health = HostHealth()
+        self.backend = create_backend()
+        self.matcher = KeywordMatcher(JAWA_CZ_KEYWORDS + config.SEARCH_KEYWORDS)
+        self.model_matcher = KeywordMatcher(MODEL_KEYWORDS)
+        # Результат последней успешной загрузки по сайтам
+        self.site_status: Dict[str, Dict] = {}
+
+    def _mark_parsed(self, site_key: str, changed: bool):
+        """Запомнить успешную загрузку страницы сайта"""
+        self.site_status[site_key] = {"parsed_at": time.time(), "changed": changed}
+
+    def sites_parsed_since(self, timestamp: float) -> List[str]:
+        """Сайты, успешно загруженные после ``timestamp``"""
+        return [
+            site_key
+            for site_key, status in list(self.site_status.items())
+            if status["parsed_at"] >= timestamp
+        ]
+
+    def _request(
+        self, url: str, headers: Optional[Dict] = None, retries: int = config.FETCH_RETRIES
+    ) -> requests.Response:
+        """GET с учетом здоровья хоста.
+
+        Сетевые ошибки, 429 и 5xx повторяются до ``retries`` раз с
+        экспоненциальной задержкой, таймаут берется из задержек хоста.
+        Если предохранитель хоста разомкнут, сразу выбрасывается
+        ``HostUnavailableError``.
+        """
+        # Хотя бы одна попытка делается всегда
+        retries = max(retries, 0)
+        for attempt in range(retries + 1):
+            trial = self.health.before_request(url)
+            started = time.monotonic()
+            try:
+                response = self.session.get(
+                    url, headers=headers, timeout=self.health.timeout_for(url)
+                )
+                if response.status_code in RETRYABLE_STATUSES:
+                    response.raise_for_status()
+                self.health.record_success(url, time.monotonic() - started)
+                return response
+            except requests.RequestException as e:
+                self.health.record_failure(url)
+                if attempt == retries:
+                    raise
+                delay = self.health.backoff_delay(attempt)
+                print(f"Ошибка запроса {url}: {e}. Повтор через {delay:.1f} с")
+            finally:
+                # Прерванный пробный запрос (отмена, другая ошибка) не
+                # оставляет хост заблокированным навсегда
+                if trial:
+                    self.health.release_trial(url)
+            time.sleep(delay)
+
+    async def _request_async(
+        self,
+        http: aiohttp.ClientSession,
+        url: str,
+        headers: Optional[Dict] = None,
+        limiter: Optional[HostRateLimiter] = None,
+        retries: int = config.FETCH_RETRIES,
+    ) -> Tuple[int, Dict, bytes]:
+        """Асинхронный GET с учетом здоровья хоста (см. ``_request``).
+
+        Возвращает статус, заголовки и тело ответа.
+        """
+        retries = max(retries, 0)
+        for attempt in range(retries + 1):
+            trial = self.health.before_request(url)
+            try:
+                if limiter is not None:
+                    await limiter.wait(url)
+
+                started = time.monotonic()
+                timeout = aiohttp.ClientTimeout(total=self.health.timeout_for(url))
+                async with http.get(url, headers=headers, timeout=timeout) as response:
+                    if response.status in RETRYABLE_STATUSES:
+                        response.raise_for_status()
+                    body = await response.read()
+                    self.health.record_success(url, time.monotonic() - started)
+
+                    # 4xx: хост отвечает, повтор не поможет
+                    response.raise_for_status()
+                    return response.status, response.headers, body
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if (
+                    isinstance(e, aiohttp.ClientResponseError)
+                    and e.status not in RETRYABLE_STATUSES
+                ):
+                    raise
+                self.health.record_failure(url)
+                if attempt == retries:
+                    raise
+                delay = self.health.backoff_delay(attempt)
+                print(f"Ошибка запроса {url}: {e!r}. Повтор через {delay:.1f} с")
+            finally:
+                if trial:
+                    self.health.release_trial(url)
+            await asyncio.sleep(delay)
+
+    def _fetch_page(
+        self,
+        site_key: str,
+        url: str,
+        use_cache: bool = True,
+        retries: int = config.FETCH_RETRIES,
+    ) -> Tuple[Optional[bytes], Optional[Callable[[], None]]]:
+        """Условный GET страницы.
+
+        Возвращает тело (``None``, если страница не изменилась с прошлого
+        раза) и функцию, сохраняющую ответ в кеш, - ее вызывают после
+        сохранения объявлений страницы. С ``use_cache=False`` кеш
+        не используется и не обновляется.
+        """
+        headers = self.cache.conditional_headers(url) if use_cache else {}
+        response = self._request(url, headers=headers, retries=retries)
+
+        if response.status_code == 304:
+            self.cache.not_modified(site_key, url)
+            return None, None
+
+        response.raise_for_status()
+        return self._cache_response(
+            site_key, url, response.headers, response.content, use_cache
+        )
+
+    async def _fetch_page_async(
+        self,
+        http: aiohttp.ClientSession,
+        site_key: str,
+        url: str,
+        use_cache: bool = True,
+        limiter: Optional[HostRateLimiter] = None,
+    ) -> Tuple[Optional[bytes], Optional[Callable[[], None]]]:
+        """Асинхронный условный GET страницы (см. ``_fetch_page``)"""
+        headers = self.cache.conditional_headers(url) if use_cache else {}
+        status, response_headers, body = await self._request_async(
+            http, url, headers=headers, limiter=limiter
+        )
 
-    def parse_site(self, site_key: str) -> List[Dict]:
+        if status == 304:
+            self.cache.not_modified(site_key, url)
+            return None, None
+
+        return self._cache_response(site_key, url, response_headers, body, use_cache)
+
+    def _cache_response(
+        self, site_key: str, url: str, headers, body: bytes, use_cache: bool
+    ) -> Tuple[Optional[bytes], Optional[Callable[[], None]]]:
+        if not use_cache:
+            return body, None
+        if not self.cache.is_changed(site_key, url, body):
+            # Страница уже обработана, обновляются только валидаторы
+            self.cache.save(url, headers, body)
+            return None, None
+        return body, lambda: self.cache.save(url, headers, body)
+
+    def parse_site(
+        self,
+        site_key: str,
+        use_cache: bool = True,
+        retries: int = config.FETCH_RETRIES,
+    ) -> List[Dict]:
         """Парсинг конкретного сайта"""
         site_config = config.PARSING_SITES.get(site_key)
         if not site_config:
@@ -28,194 +262,302 @@ class MotorcycleParser:
         try:
             print(f"Парсинг сайта: {site_config['name']}")
 
-            # Получаем HTML страницы
-            response = self.session.get(site_config["search_url"], timeout=30)
-            response.raise_for_status()
-
-            # Парсим HTML
-            soup = BeautifulSoup(response.content, "html.parser")
-
-            # Извлекаем объявления
-            ads = self._extract_ads(soup, site_config)
-
-            # Фильтруем по ключевым словам Jawa и CZ
-            filtered_ads = self._filter_jawa_cz_ads(ads)
-
-            print(
-                f"Найдено {len(filtered_ads)} объявлений Jawa/CZ на {site_config['name']}"
+            # Получаем HTML страницы. Объявления здесь не сохраняются,
+            # поэтому ответ в кеш не записывается (см. ``Page``)
+            content, _ = self._fetch_page(
+                site_key, site_config["search_url"], use_cache, retries
             )
+            self._mark_parsed(site_key, changed=content is not None)
+            if content is None:
+                print(f"Страница {site_config['name']} не изменилась, пропускаем")
+                return []
 
-            # Добавляем информацию о сайте
-            for ad in filtered_ads:
-                ad["site_name"] = site_config["name"]
-                ad["site_key"] = site_key
-
-            return filtered_ads
+            ads, _ = self._parse_page(site_key, content, site_config["search_url"], 1)
+            # Без обхода страниц берутся только самые новые объявления
+            return ads[: config.MAX_ITEMS_PER_SITE]
 
         except Exception as e:
             print(f"Ошибка при парсинге {site_config['name']}: {e}")
             return []
 
-    def _extract_ads(self, soup: BeautifulSoup, site_config: Dict) -> List[Dict]:
-        """Извлечение объявлений с HTML страницы"""
-        ads = []
-        selectors = site_config["selectors"]
+    def _parse_page(
+        self, site_key: str, content: bytes, url: str, page: int
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """Разбор загруженной страницы поиска.
 
-        # Находим все элементы объявлений
-        ad_elements = soup.select(selectors["items"])
+        Возвращает объявления Jawa/CZ и адрес следующей страницы выдачи
+        (``None``, если страница пустая или следующей нет).
+        """
+        site_config = config.PARSING_SITES[site_key]
 
-        for element in ad_elements[: config.MAX_ITEMS_PER_SITE]:
-            try:
-                ad = {}
-
-                # Заголовок
-                title_elem = element.select_one(selectors["title"])
-                if title_elem:
-                    ad["title"] = title_elem.get_text(strip=True)
-
-                # Цена
-                price_elem = element.select_one(selectors["price"])
-                if price_elem:
-                    ad["price"] = price_elem.get_text(strip=True)
-
-                # Ссылка
-                link_elem = element.select_one(selectors["link"])
-                if link_elem:
-                    link = link_elem.get("href", "")
-                    if link:
-                        ad["link"] = urljoin(site_config["base_url"], link)
-
-                # Изображение
-                img_elem = element.select_one(selectors["image"])
-                if img_elem:
-                    img_src = img_elem.get("src") or img_elem.get("data-src")
-                    if img_src:
-                        ad["image_url"] = urljoin(site_config["base_url"], img_src)
-
-                # Описание (если есть)
-                desc_elem = element.select_one("p, .description, .desc")
-                if desc_elem:
-                    ad["description"] = desc_elem.get_text(strip=True)
-
-                # Проверяем, что у нас есть минимум данных
-                if ad.get("title") and ad.get("link"):
-                    ads.append(ad)
+        # Извлекаем объявления
+        ads, next_url = self.backend.extract_page(site_key, content)
 
-            except Exception as e:
-                print(f"Ошибка при извлечении объявления: {e}")
-                continue
+        # Фильтруем по ключевым словам Jawa и CZ
+        filtered_ads = self._filter_jawa_cz_ads(ads)
+
+        print(
+            f"Найдено {len(filtered_ads)} объявлений Jawa/CZ на {site_config['name']} "
+            f"(страница {page})"
+        )
 
-        return ads
+        # Добавляем информацию о сайте
+        for ad in filtered_ads:
+            ad["site_name"] = site_config["name"]
+            ad["site_key"] = site_key
+
+        if not ads:
+            next_url = None
+        elif not next_url and site_config.get("page_param"):
+            next_url = self._page_url(url, site_config["page_param"], page + 1)
+
+        return filtered_ads, next_url
+
+    @staticmethod
+    def _page_url(url: str, param: str, page: int) -> str:
+        """URL страницы выдачи с номером ``page`` в параметре ``param``"""
+        parts = urlparse(url)
+        query = [(key, value) for key, value in parse_qsl(parts.query) if key != param]
+        query.append((param, str(page)))
+        return urlunparse(parts._replace(query=urlencode(query)))
 
     def _filter_jawa_cz_ads(self, ads: List[Dict]) -> List[Dict]:
-        """Фильтрация объявлений по ключевым словам Jawa и CZ"""
+        """Фильтрация объявлений по ключевым словам Jawa и CZ.
+
+        Совпавшие ключевые слова сохраняются в ``ad["keywords"]``.
+        """
         filtered_ads = []
 
         for ad in ads:
-            title = ad.get("title", "").lower()
-            description = ad.get("description", "").lower()
-
-            # Расширенные ключевые слова для лучшего поиска
-            jawa_keywords = [
-                "jawa",
-                "ява",
-                "cezet",
-                "чезет",
-                "cz",
-                "чехословакия",
-                "чешский",
-            ]
-
-            # Проверяем наличие ключевых слов
-            for keyword in jawa_keywords:
-                if keyword in title or keyword in description:
-                    filtered_ads.append(ad)
-                    break
-
-            # Также проверяем по основным ключевым словам из конфига
-            for keyword in config.SEARCH_KEYWORDS:
-                if keyword.lower() in title or keyword.lower() in description:
-                    if ad not in filtered_ads:  # Избегаем дублирования
-                        filtered_ads.append(ad)
-                    break
+            matched = self.matcher.match(ad.get("title", ""), ad.get("description", ""))
+            if matched:
+                ad["keywords"] = sorted(matched)
+                filtered_ads.append(ad)
 
         return filtered_ads
 
-    def parse_all_sites(self) -> List[Dict]:
-        """Парсинг всех настроенных сайтов"""
+    def _async_headers(self) -> Dict[str, str]:
+        """Заголовки сессии для aiohttp (сжатие aiohttp согласует сам)"""
+        return {
+            key: value
+            for key, value in self.session.headers.items()
+            if key.lower() != "accept-encoding"
+        }
+
+    async def _crawl_site_async(
+        self,
+        http: aiohttp.ClientSession,
+        limiter: HostRateLimiter,
+        site_key: str,
+        use_cache: bool = True,
+        filter_new: Optional[Callable[[List[Dict]], List[Dict]]] = None,
+        backfill: bool = False,
+        on_page: Optional[Callable[[Page], Awaitable[None]]] = None,
+    ) -> List[Dict]:
+        """Асинхронный обход страниц выдачи сайта.
+
+        Выдача отсортирована от новых к старым, поэтому обход идет до первой
+        страницы, все объявления которой уже есть в базе (``filter_new``
+        возвращает из списка только новые). Без ``filter_new`` читается
+        только первая страница. В режиме ``backfill`` ранней остановки нет.
+
+        Если задан ``on_page``, объявления каждой страницы передаются в него
+        сразу после разбора (как ``Page``) и не накапливаются в результате.
+        Иначе объявления только возвращаются и ответы в кеш не пишутся.
+
+        Условный запрос делается только для первой страницы: если она не
+        изменилась, обход заканчивается. Следующие страницы загружаются
+        целиком - их содержимое сдвигается вместе с выдачей, и ответ
+        "не изменилась" для них не значит, что новых объявлений нет.
+        """
+        site_config = config.PARSING_SITES.get(site_key)
+        if not site_config:
+            print(f"Конфигурация для сайта {site_key} не найдена")
+            return []
+
+        if backfill:
+            max_pages = config.BACKFILL_MAX_PAGES
+        elif filter_new is not None:
+            max_pages = config.MAX_PAGES_PER_SITE
+        else:
+            max_pages = 1
+
         all_ads = []
+        url = site_config["search_url"]
 
-        for site_key in config.PARSING_SITES.keys():
+        for page in range(1, max_pages + 1):
             try:
-                print(f"Парсинг сайта: {config.PARSING_SITES[site_key]['name']}")
-                site_ads = self.parse_site(site_key)
-                all_ads.extend(site_ads)
-                print(
-                    f"Найдено {len(site_ads)} объявлений Jawa/CZ на {config.PARSING_SITES[site_key]['name']}"
+                # Пауза выдерживается только относительно запросов к тому же
+                # хосту; если хост отключен предохранителем, ошибка будет сразу
+                print(f"Парсинг сайта: {site_config['name']} (страница {page})")
+                content, save_to_cache = await self._fetch_page_async(
+                    http, site_key, url, use_cache and page == 1, limiter
                 )
+                if page == 1:
+                    self._mark_parsed(site_key, changed=content is not None)
+                if content is None:
+                    print(f"Страница {page} {site_config['name']} не изменилась")
+                    break
 
-                # Задержка между запросами к разным сайтам
-                if (
-                    site_key != list(config.PARSING_SITES.keys())[-1]
-                ):  # Не ждем после последнего сайта
-                    time.sleep(config.REQUEST_DELAY)
+                # Разбор HTML не должен блокировать загрузку остальных сайтов
+                ads, next_url = await asyncio.to_thread(
+                    self._parse_page, site_key, content, url, page
+                )
+                # Проверка до передачи страницы дальше: иначе стадия сохранения
+                # может успеть записать ее объявления и они покажутся старыми.
+                # Страница без объявлений Jawa/CZ тоже без новых - иначе обход
+                # шел бы до MAX_PAGES_PER_SITE
+                has_new = True
+                if filter_new is not None and not backfill:
+                    has_new = bool(ads) and bool(await asyncio.to_thread(filter_new, ads))
+
+                if on_page is not None:
+                    await on_page(Page(ads, save_to_cache))
+                else:
+                    all_ads.extend(ads)
+
+                if not has_new:
+                    print(f"На странице {page} {site_config['name']} нет новых")
+                    break
+
+                if not next_url:
+                    break
+                url = next_url
 
             except Exception as e:
-                print(
-                    f"Ошибка при парсинге {config.PARSING_SITES[site_key]['name']}: {e}"
+                print(f"Ошибка при парсинге {site_config['name']} (страница {page}): {e}")
+                break
+
+        return all_ads
+
+    async def parse_all_sites_async(
+        self,
+        site_keys: Optional[Iterable[str]] = None,
+        use_cache: bool = True,
+        filter_new: Optional[Callable[[List[Dict]], List[Dict]]] = None,
+        backfill: bool = False,
+        on_page: Optional[Callable[[Page], Awaitable[None]]] = None,
+    ) -> List[Dict]:
+        """Одновременный парсинг всех настроенных сайтов.
+
+        С ``use_cache=True`` страницы, не изменившиеся с прошлого цикла,
+        не разбираются повторно. ``filter_new`` и ``backfill`` управляют
+        обходом страниц (см. ``_crawl_site_async``).
+        """
+        if site_keys is None:
+            site_keys = config.PARSING_SITES.keys()
+
+        if backfill:
+            # При глубокой загрузке нужны все страницы, даже неизменившиеся
+            use_cache = False
+
+        limiter = HostRateLimiter(config.REQUEST_DELAY)
+
+        # Таймауты задаются на каждый запрос по задержкам хоста
+        async with aiohttp.ClientSession(headers=self._async_headers()) as http:
+            results = await asyncio.gather(
+                *(
+                    self._crawl_site_async(
+                        http, limiter, site_key, use_cache, filter_new, backfill, on_page
+                    )
+                    for site_key in site_keys
                 )
-                continue
+            )
 
+        all_ads = []
+        for site_ads in results:
+            all_ads.extend(site_ads)
         return all_ads
 
+    def parse_all_sites(
+        self,
+        site_keys: Optional[Iterable[str]] = None,
+        use_cache: bool = True,
+        filter_new: Optional[Callable[[List[Dict]], List[Dict]]] = None,
+        backfill: bool = False,
+    ) -> List[Dict]:
+        """Парсинг всех настроенных сайтов (синхронная обертка)"""
+        return asyncio.run(
+            self.parse_all_sites_async(site_keys, use_cache, filter_new, backfill)
+        )
+
+    def iter_pages(
+        self,
+        site_keys: Optional[Iterable[str]] = None,
+        use_cache: bool = True,
+        filter_new: Optional[Callable[[List[Dict]], List[Dict]]] = None,
+        backfill: bool = False,
+    ) -> Iterator[Page]:
+        """Потоковый парсинг: страницы объявлений по мере загрузки.
+
+        Обход идет в фоновом потоке и передает страницы через очередь на
+        ``PIPELINE_QUEUE_SIZE`` страниц. Если потребитель не успевает,
+        загрузка новых страниц приостанавливается. Если генератор закрыт
+        раньше времени, обход останавливается.
+        """
+        pages: "queue.Queue" = queue.Queue(maxsize=config.PIPELINE_QUEUE_SIZE)
+        stop = threading.Event()
+        done = object()
+
+        async def on_page(page: Page):
+            if not await asyncio.to_thread(self._put_page, pages, page, stop):
+                raise RuntimeError("Обход остановлен потребителем")
+
+        def crawl():
+            try:
+                asyncio.run(
+                    self.parse_all_sites_async(
+                        site_keys, use_cache, filter_new, backfill, on_page
+                    )
+                )
+            finally:
+                self._put_page(pages, done, stop)
+
+        thread = threading.Thread(target=crawl, daemon=True)
+        thread.start()
+        try:
+            while True:
+                page = pages.get()
+                if page is done:
+                    break
+                yield page
+        finally:
+            stop.set()
+            thread.join()
+
+    @staticmethod
+    def _put_page(pages: "queue.Queue", item, stop: threading.Event) -> bool:
+        """Блокирующая запись в очередь, прерываемая остановкой потребителя"""
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
     def search_specific_model(self, model: str) -> List[Dict]:
         """Поиск мотоциклов Jawa и CZ по ключевым словам"""
         print(f"🔍 Начинаю поиск по запросу: '{model}'")
 
-        all_ads = self.parse_all_sites()
+        # Нужны все объявления, а не только изменившиеся страницы
+        all_ads = self.parse_all_sites(use_cache=False)
         print(f"📊 Всего найдено объявлений: {len(all_ads)}")
 
         if all_ads:
             print(f"📝 Пример первого объявления: {all_ads[0]}")
 
-        # Фильтруем по ключевым словам Jawa и CZ
+        # Фильтруем по ключевым словам Jawa/CZ (игнорируем конкретные модели)
+        print(f"🔑 Ищу по ключевым словам: {self.model_matcher.keywords}")
         model_ads = []
-        model_lower = model.lower()
-
-        # Расширенные ключевые слова для поиска (разные варианты написания)
-        jawa_keywords = [
-            "jawa",
-            "ява",
-            "cezet",
-            "чезет",
-            "cz",
-            "JAWA",
-            "ЯВА",
-            "CEZET",
-            "ЧЕЗЕТ",
-            "CZ",
-            "Jawa",
-            "Ява",
-            "Cezet",
-            "Чезет",
-        ]
-
-        print(f"🔑 Ищу по ключевым словам: {jawa_keywords[:5]}...")
 
         for i, ad in enumerate(all_ads):
-            title = ad.get("title", "").lower()
-            description = ad.get("description", "").lower()
-
-            print(
-                f"📋 Объявление {i+1}: title='{title[:50]}...', description='{description[:50]}...'"
+            matched = self.model_matcher.match(
+                ad.get("title", ""), ad.get("description", "")
             )
-
-            # Проверяем по ключевым словам Jawa/CZ (игнорируем конкретные модели)
-            for keyword in jawa_keywords:
-                if keyword.lower() in title or keyword.lower() in description:
-                    print(f"✅ Найдено совпадение '{keyword}' в объявлении {i+1}")
-                    model_ads.append(ad)
-                    break
+            if matched:
+                print(f"✅ Найдено совпадение {sorted(matched)} в объявлении {i+1}")
+                model_ads.append(ad)
 
         print(f"🎯 Итоговый результат: найдено {len(model_ads)} объявлений")
         return model_ads
@@ -235,60 +577,89 @@ class AdvancedParser(MotorcycleParser):
                 "Upgrade-Insecure-Requests": "1",
             }
         )
+        # Кеш деталей по URL и ограничение запросов к хостам
+        self._details_cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self._details_lock = threading.Lock()
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
 
     def parse_with_retry(self, site_key: str, max_retries: int = 3) -> List[Dict]:
-        """Парсинг с повторными попытками при ошибках"""
-        for attempt in range(max_retries):
-            try:
-                return self.parse_site(site_key)
-            except Exception as e:
-                print(f"Попытка {attempt + 1} для {site_key} не удалась: {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(config.REQUEST_DELAY * (attempt + 1))
-                else:
-                    print(f"Все попытки для {site_key} исчерпаны")
-                    return []
+        """Парсинг с повторными попытками при ошибках.
+
+        Повторы выполняются на уровне запросов (см. ``_request``), поэтому
+        ошибки сети не теряются внутри ``parse_site``.
+        """
+        return self.parse_site(site_key, retries=max_retries - 1)
 
     def get_ad_details(self, ad_url: str) -> Optional[Dict]:
         """Получение детальной информации об объявлении"""
+        with self._details_lock:
+            if ad_url in self._details_cache:
+                self._details_cache.move_to_end(ad_url)
+                return self._details_cache[ad_url]
+
         try:
-            response = self.session.get(ad_url, timeout=30)
+            # Не больше DETAILS_PER_HOST одновременных запросов к одному хосту
+            with self._host_slot(ad_url):
+                response = self._request(ad_url)
             response.raise_for_status()
 
-            soup = BeautifulSoup(response.content, "html.parser")
-
-            details = {}
+            details = self._extract_details(self.backend.page_text(response.content))
 
-            # Извлекаем дополнительные детали
-            # Год выпуска
-            year_pattern = r"\b(19[5-9]\d|20[0-2]\d)\b"
-            text_content = soup.get_text()
-            year_match = re.search(year_pattern, text_content)
-            if year_match:
-                details["year"] = year_match.group(1)
+        except Exception as e:
+            print(f"Ошибка при получении деталей объявления {ad_url}: {e}")
+            return None
 
-            # Пробег
-            mileage_pattern = r"(\d+)\s*(км|тыс\.?\s*км|тысяч\s*км)"
-            mileage_match = re.search(mileage_pattern, text_content, re.IGNORECASE)
-            if mileage_match:
-                details["mileage"] = (
-                    mileage_match.group(1) + " " + mileage_match.group(2)
+        with self._details_lock:
+            self._details_cache[ad_url] = details
+            if len(self._details_cache) > config.DETAILS_CACHE_SIZE:
+                self._details_cache.popitem(last=False)
+
+        return details
+
+    @staticmethod
+    def _extract_details(text_content: str) -> Dict:
+        """Год выпуска, пробег и состояние из текста страницы"""
+        details = {}
+
+        # Год выпуска
+        year_match = YEAR_RE.search(text_content)
+        if year_match:
+            details["year"] = year_match.group(1)
+
+        # Пробег
+        mileage_match = MILEAGE_RE.search(text_content)
+        if mileage_match:
+            details["mileage"] = mileage_match.group(1) + " " + mileage_match.group(2)
+
+        # Состояние (по приоритету списка, а не по порядку в тексте)
+        found = {match.group(0).lower() for match in CONDITION_RE.finditer(text_content)}
+        for keyword in CONDITION_KEYWORDS:
+            if keyword in found:
+                details["condition"] = keyword
+                break
+
+        return details
+
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc
+        with self._details_lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(
+                    config.DETAILS_PER_HOST
                 )
+            return self._host_slots[host]
 
-            # Состояние
-            condition_keywords = [
-                "отличное",
-                "хорошее",
-                "удовлетворительное",
-                "требует ремонта",
-            ]
-            for keyword in condition_keywords:
-                if keyword in text_content.lower():
-                    details["condition"] = keyword
-                    break
+    def enrich_ads(self, ads: List[Dict]) -> List[Tuple[Dict, Dict]]:
+        """Загрузка деталей для списка (новых) объявлений.
 
-            return details
+        Страницы загружаются пулом из ``DETAILS_WORKERS`` потоков.
+        Возвращает пары (объявление, детали) для успешно загруженных.
+        """
+        ads = [ad for ad in ads if ad.get("link")]
+        if not ads:
+            return []
 
-        except Exception as e:
-            print(f"Ошибка при получении деталей объявления {ad_url}: {e}")
-            return None
+        with ThreadPoolExecutor(max_workers=config.DETAILS_WORKERS) as pool:
+            results = list(pool.map(lambda ad: self.get_ad_details(ad["link"]), ads))
+
+        return [(ad, details) for ad, details in zip(ads, results) if details]
@@ -0,0 +1,93 @@
+"""
+Потоковый конвейер от загрузки страниц до сохранения объявлений.
+
+Каждая стадия - генератор, который берет элементы из предыдущей, поэтому
+объявления сохраняются сразу после разбора своей страницы, а в памяти
+одновременно находится не больше нескольких страниц. Разбор и фильтрация
+Jawa/CZ выполняются еще на стадии загрузки: по ним обход решает, читать
+ли следующую страницу выдачи. Для новых объявлений последняя стадия
+загружает детали, поэтому их получает любой путь загрузки: планировщик,
+поиск в боте и глубокая загрузка.
+"""
+
+import logging
+from parser import Page
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from database import ad_identity
+
+logger = logging.getLogger(__name__)
+
+
+def fetch_pages(
+    parser,
+    site_keys: Optional[Iterable[str]] = None,
+    filter_new: Optional[Callable[[List[Dict]], List[Dict]]] = None,
+    backfill: bool = False,
+) -> Iterator[List[Dict]]:
+    """Стадия загрузки: объявления Jawa/CZ по страницам (``Page``)"""
+    return parser.iter_pages(site_keys, filter_new=filter_new, backfill=backfill)
+
+
+def dedupe_pages(pages: Iterable[Page]) -> Iterator[Page]:
+    """Стадия удаления повторов в пределах одного цикла.
+
+    Одно объявление Куфара приходит и по запросу «ява», и по «чезет» -
+    второе отбрасывается здесь, без обращения к базе.
+    """
+    seen = set()
+    for page in pages:
+        unique = []
+        for ad in page:
+            key = ad_identity(ad)
+            if key not in seen:
+                seen.add(key)
+                unique.append(ad)
+        if unique:
+            yield Page(unique, page.on_stored)
+        else:
+            # Все объявления уже сохранены с предыдущих страниц
+            page.mark_stored()
+
+
+def store_pages(pages: Iterable[Page], db) -> Iterator[List[Dict]]:
+    """Стадия сохранения: страница за одну транзакцию, дальше - только новые.
+
+    После сохранения страница отмечается в HTTP-кеше.
+    """
+    for page in pages:
+        new_ads = db.add_advertisements_batch(page)
+        page.mark_stored()
+        yield new_ads
+
+
+def enrich_pages(batches: Iterable[List[Dict]], parser, db) -> Iterator[Dict]:
+    """Стадия деталей: год, пробег и состояние для новых объявлений страницы.
+
+    Детали загружаются только для действительно новых объявлений, пока
+    стадия загрузки читает следующие страницы.
+    """
+    for new_ads in batches:
+        if new_ads:
+            db.save_advertisement_details(parser.enrich_ads(new_ads))
+        yield from new_ads
+
+
+def run_pipeline(
+    parser,
+    db,
+    site_keys: Optional[Iterable[str]] = None,
+    backfill: bool = False,
+) -> Iterator[Dict]:
+    """Полный конвейер парсинга: возвращает новые сохраненные объявления.
+
+    Обычный цикл обходит страницы до первой без новых объявлений,
+    ``backfill`` читает всю выдачу.
+    """
+    pages = fetch_pages(
+        parser,
+        site_keys,
+        filter_new=db.filter_new_advertisements,
+        backfill=backfill,
+    )
+    return enrich_pages(store_pages(dedupe_pages(pages), db), parser, db)
@@ -0,0 +1,92 @@
+import re
+from typing import Dict, Optional, Tuple
+
+import requests
+
+import config
+
+# Обозначения валют в тексте цены (сравниваются в нижнем регистре)
+CURRENCY_MARKERS = [
+    ("USD", ("$", "usd", "у.е", "долл")),
+    ("EUR", ("€", "eur", "евро")),
+    ("BYN", ("byn", "byr", "бел", "руб", "р.", "р")),
+]
+
+# Цены без суммы
+NEGOTIABLE_MARKERS = ("договорная", "договор", "по договоренности", "обмен")
+
+# Пробелы, которыми сайты разделяют тысячи (включая неразрывные)
+_SPACE_RE = re.compile(r"[ \u00a0\u202f\u2009]")
+
+# Число с разделителями тысяч (пробел или точка) и необязательной дробной
+# частью: "1 250", "1 250,50", "1.250", "1.250,50", "900.5"
+_AMOUNT_RE = re.compile(
+    r"(?<![\d.,])(?:"
+    r"\d{1,3}(?:[ \u00a0\u202f\u2009]\d{3})+(?:[.,]\d{1,2})?"
+    r"|\d{1,3}(?:\.\d{3})+(?:,\d{1,2})?"
+    r"|\d+(?:[.,]\d{1,2})?"
+    r")(?!\d)"
+)
+
+# Точка перед тремя цифрами разделяет тысячи, а не дробную часть
+_DOT_THOUSANDS_RE = re.compile(r"\.(?=\d{3})")
+
+
+def _currency_near(before: str, after: str) -> Optional[str]:
+    """Валюта по обозначению сразу после суммы ("900 $") или перед ней ("$900")"""
+    after = after.lstrip()
+    before = before.rstrip()
+    for currency, markers in CURRENCY_MARKERS:
+        if any(after.startswith(marker) for marker in markers):
+            return currency
+    for currency, markers in CURRENCY_MARKERS:
+        if any(before.endswith(marker) for marker in markers):
+            return currency
+    return None
+
+
+def parse_price(text: Optional[str]) -> Tuple[Optional[int], Optional[str]]:
+    """Цена из текста объявления: (сумма в копейках/центах, код валюты).
+
+    ``"1 250 р."`` -> ``(125000, "BYN")``, ``"$900"`` -> ``(90000, "USD")``.
+    Берется первая сумма и обозначение валюты рядом с ней: в
+    ``"3 500 р. ≈ 1 090 $"`` цена - 3 500 BYN. Для договорной цены и текста
+    без суммы возвращает ``(None, None)``. Валюта по умолчанию - BYN.
+    """
+    if not text:
+        return None, None
+
+    lowered = text.lower()
+    if any(marker in lowered for marker in NEGOTIABLE_MARKERS):
+        return None, None
+
+    match = _AMOUNT_RE.search(lowered)
+    if not match:
+        return None, None
+
+    amount = _SPACE_RE.sub("", match.group(0))
+    amount = _DOT_THOUSANDS_RE.sub("", amount).replace(",", ".")
+    whole, _, fraction = amount.partition(".")
+    minor = int(whole) * 100 + int(fraction.ljust(2, "0"))
+
+    currency = _currency_near(lowered[: match.start()], lowered[match.end() :])
+    return minor, currency or "BYN"
+
+
+def format_price(minor: int, currency: Optional[str]) -> str:
+    """Сумма в копейках/центах текстом: ``(125000, "BYN")`` -> ``"1 250 BYN"``"""
+    amount = f"{minor / 100:,.2f}".replace(",", " ").removesuffix(".00")
+    return f"{amount} {currency or 'BYN'}"
+
+
+def fetch_exchange_rates() -> Dict[str, float]:
+    """Официальные курсы НБРБ: рублей BYN за единицу валюты"""
+    response = requests.get(config.EXCHANGE_RATES_URL, timeout=config.REQUEST_TIMEOUT)
+    response.raise_for_status()
+
+    rates = {"BYN": 1.0}
+    for item in response.json():
+        currency = item.get("Cur_Abbreviation")
+        if currency in config.EXCHANGE_RATE_CURRENCIES:
+            rates[currency] = item["Cur_OfficialRate"] / item["Cur_Scale"]
+    return rates
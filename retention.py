@@ -0,0 +1,124 @@
+"""
+Хранение объявлений: архивирование и удаление устаревших.
+
+Устаревшие объявления удаляются небольшими пачками по диапазону id, каждая
+пачка - отдельная короткая транзакция, а между пачками задача делает паузу
+и не держит блокировку записи, нужную парсеру и боту. Перед удалением
+пачка дописывается в архив: файл на каждый день добавления объявлений
+(``archive/2024-05-01.jsonl.zst``, без пакета zstandard -
+``.jsonl.gz``), в нем строка JSON на объявление вместе с историей
+изменений цены. Файлы читаются ``zstdcat``/``zcat``, DuckDB или pandas.
+В конце освободившиеся страницы возвращаются файловой системе.
+"""
+
+import gzip
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import config
+
+try:
+    import zstandard
+except ImportError:  # zstandard необязателен, архив сжимается gzip
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+
+def _json_default(value):
+    # ident хранится в базе как BLOB
+    if isinstance(value, bytes):
+        return value.hex()
+    raise TypeError(f"Не сериализуется в JSON: {type(value).__name__}")
+
+
+class ArchiveWriter:
+    """Дописывание объявлений в сжатые файлы по дням добавления.
+
+    Каждая запись - отдельный кадр zstd (или член gzip), их
+    последовательность в одном файле распаковывается как один поток.
+    """
+
+    def __init__(self, directory: str = config.ARCHIVE_DIR):
+        self.directory = directory
+        self.suffix = ".jsonl.zst" if zstandard is not None else ".jsonl.gz"
+
+    def path_for(self, day: str) -> str:
+        return os.path.join(self.directory, f"{day}{self.suffix}")
+
+    def write(self, rows: List[Dict]):
+        """Архивирование объявлений (строки с created_at)"""
+        by_day = defaultdict(list)
+        for row in rows:
+            by_day[str(row["created_at"])[:10]].append(row)
+
+        os.makedirs(self.directory, exist_ok=True)
+        for day, day_rows in by_day.items():
+            data = "".join(
+                json.dumps(row, ensure_ascii=False, default=_json_default) + "\n"
+                for row in day_rows
+            ).encode("utf-8")
+            with open(self.path_for(day), "ab") as archive:
+                archive.write(self._compress(data))
+                # Удаление идет только после того, как архив на диске
+                archive.flush()
+                os.fsync(archive.fileno())
+
+    @staticmethod
+    def _compress(data: bytes) -> bytes:
+        if zstandard is not None:
+            return zstandard.ZstdCompressor(level=config.ARCHIVE_ZSTD_LEVEL).compress(data)
+        return gzip.compress(data)
+
+
+def run_retention(
+    db,
+    days: int = config.RETENTION_DAYS,
+    writer: Optional[ArchiveWriter] = None,
+) -> Dict[str, int]:
+    """Архивирование и удаление объявлений старше ``days`` дней.
+
+    Если задачу прервать между записью архива и удалением пачки, при
+    следующем запуске пачка попадет в архив еще раз: повторы отсекаются
+    по id.
+    """
+    writer = writer or ArchiveWriter()
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).strftime(
+        "%Y-%m-%d %H:%M:%S"
+    )
+    batch_size = config.RETENTION_BATCH_SIZE
+
+    archived = deleted = 0
+    after_id = 0
+    while True:
+        rows = db.get_expired_advertisements(after_id, cutoff, batch_size)
+        if not rows:
+            break
+
+        writer.write(rows)
+        archived += len(rows)
+        deleted += db.delete_advertisements_range(rows[0]["id"], rows[-1]["id"], cutoff)
+        after_id = rows[-1]["id"]
+
+        # Неполная пачка - дальше только свежие объявления
+        if len(rows) < batch_size:
+            break
+        time.sleep(config.RETENTION_PAUSE)
+
+    # Место возвращается тоже по частям, чтобы не держать блокировку
+    freed_pages = 0
+    while deleted:
+        freed = db.incremental_vacuum(config.RETENTION_VACUUM_PAGES)
+        freed_pages += freed
+        if freed < config.RETENTION_VACUUM_PAGES:
+            break
+        time.sleep(config.RETENTION_PAUSE)
+
+    stats = {"archived": archived, "deleted": deleted, "freed_pages": freed_pages}
+    logger.info(f"Очистка старых объявлений: {stats}")
+    return stats
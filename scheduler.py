@@ -1,22 +1,147 @@
 import logging
+import sys
 import threading
 import time
+from datetime import datetime
 from parser import AdvancedParser
+from typing import Dict, Iterable, List, Optional
 
 import schedule
 
 import config
 from database import Database
+from pipeline import run_pipeline
+from prices import fetch_exchange_rates
+from retention import run_retention
 
 logger = logging.getLogger(__name__)
 
 
+class AdaptivePolling:
+    """Адаптивные интервалы опроса сайтов.
+
+    Для каждого сайта ведется сглаженная (EWMA) оценка числа новых
+    объявлений в минуту и частоты изменения страницы выдачи. Интервал
+    подбирается так, чтобы за один опрос в среднем появлялось около
+    ``POLL_TARGET_EVENTS`` событий, в пределах ``POLL_MIN_INTERVAL`` ..
+    ``POLL_MAX_INTERVAL`` минут. Если сумма опросов в час превышает
+    ``POLL_BUDGET_PER_HOUR``, все интервалы пропорционально растягиваются.
+    """
+
+    # Вес изменения страницы без новых объявлений относительно нового объявления
+    CHANGE_WEIGHT = 0.5
+
+    def __init__(self, site_keys: Iterable[str]):
+        now = time.time()
+        self.sites: Dict[str, Dict] = {
+            site_key: {
+                "interval": float(config.PARSING_INTERVAL),
+                "next_run": now,
+                "last_run": None,
+                "new_rate": None,
+                "change_rate": None,
+            }
+            for site_key in site_keys
+        }
+        self._lock = threading.Lock()
+
+    def due_sites(self, now: Optional[float] = None) -> List[str]:
+        """Сайты, которые пора опросить"""
+        now = time.time() if now is None else now
+        with self._lock:
+            return [key for key, site in self.sites.items() if site["next_run"] <= now]
+
+    def record(
+        self,
+        site_key: str,
+        new_ads: int,
+        changed: bool,
+        success: bool = True,
+        now: Optional[float] = None,
+    ):
+        """Учет результата опроса сайта и пересчет интервалов"""
+        now = time.time() if now is None else now
+        with self._lock:
+            site = self.sites[site_key]
+
+            if success:
+                elapsed = (
+                    (now - site["last_run"]) / 60
+                    if site["last_run"]
+                    else site["interval"]
+                )
+                elapsed = max(elapsed, 1.0)
+                site["new_rate"] = self._smooth(site["new_rate"], new_ads / elapsed)
+                site["change_rate"] = self._smooth(
+                    site["change_rate"], (1.0 if changed else 0.0) / elapsed
+                )
+                site["last_run"] = now
+
+            self._recompute()
+            # Неудачный опрос повторяем не раньше обычного интервала
+            site["next_run"] = now + site["interval"] * 60
+
+    def next_run(self) -> Optional[datetime]:
+        """Время ближайшего опроса"""
+        with self._lock:
+            if not self.sites:
+                return None
+            return datetime.fromtimestamp(
+                min(site["next_run"] for site in self.sites.values())
+            )
+
+    def get_info(self) -> Dict[str, Dict]:
+        """Текущие интервалы и оценки активности по сайтам"""
+        with self._lock:
+            return {
+                site_key: {
+                    "interval_minutes": round(site["interval"], 1),
+                    "next_run": datetime.fromtimestamp(site["next_run"]),
+                    "new_per_hour": round((site["new_rate"] or 0) * 60, 2),
+                    "changes_per_hour": round((site["change_rate"] or 0) * 60, 2),
+                }
+                for site_key, site in self.sites.items()
+            }
+
+    @staticmethod
+    def _smooth(previous: Optional[float], sample: float) -> float:
+        if previous is None:
+            return sample
+        return config.POLL_SMOOTHING * sample + (1 - config.POLL_SMOOTHING) * previous
+
+    def _recompute(self):
+        """Пересчет интервалов всех сайтов с учетом общего бюджета"""
+        for site in self.sites.values():
+            if site["new_rate"] is None:
+                # Сайт еще не опрашивался
+                continue
+            events_per_minute = (
+                site["new_rate"] + self.CHANGE_WEIGHT * site["change_rate"]
+            )
+            interval = (
+                config.POLL_TARGET_EVENTS / events_per_minute
+                if events_per_minute > 0
+                else config.POLL_MAX_INTERVAL
+            )
+            site["interval"] = min(
+                max(interval, config.POLL_MIN_INTERVAL), config.POLL_MAX_INTERVAL
+            )
+
+        polls_per_hour = sum(60 / site["interval"] for site in self.sites.values())
+        if polls_per_hour > config.POLL_BUDGET_PER_HOUR:
+            scale = polls_per_hour / config.POLL_BUDGET_PER_HOUR
+            for site in self.sites.values():
+                site["interval"] = min(site["interval"] * scale, config.POLL_MAX_INTERVAL)
+
+
 class ParsingScheduler:
     def __init__(self):
         self.db = Database()
         self.parser = AdvancedParser()
+        self.polling = AdaptivePolling(config.PARSING_SITES.keys())
         self.is_running = False
         self.thread = None
+        self._run_lock = threading.Lock()
 
     def start_scheduler(self):
         """Запуск планировщика в отдельном потоке"""
@@ -26,15 +151,25 @@ class ParsingScheduler:
 
         self.is_running = True
 
-        # Настраиваем расписание
-        schedule.every(config.PARSING_INTERVAL).minutes.do(self.run_parsing)
+        # Раз в минуту опрашиваем сайты, для которых подошло время
+        schedule.every(1).minutes.do(self.run_due_sites)
+
+        # Курсы валют для фильтра по цене; первый раз - сразу в потоке
+        # планировщика, чтобы запуск не ждал ответа НБРБ
+        schedule.every(config.EXCHANGE_RATES_REFRESH_HOURS).hours.do(
+            self.refresh_exchange_rates
+        )
+
+        # Архивирование и удаление старых объявлений - отдельно от парсинга
+        schedule.every(config.RETENTION_INTERVAL_HOURS).hours.do(self.run_retention)
 
         # Запускаем планировщик в отдельном потоке
         self.thread = threading.Thread(target=self._run_scheduler, daemon=True)
         self.thread.start()
 
         logger.info(
-            f"Планировщик запущен. Парсинг каждые {config.PARSING_INTERVAL} минут"
+            f"Планировщик запущен. Интервалы опроса сайтов от "
+            f"{config.POLL_MIN_INTERVAL} до {config.POLL_MAX_INTERVAL} минут"
         )
 
     def stop_scheduler(self):
@@ -46,6 +181,7 @@ class ParsingScheduler:
 
     def _run_scheduler(self):
         """Основной цикл планировщика"""
+        self.refresh_exchange_rates()
         while self.is_running:
             try:
                 schedule.run_pending()
@@ -54,30 +190,97 @@ class ParsingScheduler:
                 logger.error(f"Ошибка в планировщике: {e}")
                 time.sleep(300)  # Ждем 5 минут при ошибке
 
-    def run_parsing(self):
-        """Выполнение парсинга всех сайтов"""
+    def run_due_sites(self):
+        """Парсинг сайтов, для которых подошло время опроса"""
+        due_sites = self.polling.due_sites()
+        if due_sites:
+            self.run_parsing(due_sites)
+
+    def run_parsing(self, site_keys: Optional[List[str]] = None):
+        """Выполнение парсинга сайтов (по умолчанию всех)"""
+        if site_keys is None:
+            site_keys = list(config.PARSING_SITES.keys())
+
+        with self._run_lock:
+            self._run_parsing(site_keys)
+
+    def _run_parsing(self, site_keys: List[str]):
         try:
-            logger.info("🔄 Запуск автоматического парсинга...")
+            logger.info(f"🔄 Запуск автоматического парсинга: {', '.join(site_keys)}")
+            started_at = time.time()
 
-            # Парсим все сайты
-            new_ads = self.parser.parse_all_sites()
+            # Объявления сохраняются по мере загрузки страниц, обход идет до
+            # первой страницы без новых объявлений; детали новых загружает
+            # сам конвейер
+            added_ads = list(run_pipeline(self.parser, self.db, site_keys))
+            added_count = len(added_ads)
 
-            # Сохраняем в базу данных
-            added_count = 0
-            for ad in new_ads:
-                if self.db.add_advertisement(ad):
-                    added_count += 1
+            # Поиск в боте не будет перепарсивать свежие сайты
+            parsed_sites = self.parser.sites_parsed_since(started_at)
+            self.db.mark_sites_parsed(parsed_sites)
+
+            # Подстраиваем интервалы опроса под активность сайтов
+            for site_key in site_keys:
+                status = self.parser.site_status.get(site_key, {})
+                self.polling.record(
+                    site_key,
+                    new_ads=sum(1 for ad in added_ads if ad["site_key"] == site_key),
+                    changed=status.get("changed", False),
+                    success=site_key in parsed_sites,
+                )
 
             logger.info(
                 f"✅ Парсинг завершен. Добавлено {added_count} новых объявлений"
             )
+            logger.info(f"Кеш страниц (попадания/промахи): {self.parser.cache.get_stats()}")
 
-            # Очищаем старые объявления (старше 30 дней)
-            self.db.cleanup_old_ads(days=30)
+            unhealthy = {
+                host: state
+                for host, state in self.parser.health.snapshot().items()
+                if state["state"] != "closed"
+            }
+            if unhealthy:
+                logger.warning(f"⚠️ Отключены предохранителем: {unhealthy}")
 
         except Exception as e:
             logger.error(f"❌ Ошибка при автоматическом парсинге: {e}")
 
+    def run_backfill(self):
+        """Разовая глубокая загрузка всех страниц выдачи"""
+        try:
+            logger.info("📚 Запуск глубокой загрузки объявлений...")
+            started_at = time.time()
+
+            added_count = 0
+            for _ in run_pipeline(self.parser, self.db, backfill=True):
+                added_count += 1
+
+            self.db.mark_sites_parsed(self.parser.sites_parsed_since(started_at))
+
+            logger.info(
+                f"✅ Глубокая загрузка завершена. Добавлено {added_count} объявлений"
+            )
+
+        except Exception as e:
+            logger.error(f"❌ Ошибка при глубокой загрузке: {e}")
+
+    def run_retention(self):
+        """Архивирование и удаление объявлений старше RETENTION_DAYS дней"""
+        try:
+            run_retention(self.db)
+        except Exception as e:
+            logger.error(f"❌ Ошибка при очистке старых объявлений: {e}")
+
+    def refresh_exchange_rates(self):
+        """Обновление курсов валют в базе"""
+        try:
+            rates = fetch_exchange_rates()
+            self.db.save_exchange_rates(rates)
+            logger.info(f"Курсы валют обновлены: {rates}")
+        except Exception as e:
+            # Фильтр продолжит работать по последним сохраненным курсам
+            logger.error(f"Ошибка при обновлении курсов валют: {e}")
+
     def run_parsing_now(self):
         """Запуск парсинга немедленно"""
         logger.info("🚀 Запуск немедленного парсинга...")
@@ -85,10 +288,7 @@ class ParsingScheduler:
 
     def get_next_run_time(self):
         """Получение времени следующего запуска"""
-        jobs = schedule.get_jobs()
-        if jobs:
-            return jobs[0].next_run
-        return None
+        return self.polling.next_run()
 
     def get_schedule_info(self):
         """Получение информации о расписании"""
@@ -97,6 +297,8 @@ class ParsingScheduler:
             "is_running": self.is_running,
             "next_run": self.get_next_run_time(),
             "interval_minutes": config.PARSING_INTERVAL,
+            "sites": self.polling.get_info(),
+            "hosts": self.parser.health.snapshot(),
             "total_jobs": len(jobs),
         }
         return info
@@ -106,6 +308,19 @@ def main():
     """Тестирование планировщика"""
     scheduler = ParsingScheduler()
 
+    if "--backfill" in sys.argv:
+        scheduler.run_backfill()
+        return
+
+    if "--retention" in sys.argv:
+        scheduler.run_retention()
+        return
+
+    if "--recompute-stats" in sys.argv:
+        scheduler.db.recompute_statistics()
+        logger.info("Статистика пересчитана")
+        return
+
     try:
         # Запускаем планировщик
         scheduler.start_scheduler()
@@ -0,0 +1,87 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+import config
+from db_executor import ExecutorDatabase
+from pipeline import run_pipeline
+
+logger = logging.getLogger(__name__)
+
+
+class LocalSearch:
+    """Поиск по объявлениям, уже сохраненным планировщиком.
+
+    Все обращения к базе идут через ``DatabaseExecutor``. Сайты, данные
+    которых старше окна свежести ``SEARCH_FRESHNESS_MINUTES``,
+    перепарсиваются в фоновом потоке: поиск отвечает сразу по сохраненным
+    объявлениям и не ждет загрузки. Одновременно идет не больше одного
+    обновления.
+    """
+
+    def __init__(
+        self, db_executor, parser, freshness_minutes: int = config.SEARCH_FRESHNESS_MINUTES
+    ):
+        self.db_executor = db_executor
+        self.parser = parser
+        self.freshness_minutes = freshness_minutes
+        self._lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+
+    @property
+    def is_refreshing(self) -> bool:
+        """Идет ли сейчас фоновое обновление сайтов"""
+        thread = self._refresh_thread
+        return thread is not None and thread.is_alive()
+
+    def search(self, query: str, limit: int = 20) -> List[Dict]:
+        """Поиск объявлений; устаревшие сайты обновляются в фоне"""
+        try:
+            self.refresh_stale_sites_in_background()
+        except Exception as e:
+            # Устаревшие данные лучше, чем отсутствие ответа
+            logger.error(f"Ошибка при обновлении данных для поиска: {e}")
+
+        return self.db_executor.call("search_advertisements", query, limit=limit)
+
+    def refresh_stale_sites_in_background(self) -> bool:
+        """Запуск обновления устаревших сайтов в фоновом потоке.
+
+        Возвращает True, если обновление идет (запущено сейчас или раньше).
+        """
+        if self.is_refreshing:
+            return True
+
+        stale_sites = self.db_executor.call(
+            "get_stale_sites", list(config.PARSING_SITES.keys()), self.freshness_minutes
+        )
+        if not stale_sites:
+            return False
+
+        with self._lock:
+            if self.is_refreshing:
+                return True
+            self._refresh_thread = threading.Thread(
+                target=self._refresh_logged, args=(stale_sites,), daemon=True
+            )
+            self._refresh_thread.start()
+        return True
+
+    def _refresh_logged(self, stale_sites: List[str]):
+        try:
+            self.refresh_stale_sites(stale_sites)
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении данных для поиска: {e}")
+
+    def refresh_stale_sites(self, stale_sites: List[str]):
+        """Парсинг сайтов, данные которых устарели (в текущем потоке)"""
+        logger.info(f"Обновление устаревших сайтов: {stale_sites}")
+        started_at = time.time()
+
+        # Запись идет через поток записи исполнителя
+        db = ExecutorDatabase(self.db_executor)
+        for _ in run_pipeline(self.parser, db, stale_sites):
+            pass
+
+        db.mark_sites_parsed(self.parser.sites_parsed_since(started_at))
@@ -0,0 +1,88 @@
+"""
+SimHash для поиска почти одинаковых объявлений.
+
+Одно объявление продавцы выкладывают на несколько сайтов с немного
+разными заголовками. SimHash переводит набор слов в 64-битный отпечаток,
+у похожих текстов отпечатки отличаются в нескольких битах. Отпечаток
+режется на ``SIMHASH_BANDS`` полос: два отпечатка на расстоянии меньше
+числа полос совпадают хотя бы в одной полосе, поэтому кандидатов
+ищут точным поиском по полосам, а не перебором всех объявлений.
+"""
+
+import hashlib
+import sys
+from collections import Counter
+from functools import lru_cache
+from typing import Iterable, List, Tuple
+
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 4
+BAND_BITS = SIMHASH_BITS // SIMHASH_BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+HASH_MASK = (1 << SIMHASH_BITS) - 1
+
+LANE_BITS = 32  # размер "I" в memoryview.cast
+# Биты байта, разнесенные по счетчикам: бит i -> счетчик i
+_SPREAD = [
+    sum((byte >> bit & 1) << (bit * LANE_BITS) for bit in range(8)) for byte in range(256)
+]
+# Разнесенных хешей слов в кеше (около 300 байт на слово)
+FEATURE_CACHE_SIZE = 16384
+
+
+@lru_cache(maxsize=FEATURE_CACHE_SIZE)
+def _feature_spread(feature: str) -> int:
+    """Биты хеша признака, разнесенные по счетчикам.
+
+    Слова объявлений часто повторяются, поэтому разнесение (8 сдвигов
+    длинного числа) считается один раз на слово.
+    """
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+    spread = 0
+    for index, byte in enumerate(reversed(digest)):
+        spread |= _SPREAD[byte] << (index * 8 * LANE_BITS)
+    return spread
+
+
+def simhash(features: Iterable[str]) -> int:
+    """Отпечаток набора признаков (повторы признака увеличивают его вес).
+
+    Возвращается как знаковое 64-битное число, чтобы храниться в INTEGER
+    SQLite.
+    """
+    # Все 64 счетчика битов лежат в одном большом числе по LANE_BITS
+    # битов на счетчик: признак добавляется одним сложением, а не циклом
+    # по битам
+    counters = 0
+    total = 0
+    for feature, count in Counter(features).items():
+        counters += count * _feature_spread(feature)
+        total += count
+
+    # Бит ставится, если признаков с ним больше половины (по весу)
+    raw = counters.to_bytes(SIMHASH_BITS * LANE_BITS // 8, sys.byteorder)
+    lanes = memoryview(raw).cast("I")
+    fingerprint = 0
+    for bit, counter in enumerate(lanes):
+        if 2 * counter > total:
+            fingerprint |= 1 << bit
+
+    if fingerprint >> (SIMHASH_BITS - 1):
+        fingerprint -= 1 << SIMHASH_BITS
+    return fingerprint
+
+
+def band_values(fingerprint: int) -> List[Tuple[int, int]]:
+    """(номер полосы, значение) для поиска кандидатов.
+
+    Совпадает с ``(simhash >> band * BAND_BITS) & BAND_MASK`` в SQL.
+    """
+    return [
+        (band, (fingerprint >> band * BAND_BITS) & BAND_MASK)
+        for band in range(SIMHASH_BANDS)
+    ]
+
+
+def hamming_distance(first: int, second: int) -> int:
+    """Число различающихся битов двух отпечатков"""
+    return bin((first ^ second) & HASH_MASK).count("1")
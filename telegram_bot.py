@@ -1,13 +1,19 @@
 import logging
+import re
 import time
 from datetime import datetime
 from parser import AdvancedParser
+from typing import Dict, List, Optional, Tuple
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ParseMode, Update
 from telegram.ext import CallbackContext, CallbackQueryHandler, CommandHandler, Updater
 
 import config
 from database import Database
+from db_executor import DatabaseExecutor
+from pipeline import run_pipeline
+from prices import format_price
+from search import LocalSearch
 
 # Настройка логирования
 logging.basicConfig(
@@ -19,7 +25,11 @@ logger = logging.getLogger(__name__)
 class JawaCzBot:
     def __init__(self):
         self.db = Database()
+        # Обработчики обращаются к базе через исполнитель: запись одним потоком,
+        # чтение параллельно и без ожидания записи
+        self.db_executor = DatabaseExecutor(self.db)
         self.parser = AdvancedParser()
+        self.search = LocalSearch(self.db_executor, self.parser)
         self.application = None
 
     def start(self, update: Update, context: CallbackContext):
@@ -32,8 +42,11 @@ class JawaCzBot:
 *Доступные команды:*
 • /search - Поиск объявлений
 • /latest - Последние объявления
+• /readall - Отметить все объявления прочитанными
+• /drops - Подешевевшие объявления
 • /stats - Статистика
 • /sites - Объявления по сайтам
+• /price - Фильтр по цене
 • /help - Справка
 
         *Настроенные сайты:*
@@ -57,6 +70,10 @@ class JawaCzBot:
         update.message.reply_text(
             welcome_text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup
         )
+        # Новыми для нового пользователя считаются только последние объявления
+        self.db_executor.fire(
+            "start_read_mark", update.effective_user.id, config.ADS_PAGE_SIZE
+        )
 
     def help_command(self, update: Update, context: CallbackContext):
         """Обработчик команды /help"""
@@ -67,8 +84,11 @@ class JawaCzBot:
 • `/start` - Главное меню
 • `/search` - Поиск объявлений
 • `/latest` - Последние объявления
+• `/readall` - Отметить все объявления прочитанными
+• `/drops` - Объявления, подешевевшие за последние сутки
 • `/stats` - Статистика по объявлениям
 • `/sites` - Объявления по конкретным сайтам
+• `/price 500 3000` - Показывать объявления от 500 до 3000 BYN (`/price сброс` - без фильтра)
 
 *Поиск:*
 • Используйте `/search` для поиска по ключевым словам
@@ -77,7 +97,7 @@ class JawaCzBot:
 
 *Уведомления:*
 • Бот автоматически проверяет новые объявления каждые 30 минут
-• Новые объявления помечаются как "новые"
+• `/latest` показывает объявления, которые вы еще не видели
 
 *Поддерживаемые сайты:*
 • Куфар - Jawa (Беларусь) - auto.kufar.by
@@ -117,9 +137,16 @@ class JawaCzBot:
         try:
             logger.info(f"🔍 Начинаю поиск по запросу: {query}")
             
-            ads = self.parser.search_specific_model(query)
-            
-            logger.info(f"📊 Парсер вернул {len(ads)} объявлений")
+            # Ищем по сохраненным объявлениям; устаревшие сайты обновляются
+            # в фоне, не задерживая ответ
+            ads = self.search.search(query)
+            if self.search.is_refreshing:
+                update.message.reply_text(
+                    "🔄 Данные некоторых сайтов обновляются. "
+                    "Повторите поиск через пару минут, чтобы увидеть новые объявления."
+                )
+
+            logger.info(f"📊 Найдено в базе {len(ads)} объявлений")
             if ads:
                 logger.info(f"📝 Пример первого объявления: {ads[0]}")
             
@@ -145,33 +172,152 @@ class JawaCzBot:
 
     def latest_command(self, update: Update, context: CallbackContext):
         """Обработчик команды /latest"""
-        update.message.reply_text("📰 Получаю последние объявления...")
-
         try:
-            # Получаем новые объявления из базы
-            new_ads = self.db.get_new_advertisements(limit=20)
+            user_id = update.effective_user.id
+            price_range = self.db_executor.submit("get_price_range", user_id)
+            # Без границы прочитанного новой была бы вся база с первого id
+            if not self.db_executor.call("get_last_seen_id", user_id):
+                self.db_executor.call("start_read_mark", user_id, config.ADS_PAGE_SIZE)
+            price_range = price_range.result()
+
+            # Сначала объявления, которых пользователь еще не видел (старые
+            # первыми); объявление, выложенное на нескольких сайтах,
+            # показывается один раз
+            ads, has_next = self.db_executor.call(
+                "get_unread_advertisements",
+                user_id,
+                limit=config.ADS_PAGE_SIZE,
+                price_range=price_range,
+                one_per_cluster=True,
+            )
+            if ads:
+                self._reply_unread_page(
+                    update.message.reply_text, user_id, ads, has_next, price_range
+                )
+                return
 
-            if not new_ads:
-                update.message.reply_text("📭 Новых объявлений пока нет.")
+            # Новых нет - обычная лента, свежие первыми
+            ads, has_next = self.db_executor.call(
+                "get_advertisements_page",
+                limit=config.ADS_PAGE_SIZE,
+                price_range=price_range,
+                one_per_cluster=True,
+            )
+            if not ads:
+                update.message.reply_text("📭 Объявлений пока нет.")
                 return
 
-            self._send_ads_results(update, new_ads, "📰 Последние объявления:")
+            text, reply_markup = self._render_ads_page(
+                "latest",
+                ads,
+                False,
+                has_next,
+                self.db_executor.call("get_last_seen_id", user_id),
+                price_range,
+                self._cluster_sources("latest", ads),
+            )
+            update.message.reply_text(
+                text, reply_markup=reply_markup, disable_web_page_preview=True
+            )
 
         except Exception as e:
             logger.error(f"Ошибка при получении последних объявлений: {e}")
             update.message.reply_text("❌ Произошла ошибка. Попробуйте позже.")
 
+    def _reply_unread_page(
+        self,
+        send,
+        user_id: int,
+        ads: list,
+        has_next: bool,
+        price_range: Optional[Tuple[int, int]],
+    ):
+        """Показ страницы непрочитанных объявлений и сдвиг границы прочитанного.
+
+        ``send`` - ``reply_text`` для нового сообщения или
+        ``edit_message_text`` для перехода по страницам. Граница сдвигается
+        только до последнего показанного объявления.
+        """
+        text, reply_markup = self._render_ads_page(
+            "unread",
+            ads,
+            False,
+            has_next,
+            # Все объявления страницы новые
+            0,
+            price_range,
+            self._cluster_sources("unread", ads),
+        )
+        send(text, reply_markup=reply_markup, disable_web_page_preview=True)
+        self.db_executor.fire("mark_read_up_to", user_id, ads[-1]["id"])
+
+    def drops_command(self, update: Update, context: CallbackContext):
+        """Обработчик команды /drops"""
+        try:
+            drops = self.db_executor.call(
+                "get_price_drops", config.PRICE_DROPS_HOURS, config.ADS_PAGE_SIZE
+            )
+            if not drops:
+                update.message.reply_text(
+                    f"📭 За последние {config.PRICE_DROPS_HOURS} ч цены не снижались."
+                )
+                return
+
+            lines = [f"📉 Подешевели за последние {config.PRICE_DROPS_HOURS} ч:"]
+            for number, ad in enumerate(drops, 1):
+                currency = ad["price_currency"]
+                lines.append(
+                    f"\n{number}. 🏍️ {ad['title']}\n"
+                    f"💰 {format_price(ad['old_price_minor'], currency)} → "
+                    f"{format_price(ad['price_minor'], currency)} "
+                    f"(−{format_price(-ad['price_change'], currency)}) · 🌐 {ad['site_name']}\n"
+                    f"🔗 {ad['link']}"
+                )
+
+            buttons = [
+                InlineKeyboardButton(str(number), callback_data=f"ad_{ad['id']}")
+                for number, ad in enumerate(drops, 1)
+            ]
+            keyboard = [buttons[i : i + 5] for i in range(0, len(buttons), 5)]
+            update.message.reply_text(
+                "\n".join(lines),
+                reply_markup=InlineKeyboardMarkup(keyboard),
+                disable_web_page_preview=True,
+            )
+
+        except Exception as e:
+            logger.error(f"Ошибка при получении снижений цен: {e}")
+            update.message.reply_text("❌ Произошла ошибка. Попробуйте позже.")
+
+    def readall_command(self, update: Update, context: CallbackContext):
+        """Обработчик команды /readall"""
+        try:
+            self.db_executor.call("mark_all_read", update.effective_user.id)
+            update.message.reply_text("✅ Все объявления отмечены прочитанными.")
+        except Exception as e:
+            logger.error(f"Ошибка при отметке объявлений прочитанными: {e}")
+            update.message.reply_text("❌ Произошла ошибка. Попробуйте позже.")
+
     def stats_command(self, update: Update, context: CallbackContext):
         """Обработчик команды /stats"""
         try:
-            stats = self.db.get_statistics()
+            user_id = update.effective_user.id
+            stats = self.db_executor.submit("get_statistics")
+            # Считаются так же, как их покажет /latest
+            unread = self.db_executor.call(
+                "count_unread_advertisements",
+                user_id,
+                price_range=self.db_executor.call("get_price_range", user_id),
+                one_per_cluster=True,
+            )
+            stats = stats.result()
 
             stats_text = f"""
 📊 *Статистика объявлений*
 
 📈 *Общая статистика:*
 • Всего объявлений: {stats['total_ads']}
-• Новых объявлений: {stats['new_ads']}
+• Новых для вас: {unread}
 
 🌐 *По сайтам:*
 """
@@ -179,6 +325,11 @@ class JawaCzBot:
             for site, count in stats["site_stats"].items():
                 stats_text += f"• {site}: {count}\n"
 
+            if stats["daily"]:
+                stats_text += "\n📅 *Новые по дням:*\n"
+                for day, sites in stats["daily"].items():
+                    stats_text += f"• {day}: {sum(sites.values())}\n"
+
             stats_text += (
                 f"\n⏰ Последнее обновление: {datetime.now().strftime('%H:%M:%S')}"
             )
@@ -189,6 +340,45 @@ class JawaCzBot:
             logger.error(f"Ошибка при получении статистики: {e}")
             update.message.reply_text("❌ Ошибка при получении статистики.")
 
+    def price_command(self, update: Update, context: CallbackContext):
+        """Обработчик команды /price"""
+        user_id = update.effective_user.id
+        args = context.args or []
+
+        try:
+            if not args:
+                price_range = self.db_executor.call("get_price_range", user_id)
+                current = (
+                    f"от {price_range[0]} до {price_range[1]} BYN"
+                    if price_range
+                    else "не задан"
+                )
+                update.message.reply_text(
+                    f"💰 Фильтр по цене: {current}\n\n"
+                    "Задать: /price 500 3000\nСбросить: /price сброс\n"
+                    "Цены в USD и EUR пересчитываются по курсу НБРБ."
+                )
+                return
+
+            if args[0].lower() in ("сброс", "off", "reset"):
+                self.db_executor.call("set_price_range", user_id)
+                update.message.reply_text("✅ Фильтр по цене сброшен.")
+                return
+
+            if len(args) != 2 or not all(arg.isdigit() for arg in args):
+                update.message.reply_text("❌ Укажите две суммы в BYN: /price 500 3000")
+                return
+
+            min_price, max_price = sorted(int(arg) for arg in args)
+            self.db_executor.call("set_price_range", user_id, min_price, max_price)
+            update.message.reply_text(
+                f"✅ Показываю объявления от {min_price} до {max_price} BYN."
+            )
+
+        except Exception as e:
+            logger.error(f"Ошибка при настройке фильтра по цене: {e}")
+            update.message.reply_text("❌ Произошла ошибка. Попробуйте позже.")
+
     def sites_command(self, update: Update, context: CallbackContext):
         """Обработчик команды /sites"""
         keyboard = []
@@ -215,22 +405,24 @@ class JawaCzBot:
         query = update.callback_query
         query.answer()
 
+        # Фейковый update для команд: сообщение с кнопкой и нажавший пользователь
+        fake_update = type(
+            "Update", (), {"message": query.message, "effective_user": query.from_user}
+        )()
+
         if query.data == "search":
-            # Создаем фейковый update для команды поиска
-            fake_update = type("Update", (), {"message": query.message})()
             self.search_command(fake_update, context)
         elif query.data == "latest":
-            fake_update = type("Update", (), {"message": query.message})()
             self.latest_command(fake_update, context)
         elif query.data == "stats":
-            fake_update = type("Update", (), {"message": query.message})()
             self.stats_command(fake_update, context)
         elif query.data == "sites":
-            fake_update = type("Update", (), {"message": query.message})()
             self.sites_command(fake_update, context)
         elif query.data.startswith("site_"):
             site_key = query.data.replace("site_", "")
             self._show_site_ads(update, context, site_key)
+        elif query.data.startswith("pg|"):
+            self._show_ads_page(update, query.data)
         elif query.data.startswith("ad_"):
             ad_id = int(query.data.replace("ad_", ""))
             self._show_ad_details(update, context, ad_id)
@@ -238,8 +430,14 @@ class JawaCzBot:
     def _show_site_ads(self, update: Update, context: CallbackContext, site_key: str):
         """Показать объявления с конкретного сайта"""
         try:
-            site_ads = self.db.get_advertisements_by_site(
-                config.PARSING_SITES[site_key]["name"], limit=15
+            price_range = self.db_executor.call(
+                "get_price_range", update.callback_query.from_user.id
+            )
+            site_ads, has_next = self.db_executor.call(
+                "get_advertisements_page",
+                site_name=config.PARSING_SITES[site_key]["name"],
+                limit=config.ADS_PAGE_SIZE,
+                price_range=price_range,
             )
 
             if not site_ads:
@@ -248,10 +446,11 @@ class JawaCzBot:
                 )
                 return
 
-            self._send_ads_results(
-                update,
-                site_ads,
-                f"🌐 Объявления с сайта {config.PARSING_SITES[site_key]['name']}:",
+            text, reply_markup = self._render_ads_page(
+                site_key, site_ads, False, has_next, price_range=price_range
+            )
+            update.callback_query.edit_message_text(
+                text, reply_markup=reply_markup, disable_web_page_preview=True
             )
 
         except Exception as e:
@@ -260,20 +459,196 @@ class JawaCzBot:
                 "❌ Ошибка при получении объявлений."
             )
 
+    def _show_ads_page(self, update: Update, data: str):
+        """Переход на соседнюю страницу /latest или /sites (правка сообщения)"""
+        try:
+            scope, direction, cursor = self._decode_page_cursor(data)
+            user_id = update.callback_query.from_user.id
+            price_range = self.db_executor.call("get_price_range", user_id)
+
+            if scope == "unread":
+                ads, has_next = self.db_executor.call(
+                    "get_unread_advertisements",
+                    user_id,
+                    after_id=cursor[1],
+                    limit=config.ADS_PAGE_SIZE,
+                    price_range=price_range,
+                    one_per_cluster=True,
+                )
+                if ads:
+                    self._reply_unread_page(
+                        update.callback_query.edit_message_text,
+                        user_id,
+                        ads,
+                        has_next,
+                        price_range,
+                    )
+                    return
+                # Новые закончились - показываем ленту с начала
+                scope, direction, cursor = "latest", "next", None
+
+            site_name = None if scope == "latest" else config.PARSING_SITES[scope]["name"]
+            ads, has_more = self.db_executor.call(
+                "get_advertisements_page",
+                site_name=site_name,
+                cursor=cursor,
+                direction=direction,
+                limit=config.ADS_PAGE_SIZE,
+                price_range=price_range,
+                one_per_cluster=site_name is None,
+            )
+            if not ads and cursor is not None:
+                # Объявления на той странице уже удалены - начинаем сначала
+                ads, has_more = self.db_executor.call(
+                    "get_advertisements_page",
+                    site_name=site_name,
+                    limit=config.ADS_PAGE_SIZE,
+                    price_range=price_range,
+                    one_per_cluster=site_name is None,
+                )
+                direction, cursor = "next", None
+            if not ads:
+                update.callback_query.edit_message_text("📭 Объявлений пока нет.")
+                return
+
+            # Страница в обратную сторону есть всегда: мы пришли оттуда
+            if direction == "prev":
+                has_prev, has_next = has_more, True
+            else:
+                has_prev, has_next = cursor is not None, has_more
+
+            # Непрочитанные объявления помечаются 🆕 на любой странице ленты
+            last_seen_id = (
+                self.db_executor.call("get_last_seen_id", user_id)
+                if scope == "latest"
+                else None
+            )
+            text, reply_markup = self._render_ads_page(
+                scope,
+                ads,
+                has_prev,
+                has_next,
+                last_seen_id,
+                price_range,
+                self._cluster_sources(scope, ads),
+            )
+            update.callback_query.edit_message_text(
+                text, reply_markup=reply_markup, disable_web_page_preview=True
+            )
+
+        except Exception as e:
+            logger.error(f"Ошибка при переходе по страницам объявлений: {e}")
+
+    def _render_ads_page(
+        self,
+        scope: str,
+        ads: list,
+        has_prev: bool,
+        has_next: bool,
+        last_seen_id: Optional[int] = None,
+        price_range: Optional[Tuple[int, int]] = None,
+        sources: Optional[Dict[int, List[dict]]] = None,
+    ):
+        """Текст и кнопки страницы объявлений.
+
+        ``sources`` - объявления кластеров по cluster_id: копии объявления
+        с других сайтов перечисляются под ним.
+        """
+        if scope == "unread":
+            lines = ["🆕 Новые для вас объявления:"]
+        elif scope == "latest":
+            lines = ["📰 Последние объявления:"]
+        else:
+            lines = [f"🌐 Объявления с сайта {config.PARSING_SITES[scope]['name']}:"]
+        if price_range:
+            lines.append(f"💰 Цена от {price_range[0]} до {price_range[1]} BYN")
+
+        for number, ad in enumerate(ads, 1):
+            mark = "🆕 " if last_seen_id is not None and ad["id"] > last_seen_id else ""
+            lines.append(
+                f"\n{number}. {mark}🏍️ {ad.get('title', 'Без заголовка')}\n"
+                f"💰 {ad.get('price') or 'Цена не указана'} · 🌐 {ad.get('site_name', '')}\n"
+                f"🔗 {ad.get('link', '')}"
+                + self._format_other_sources(ad, sources)
+            )
+
+        # Кнопки подробностей по номерам объявлений, по 5 в ряд
+        detail_buttons = [
+            InlineKeyboardButton(str(number), callback_data=f"ad_{ad['id']}")
+            for number, ad in enumerate(ads, 1)
+        ]
+        keyboard = [detail_buttons[i : i + 5] for i in range(0, len(detail_buttons), 5)]
+
+        navigation = []
+        if has_prev:
+            navigation.append(
+                InlineKeyboardButton(
+                    "◀️ Новее", callback_data=self._encode_page_cursor(scope, "prev", ads[0])
+                )
+            )
+        if has_next:
+            # Новые объявления идут от старых к свежим
+            label = "Дальше ▶️" if scope == "unread" else "Старше ▶️"
+            navigation.append(
+                InlineKeyboardButton(
+                    label, callback_data=self._encode_page_cursor(scope, "next", ads[-1])
+                )
+            )
+        if navigation:
+            keyboard.append(navigation)
+
+        return "\n".join(lines), InlineKeyboardMarkup(keyboard)
+
+    def _cluster_sources(self, scope: str, ads: list) -> Dict[int, List[dict]]:
+        """Источники кластеров объявлений страницы (только для /latest)"""
+        if scope not in ("latest", "unread"):
+            return {}
+        return self.db_executor.call(
+            "get_cluster_sources", [ad["cluster_id"] for ad in ads if ad.get("cluster_id")]
+        )
+
+    @staticmethod
+    def _format_other_sources(ad: dict, sources: Optional[Dict[int, List[dict]]]) -> str:
+        """Строки с копиями объявления на других сайтах"""
+        others = [
+            source
+            for source in (sources or {}).get(ad.get("cluster_id"), [])
+            if source["id"] != ad.get("id")
+        ]
+        return "".join(
+            f"\n🔁 Также: {source['site_name']} · {source['price'] or 'Цена не указана'}"
+            f" · {source['link']}"
+            for source in others
+        )
+
+    @staticmethod
+    def _encode_page_cursor(scope: str, direction: str, ad: dict) -> str:
+        """callback_data перехода на страницу: ``pg|область|направление|время|id``.
+
+        Время хранится только цифрами, чтобы уложиться в 64 байта Telegram.
+        """
+        stamp = re.sub(r"\D", "", str(ad["created_at"]))
+        return f"pg|{scope}|{direction}|{stamp}|{ad['id']}"
+
+    @staticmethod
+    def _decode_page_cursor(data: str):
+        """Область, направление и ключ (created_at, id) из callback_data"""
+        _, scope, direction, stamp, ad_id = data.split("|")
+        created_at = (
+            f"{stamp[:4]}-{stamp[4:6]}-{stamp[6:8]} "
+            f"{stamp[8:10]}:{stamp[10:12]}:{stamp[12:14]}"
+        )
+        return scope, direction, (created_at, int(ad_id))
+
     def _show_ad_details(self, update: Update, context: CallbackContext, ad_id: int):
         """Показать детали объявления"""
         try:
-            # Получаем детали объявления
-            ads = self.db.get_new_advertisements(limit=100)
-            ad = next((ad for ad in ads if ad["id"] == ad_id), None)
+            ad = self.db_executor.call("get_advertisement", ad_id)
 
             if not ad:
                 update.callback_query.answer("Объявление не найдено")
                 return
 
-            # Отмечаем как просмотренное
-            self.db.mark_as_viewed(ad_id)
-
             # Формируем детальное сообщение
             details_text = f"""
 🏍️ *{ad['title']}*
@@ -284,6 +659,13 @@ class JawaCzBot:
 ⏰ Добавлено: {ad['created_at']}
             """
 
+            if ad.get("year"):
+                details_text += f"\n📅 Год выпуска: {ad['year']}"
+            if ad.get("mileage"):
+                details_text += f"\n🛣️ Пробег: {ad['mileage']}"
+            if ad.get("condition"):
+                details_text += f"\n🔧 Состояние: {ad['condition']}"
+
             if ad.get("description"):
                 details_text += f"\n📝 Описание:\n{ad['description']}"
 
@@ -308,6 +690,19 @@ class JawaCzBot:
             update.message.reply_text("📭 Объявления не найдены.")
             return
 
+        # Копии одного объявления с разных сайтов - одной карточкой
+        sources = self.db_executor.call(
+            "get_cluster_sources", [ad["cluster_id"] for ad in ads if ad.get("cluster_id")]
+        )
+        clusters = set()
+        unique_ads = []
+        for ad in ads:
+            cluster_id = ad.get("cluster_id")
+            if cluster_id is None or cluster_id not in clusters:
+                clusters.add(cluster_id)
+                unique_ads.append(dict(ad, other_sources=self._format_other_sources(ad, sources)))
+        ads = unique_ads
+
         # Добавляем отладочную информацию
         logger.info(f"Начинаю отправку {len(ads)} объявлений для запроса: {title}")
         logger.info(f"Первое объявление: {ads[0] if ads else 'Нет объявлений'}")
@@ -360,8 +755,17 @@ class JawaCzBot:
                     )
                     ad_text += f"\n📝 {description}"
 
+                ad_text += ad.get("other_sources", "")
+
+                # Кнопка с подробностями для объявлений из базы
+                reply_markup = None
+                if ad.get("id"):
+                    reply_markup = InlineKeyboardMarkup(
+                        [[InlineKeyboardButton("ℹ️ Подробнее", callback_data=f"ad_{ad['id']}")]]
+                    )
+
                 # Отправляем без Markdown для избежания ошибок
-                update.message.reply_text(ad_text)
+                update.message.reply_text(ad_text, reply_markup=reply_markup)
 
                 # Небольшая задержка между сообщениями
                 time.sleep(0.5)
@@ -389,15 +793,14 @@ class JawaCzBot:
         while True:
             try:
                 logger.info("Запуск автоматического парсинга...")
+                started_at = time.time()
 
-                # Парсим все сайты
-                new_ads = self.parser.parse_all_sites()
-
-                # Сохраняем в базу данных
+                # Объявления сохраняются по мере загрузки страниц
                 added_count = 0
-                for ad in new_ads:
-                    if self.db.add_advertisement(ad):
-                        added_count += 1
+                for _ in run_pipeline(self.parser, self.db):
+                    added_count += 1
+
+                self.db.mark_sites_parsed(self.parser.sites_parsed_since(started_at))
 
                 logger.info(
                     f"Парсинг завершен. Добавлено {added_count} новых объявлений."
@@ -418,16 +821,20 @@ class JawaCzBot:
         # Получаем dispatcher для регистрации обработчиков
         dp = self.updater.dispatcher
 
-        # Добавляем обработчики команд
-        dp.add_handler(CommandHandler("start", self.start))
-        dp.add_handler(CommandHandler("help", self.help_command))
-        dp.add_handler(CommandHandler("search", self.search_command))
-        dp.add_handler(CommandHandler("latest", self.latest_command))
-        dp.add_handler(CommandHandler("stats", self.stats_command))
-        dp.add_handler(CommandHandler("sites", self.sites_command))
+        # Добавляем обработчики команд. run_async: медленный запрос одного
+        # пользователя не задерживает обработку остальных обновлений
+        dp.add_handler(CommandHandler("start", self.start, run_async=True))
+        dp.add_handler(CommandHandler("help", self.help_command, run_async=True))
+        dp.add_handler(CommandHandler("search", self.search_command, run_async=True))
+        dp.add_handler(CommandHandler("latest", self.latest_command, run_async=True))
+        dp.add_handler(CommandHandler("readall", self.readall_command, run_async=True))
+        dp.add_handler(CommandHandler("drops", self.drops_command, run_async=True))
+        dp.add_handler(CommandHandler("stats", self.stats_command, run_async=True))
+        dp.add_handler(CommandHandler("sites", self.sites_command, run_async=True))
+        dp.add_handler(CommandHandler("price", self.price_command, run_async=True))
 
         # Добавляем обработчик кнопок
-        dp.add_handler(CallbackQueryHandler(self.button_callback))
+        dp.add_handler(CallbackQueryHandler(self.button_callback, run_async=True))
 
         # Запускаем бота
         logger.info("Бот запущен!")
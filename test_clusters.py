@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Проверка кластеров почти одинаковых объявлений (SimHash)
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import with_database
+from database import ClusterIndex, Database, ad_fingerprint
+
+TITLE = "Продам Jawa 350 638 1986 года, на ходу, документы в порядке"
+
+
+def make_ad(number: int, site_name: str, price: str, title: str = TITLE) -> dict:
+    return {
+        "site_name": site_name,
+        "title": title,
+        "price": price,
+        "link": f"https://{site_name.lower()}.example/ad/{number}",
+    }
+
+
+def bands_of(db: Database, ad_id: int) -> list:
+    rows = db._connection().execute(
+        "SELECT band, value FROM ad_simhash_bands WHERE ad_id = ? ORDER BY band",
+        (ad_id,),
+    )
+    return [tuple(row) for row in rows]
+
+
+@with_database
+def test_cross_posted_ads_share_cluster(db):
+    """Одно объявление с разных сайтов попадает в один кластер"""
+    first, second, other = db.add_advertisements_batch(
+        [
+            make_ad(1, "Kufar", "1 000 р."),
+            make_ad(2, "AV", "1 050 р."),
+            make_ad(3, "Kufar", "1 000 р.", title="Чезет 175 на запчасти"),
+        ]
+    )
+    assert second["cluster_id"] == first["cluster_id"] == first["id"]
+    assert other["cluster_id"] == other["id"]
+
+    # Цена сильно отличается - это другое объявление
+    (far,) = db.add_advertisements_batch([make_ad(4, "AV", "3 000 р.")])
+    assert far["cluster_id"] == far["id"]
+
+    sources = db.get_cluster_sources([first["cluster_id"]])[first["cluster_id"]]
+    assert [source["id"] for source in sources] == [first["id"], second["id"]]
+
+
+@with_database
+def test_one_per_cluster_respects_filters(db):
+    """Представитель кластера выбирается среди подходящих под фильтр"""
+    older, newer = db.add_advertisements_batch(
+        [make_ad(1, "Kufar", "1 000 р."), make_ad(2, "AV", "1 090 р.")]
+    )
+    assert newer["cluster_id"] == older["cluster_id"]
+
+    ads, _ = db.get_advertisements_page(one_per_cluster=True)
+    assert [ad["id"] for ad in ads] == [newer["id"]]
+
+    # Более новое объявление кластера дороже диапазона: показывается старое
+    ads, _ = db.get_advertisements_page(price_range=(900, 1050), one_per_cluster=True)
+    assert [ad["id"] for ad in ads] == [older["id"]]
+
+    ads, _ = db.get_advertisements_page(site_name="Kufar", one_per_cluster=True)
+    assert [ad["id"] for ad in ads] == [older["id"]]
+
+
+@with_database
+def test_title_change_updates_fingerprint(db):
+    """Смена заголовка пересчитывает отпечаток и полосы"""
+    (ad,) = db.add_advertisements_batch([make_ad(1, "Kufar", "1 000 р.")])
+    old_bands = bands_of(db, ad["id"])
+
+    new_title = "Чезет 175 на запчасти"
+    db.add_advertisements_batch([make_ad(1, "Kufar", "1 000 р.", title=new_title)])
+
+    fingerprint = ad_fingerprint(new_title, "")
+    row = db.get_advertisement(ad["id"])
+    assert row["title"] == new_title
+    assert row["simhash"] == fingerprint
+    assert bands_of(db, ad["id"]) != old_bands
+    assert len(bands_of(db, ad["id"])) == 4
+
+    # Новое объявление с тем же заголовком находит кластер по новому отпечатку
+    (copy,) = db.add_advertisements_batch(
+        [make_ad(2, "AV", "1 000 р.", title=new_title)]
+    )
+    assert copy["cluster_id"] == ad["cluster_id"]
+
+
+@with_database
+def test_cluster_needs_other_site_and_known_prices(db):
+    """Повтор ищется только на других сайтах и только при известных ценах"""
+    (first,) = db.add_advertisements_batch([make_ad(1, "Kufar", "1 000 р.")])
+
+    same_site, no_price, negotiable = db.add_advertisements_batch(
+        [
+            make_ad(2, "Kufar", "1 000 р."),
+            dict(make_ad(3, "AV", ""), price=None),
+            make_ad(4, "ABW", "Договорная"),
+        ]
+    )
+    for ad in (same_site, no_price, negotiable):
+        assert ad["cluster_id"] == ad["id"], ad
+
+    # Объявление без цены не становится кандидатом для следующих
+    (unpriced,) = db.add_advertisements_batch([make_ad(5, "Moto", "Обмен")])
+    (copy,) = db.add_advertisements_batch([make_ad(6, "Bike", "1 000 р.")])
+    assert unpriced["cluster_id"] == unpriced["id"]
+    assert copy["cluster_id"] == first["cluster_id"]
+
+
+@with_database
+def test_closest_candidate_wins(db):
+    """Из нескольких похожих выбирается ближайший отпечаток, затем меньший id"""
+    cursor = db._connection().cursor()
+    fingerprint = ad_fingerprint(TITLE, "")
+    clusters = ClusterIndex(cursor, {"BYN": 1.0}, [])
+    # Отличаются в старших битах: полосы с младшими битами совпадают
+    clusters.add(10, 10, fingerprint ^ (0b111 << 60), "A", 100000, "BYN")
+    clusters.add(20, 20, fingerprint ^ (0b1 << 60), "B", 100000, "BYN")
+    clusters.add(30, 30, fingerprint ^ (0b1 << 61), "C", 100000, "BYN")
+    clusters.add(40, 40, fingerprint, "D", 200000, "BYN")
+    assert clusters.find(fingerprint, "E", 100000, "BYN") == 20
+    assert clusters.find(fingerprint, "B", 100000, "BYN") == 30
+    assert clusters.find(fingerprint, "E", None, None) is None
+
+
+@with_database
+def test_band_lookup_once_per_page(db):
+    """Кандидаты в повторы для страницы читаются одним запросом"""
+    db.add_advertisements_batch([make_ad(1, "Kufar", "1 000 р.")])
+
+    queries = []
+    conn = db._connection()
+    conn.set_trace_callback(queries.append)
+    try:
+        page = db.add_advertisements_batch(
+            [make_ad(number, "AV", "1 000 р.") for number in range(2, 52)]
+        )
+    finally:
+        conn.set_trace_callback(None)
+
+    assert len(page) == 50
+    band_queries = [sql for sql in queries if "FROM wanted" in sql]
+    assert len(band_queries) == 1, len(band_queries)
+    assert {ad["cluster_id"] for ad in page} == {1}
+
+
+def main():
+    """Главная функция тестирования"""
+    print("🧪 Проверка кластеров объявлений")
+    print("=" * 50)
+
+    try:
+        test_cross_posted_ads_share_cluster()
+        test_one_per_cluster_respects_filters()
+        test_title_change_updates_fingerprint()
+        test_cluster_needs_other_site_and_known_prices()
+        test_closest_candidate_wins()
+        test_band_lookup_once_per_page()
+    except AssertionError as e:
+        print(f"❌ Ошибка: {e}")
+        return 1
+
+    print("✅ Кластеры объявлений строятся верно")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Проверка ранней остановки обхода страниц выдачи
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from parser import MotorcycleParser
+
+SITE_KEY = "av_by_jawa"
+
+
+def crawl(pages: list, known_links: set) -> int:
+    """Обход выдачи из готовых страниц; возвращает, сколько загружено"""
+    # Без сессии и HTTP-кеша: загрузка и разбор подменяются
+    parser = MotorcycleParser.__new__(MotorcycleParser)
+    parser.site_status = {}
+    fetched = []
+
+    async def fetch_page(http, site_key, url, use_cache, limiter):
+        fetched.append(url)
+        return b"<html></html>", None
+
+    def parse_page(site_key, content, url, page):
+        next_url = f"https://moto.example/?page={page + 1}" if page < len(pages) else None
+        return [dict(ad) for ad in pages[page - 1]], next_url
+
+    def filter_new(ads):
+        return [ad for ad in ads if ad["link"] not in known_links]
+
+    parser._fetch_page_async = fetch_page
+    parser._parse_page = parse_page
+    asyncio.run(parser._crawl_site_async(None, None, SITE_KEY, filter_new=filter_new))
+    return len(fetched)
+
+
+def ad(number: int) -> dict:
+    return {"title": f"Jawa {number}", "link": f"https://moto.example/{number}"}
+
+
+def test_stops_on_page_without_new_ads():
+    """Обход заканчивается на странице, все объявления которой известны"""
+    pages = [[ad(1), ad(2)], [ad(3), ad(4)], [ad(5)]]
+    assert crawl(pages, {"https://moto.example/3", "https://moto.example/4"}) == 2
+
+
+def test_stops_on_page_without_jawa_ads():
+    """Страница без объявлений Jawa/CZ не продолжает обход до лимита страниц"""
+    pages = [[ad(1)], [], [ad(3)], [ad(4)]]
+    assert crawl(pages, set()) == 2
+
+
+def main():
+    """Главная функция тестирования"""
+    print("🧪 Проверка остановки обхода выдачи")
+    print("=" * 50)
+
+    try:
+        test_stops_on_page_without_new_ads()
+        test_stops_on_page_without_jawa_ads()
+    except AssertionError as e:
+        print(f"❌ Ошибка: {e}")
+        return 1
+
+    print("✅ Обход выдачи останавливается вовремя")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Проверка планов запросов базы данных: ни один запрос из database.py
+не должен читать таблицу целиком
+"""
+
+import os
+import re
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import Database
+
+# Полный просмотр таблицы или сортировка без индекса. Просмотр покрывающего
+# индекса (COUNT(*) по всей таблице) читает только индекс и допустим, как и
+# запрос к полнотекстовому индексу (VIRTUAL TABLE INDEX)
+FULL_SCAN_RE = re.compile(
+    r"^SCAN (?!.*(?:COVERING INDEX|VIRTUAL TABLE INDEX))|USE TEMP B-TREE"
+)
+
+# Таблицы с одной строкой на сайт или валюту: их просмотр стоит O(строк)
+SMALL_TABLES = {"site_stats", "exchange_rates"}
+
+# Лента объявлений читается по индексам даты в порядке ORDER BY и
+# останавливается на LIMIT строк; другие обходы индексов не допускаются
+FEED_INDEX_WALK_RE = re.compile(
+    r"^SCAN advertisements USING INDEX (?:idx_ads_created|idx_ads_site_created)$"
+)
+
+SAMPLE_AD = {
+    "site_name": "Тест",
+    "title": "Jawa 350",
+    "link": "https://example.com/1",
+    "keywords": ["jawa"],
+}
+
+
+def exercise_database(db: Database):
+    """Вызов всех методов, которые обращаются к базе.
+
+    ``recompute_statistics`` не вызывается: точный пересчет по определению
+    читает всю таблицу.
+    """
+    db.add_advertisement(SAMPLE_AD)
+    db.add_advertisements_batch([SAMPLE_AD, dict(SAMPLE_AD, title="CZ 175")])
+    db.filter_new_advertisements([SAMPLE_AD])
+    db.state_cache.clear()
+    db.filter_new_advertisements([SAMPLE_AD])
+    db.add_advertisements_batch([dict(SAMPLE_AD, price="100 р.")])
+    db.state_cache.clear()
+    db.add_advertisements_batch([dict(SAMPLE_AD, price="90 р.")])
+    db.save_advertisement_details([(SAMPLE_AD, {"year": "1975"})])
+    db.get_new_advertisements()
+    db.get_advertisement(1)
+    db.get_unread_advertisements(42)
+    db.get_unread_advertisements(42, 1, price_range=(500, 3000), one_per_cluster=True)
+    db.count_unread_advertisements(42)
+    db.count_unread_advertisements(42, price_range=(500, 3000), one_per_cluster=True)
+    db.start_read_mark(43, 10)
+    db.get_last_seen_id(42)
+    db.mark_read_up_to(42, 1)
+    db.mark_all_read(42)
+    db.mark_as_viewed(1)
+    db.get_advertisements_by_site("Тест")
+    db.save_exchange_rates({"USD": 3.2})
+    db.get_exchange_rates()
+    db.set_price_range(42, 500, 3000)
+    db.get_price_range(42)
+    for site_name in (None, "Тест"):
+        db.get_advertisements_page(site_name=site_name)
+        db.get_advertisements_page(site_name=site_name, price_range=(500, 3000))
+        db.get_advertisements_page(site_name=site_name, cursor=("2030-01-01 00:00:00", 1))
+        db.get_advertisements_page(
+            site_name=site_name, cursor=("2000-01-01 00:00:00", 1), direction="prev"
+        )
+    db.get_advertisements_page(one_per_cluster=True)
+    db.get_advertisements_page(
+        site_name="Тест", price_range=(500, 3000), one_per_cluster=True
+    )
+    db.get_advertisements_page(cursor=("2030-01-01 00:00:00", 1), one_per_cluster=True)
+    db.get_cluster_sources([1, 2])
+    db.get_price_drops()
+    db.search_advertisements("Ява")
+    db.get_statistics()
+    db.mark_sites_parsed(["site"])
+    db.get_stale_sites(["site", "other"], 60)
+    db.get_expired_advertisements(0, "2030-01-01 00:00:00")
+    db.delete_advertisements_range(1, 2, "2030-01-01 00:00:00")
+
+
+def collect_queries(db: Database) -> list:
+    """Запросы с подставленными параметрами, выполненные методами базы"""
+    statements = []
+    conn = db._connection()
+    conn.set_trace_callback(statements.append)
+    try:
+        exercise_database(db)
+    finally:
+        conn.set_trace_callback(None)
+
+    return [
+        sql
+        for sql in statements
+        if sql.split(None, 1)[0].upper() in ("SELECT", "UPDATE", "DELETE", "INSERT")
+    ]
+
+
+def find_full_scans(db: Database) -> list:
+    """Запросы, план которых содержит полный просмотр таблицы"""
+    conn = db._connection()
+    problems = []
+
+    for sql in collect_queries(db):
+        plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+        has_limit = re.search(r"\bLIMIT\b", sql, re.IGNORECASE) is not None
+        bad = [
+            step
+            for step in plan
+            if FULL_SCAN_RE.search(step)
+            and step.split()[1] not in SMALL_TABLES
+            and not (has_limit and FEED_INDEX_WALK_RE.search(step))
+        ]
+        if bad:
+            problems.append((" ".join(sql.split()), bad))
+
+    return problems
+
+
+def test_query_plans():
+    """Все запросы используют индексы"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "plans.db"))
+        try:
+            problems = find_full_scans(db)
+        finally:
+            db.close()
+
+    assert not problems, "\n".join(f"{sql}\n  -> {plan}" for sql, plan in problems)
+
+
+def main():
+    """Главная функция тестирования"""
+    print("🧪 Проверка планов запросов базы данных")
+    print("=" * 50)
+
+    try:
+        test_query_plans()
+    except AssertionError as e:
+        print(f"❌ Полный просмотр таблицы:\n{e}")
+        return 1
+
+    print("✅ Все запросы используют индексы")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
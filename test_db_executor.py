@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Проверка, что все пишущие методы Database выполняются в потоке записи
+"""
+
+import inspect
+import os
+import sqlite3
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import temp_database
+from database import Database
+from db_executor import WRITE_METHODS
+
+AD = {
+    "site_name": "Тест",
+    "title": "Jawa 350",
+    "price": "1 500 р.",
+    "link": "https://example.com/ad/1",
+}
+
+# Аргументы для вызова каждого открытого метода Database
+CALLS = {
+    "recompute_statistics": (),
+    "add_advertisement": (dict(AD, link="https://example.com/ad/2"),),
+    "add_advertisements_batch": ([dict(AD, link="https://example.com/ad/3")],),
+    "save_advertisement_details": ([(AD, {"description": "Описание"})],),
+    "filter_new_advertisements": ([AD],),
+    "get_new_advertisements": (),
+    "get_unread_advertisements": (1,),
+    "get_last_seen_id": (1,),
+    "count_unread_advertisements": (1,),
+    "mark_read_up_to": (1, 1),
+    "mark_all_read": (1,),
+    "start_read_mark": (2, 10),
+    "mark_as_viewed": (1,),
+    "get_advertisement": (1,),
+    "get_advertisements_page": (),
+    "get_price_drops": (),
+    "get_cluster_sources": ([1],),
+    "get_exchange_rates": (),
+    "save_exchange_rates": ({"USD": 3.2},),
+    "get_price_range": (1,),
+    "set_price_range": (1, 1000, 5000),
+    "get_advertisements_by_site": ("Тест",),
+    "search_advertisements": ("jawa",),
+    "get_statistics": (),
+    "mark_sites_parsed": (["site"],),
+    "get_stale_sites": (["site"], 60),
+    "get_expired_advertisements": (0, "9999-12-31"),
+    "delete_advertisements_range": (1, 1, "0000-01-01"),
+    "incremental_vacuum": (1,),
+}
+
+# Вызываются вне исполнителя: при создании базы и при завершении работы
+NOT_EXECUTED = {"init_database", "close"}
+
+WRITE_ACTIONS = {sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE, sqlite3.SQLITE_DELETE}
+
+
+def public_methods():
+    return {
+        name
+        for name, member in inspect.getmembers(Database, inspect.isfunction)
+        if not name.startswith("_")
+    } - NOT_EXECUTED
+
+
+def writes(db_path: str, method: str) -> bool:
+    """Меняет ли вызов метода основную базу.
+
+    Запросы проверяются при подготовке, поэтому каждый метод вызывается
+    на новом соединении с пустым кешем запросов.
+    """
+    db = Database(db_path)
+    conn = db._connection()
+    written = []
+
+    def authorizer(action, arg1, arg2, db_name, trigger):
+        # sqlite_master SQLite читает через UPDATE при открытии FTS-таблицы
+        if action in WRITE_ACTIONS and db_name == "main" and arg1 != "sqlite_master":
+            written.append(arg1)
+        elif action == sqlite3.SQLITE_PRAGMA and arg1 == "incremental_vacuum":
+            written.append(arg1)
+        return sqlite3.SQLITE_OK
+
+    conn.set_authorizer(authorizer)
+    try:
+        getattr(db, method)(*CALLS[method])
+    finally:
+        conn.set_authorizer(None)
+        db.close()
+    return bool(written)
+
+
+def test_calls_cover_public_methods():
+    """Для каждого открытого метода есть пример вызова"""
+    assert public_methods() == set(CALLS), public_methods() ^ set(CALLS)
+
+
+def test_write_methods_are_listed():
+    """WRITE_METHODS - ровно те методы, которые пишут в базу"""
+    with temp_database() as db:
+        db.add_advertisements_batch([AD])
+        writing = {method for method in CALLS if writes(db.db_path, method)}
+
+    assert writing == set(WRITE_METHODS), writing ^ set(WRITE_METHODS)
+
+
+def main():
+    """Главная функция тестирования"""
+    print("🧪 Проверка списка пишущих методов")
+    print("=" * 50)
+
+    try:
+        test_calls_cover_public_methods()
+        test_write_methods_are_listed()
+    except AssertionError as e:
+        print(f"❌ Ошибка: {e}")
+        return 1
+
+    print("✅ Все пишущие методы выполняются в потоке записи")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
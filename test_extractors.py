@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Проверка извлечения объявлений Куфара из __NEXT_DATA__ и запасного пути
+через CSS-селекторы
+"""
+
+import copy
+import json
+import os
+import sys
+from urllib.parse import parse_qs, urlparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from extractors import BeautifulSoupBackend, LxmlBackend, extract_next_data, lxml_html
+
+SITE_KEY = "kufar_jawa"
+SITE = config.PARSING_SITES[SITE_KEY]
+
+# Сокращенный __NEXT_DATA__ страницы выдачи Куфара: лишние поля оставлены,
+# чтобы разбор не зависел от них
+NEXT_DATA = {
+    "props": {
+        "pageProps": {"dehydratedState": {"queries": []}},
+        "initialState": {
+            "router": {"pathname": "/l/[[...params]]"},
+            "listing": {
+                "ads": [
+                    {
+                        "ad_id": 231456789,
+                        "ad_link": "https://auto.kufar.by/vi/231456789?searchId=5f1e",
+                        "subject": " Ява 638, 1987 г. ",
+                        "body_short": "Продаю Яву 638 в хорошем состоянии. ",
+                        "category": "2060",
+                        "company_ad": False,
+                        "currency": "BYR",
+                        "list_time": "2024-05-14T09:31:12Z",
+                        "price_byn": "350000",
+                        "price_usd": "108000",
+                        "images": [
+                            {"id": "4411", "media_storage": "rms", "path": "adim1/4411.jpg"}
+                        ],
+                        "ad_parameters": [
+                            {"p": "regdate", "v": 1987, "pl": "Год", "vl": "1987"}
+                        ],
+                        "account_parameters": [{"p": "name", "v": "Иван"}],
+                    },
+                    {
+                        "ad_id": 231456790,
+                        "ad_link": "https://auto.kufar.by/vi/231456790",
+                        "subject": "CZ 175 на запчасти",
+                        "currency": "BYR",
+                        "list_time": "2024-05-14T08:02:45Z",
+                        "price_byn": "0",
+                        "price_usd": "0",
+                        "images": [],
+                    },
+                ],
+                "pagination": [
+                    {"label": "prev", "num": 0, "token": None},
+                    {"label": "self", "num": 1, "token": None},
+                    {"label": "next", "num": 2, "token": "eyJ0IjoiYWJzIiwiZiI6dHJ1ZX0="},
+                ],
+                "total": 57,
+            },
+        },
+    },
+    "page": "/l/[[...params]]",
+    "query": {"params": ["motocikl"]},
+    "buildId": "1a2b3c",
+    "isFallback": False,
+}
+
+# Разметка выдачи: по ней объявления находят CSS-селекторы
+LISTING_HTML = """
+  <article data-testid="listing-item">
+    <a data-testid="listing-link" href="/vi/231456789">
+      <img data-testid="listing-image" src="https://rms.kufar.by/v1/list_thumbs/4411.jpg">
+      <h3 data-testid="listing-title">Ява 638, 1987 г.</h3>
+      <span data-testid="listing-price">3 500 р.</span>
+    </a>
+  </article>
+  <a data-testid="pagination-next" href="/l/motocikl?cursor=css-next">Дальше</a>
+"""
+
+
+def page(next_data=None, raw_script: str = None) -> bytes:
+    """Страница выдачи со встроенными данными и разметкой"""
+    if raw_script is None:
+        raw_script = json.dumps(next_data, ensure_ascii=False)
+    return (
+        "<html><head><script>window.dataLayer = [];</script></head><body>"
+        f'<script id="__NEXT_DATA__" type="application/json">{raw_script}</script>'
+        f"{LISTING_HTML}</body></html>"
+    ).encode("utf-8")
+
+
+def backends() -> list:
+    sites = {SITE_KEY: SITE}
+    result = [BeautifulSoupBackend(sites)]
+    if lxml_html is not None:
+        result.append(LxmlBackend(sites))
+    return result
+
+
+def test_next_data_page():
+    """Объявления и курсор следующей страницы берутся из __NEXT_DATA__"""
+    ads, next_url = extract_next_data(SITE, page(NEXT_DATA))
+
+    assert [ad["external_id"] for ad in ads] == ["231456789", "231456790"]
+    first = ads[0]
+    assert first["title"] == "Ява 638, 1987 г."
+    assert first["link"] == "https://auto.kufar.by/vi/231456789?searchId=5f1e"
+    assert first["price"] == "3 500 р."
+    assert (first["price_minor"], first["price_currency"]) == (350000, "BYN")
+    assert first["image_url"] == "https://rms.kufar.by/v1/list_thumbs_2x/adim1/4411.jpg"
+    assert first["description"].startswith("Продаю Яву 638")
+    assert "image_url" not in ads[1] and "description" not in ads[1]
+
+    # Курсор заменяет номер страницы, остальные параметры поиска сохраняются
+    query = parse_qs(urlparse(next_url).query)
+    assert query["cursor"] == ["eyJ0IjoiYWJzIiwiZiI6dHJ1ZX0="]
+    assert query["brn"] == ["264"] and query["sort"] == ["lst.d"]
+
+    for backend in backends():
+        assert backend.extract_page(SITE_KEY, page(NEXT_DATA)) == (ads, next_url)
+
+
+def test_negotiable_price():
+    """Нулевая цена - "Договорная" без суммы"""
+    ads, _ = extract_next_data(SITE, page(NEXT_DATA))
+    negotiable = ads[1]
+    assert negotiable["price"] == "Договорная"
+    assert negotiable["price_minor"] is None
+    assert negotiable["price_currency"] is None
+
+
+def test_fallback_to_css():
+    """Без встроенных данных или при смене их формата работают селекторы"""
+    renamed_listing = copy.deepcopy(NEXT_DATA)
+    state = renamed_listing["props"]["initialState"]
+    state["listingV2"] = state.pop("listing")
+
+    renamed_fields = copy.deepcopy(NEXT_DATA)
+    for item in renamed_fields["props"]["initialState"]["listing"]["ads"]:
+        item["title"] = item.pop("subject")
+
+    ads_not_list = copy.deepcopy(NEXT_DATA)
+    ads_not_list["props"]["initialState"]["listing"]["ads"] = {"items": []}
+
+    pages = {
+        "нет ключа listing": page(renamed_listing),
+        "переименованы поля объявлений": page(renamed_fields),
+        "ads не список": page(ads_not_list),
+        "битый JSON": page(raw_script='{"props": {'),
+        "нет __NEXT_DATA__": f"<html><body>{LISTING_HTML}</body></html>".encode(),
+    }
+    for case, content in pages.items():
+        assert extract_next_data(SITE, content) is None, case
+        for backend in backends():
+            ads, next_url = backend.extract_page(SITE_KEY, content)
+            assert [(ad["title"], ad["link"], ad["price"]) for ad in ads] == [
+                ("Ява 638, 1987 г.", "https://auto.kufar.by/vi/231456789", "3 500 р.")
+            ], (case, backend.name, ads)
+            assert next_url == "https://auto.kufar.by/l/motocikl?cursor=css-next", case
+
+
+def test_broken_item_is_skipped():
+    """Объявление без заголовка или ссылки пропускается, остальные остаются"""
+    data = copy.deepcopy(NEXT_DATA)
+    data["props"]["initialState"]["listing"]["ads"][1].pop("ad_link")
+    ads, _ = extract_next_data(SITE, page(data))
+    assert [ad["external_id"] for ad in ads] == ["231456789"]
+
+
+def main():
+    """Главная функция тестирования"""
+    print("🧪 Проверка извлечения объявлений Куфара")
+    print("=" * 50)
+
+    try:
+        test_next_data_page()
+        test_negotiable_price()
+        test_fallback_to_css()
+        test_broken_item_is_skipped()
+    except AssertionError as e:
+        print(f"❌ Ошибка: {e}")
+        return 1
+
+    print("✅ Объявления Куфара извлекаются верно")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Проверка предохранителя хостов (HostHealth) на подменных часах
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from health import CLOSED, HALF_OPEN, OPEN, HostHealth, HostUnavailableError
+from parser import MotorcycleParser
+
+URL = "https://moto.example/bike/jawa"
+
+
+class FakeClock:
+    """Часы, которые идут только по команде"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+def state_of(health: HostHealth) -> str:
+    return health.snapshot()[health.host_of(URL)]["state"]
+
+
+def open_breaker(health: HostHealth):
+    for _ in range(config.BREAKER_FAILURE_THRESHOLD):
+        assert health.before_request(URL) is False
+        health.record_failure(URL)
+    assert state_of(health) == OPEN
+
+
+def assert_blocked(health: HostHealth):
+    try:
+        health.before_request(URL)
+    except HostUnavailableError:
+        return
+    raise AssertionError("запрос к отключенному хосту пропущен")
+
+
+def test_open_half_open_closed():
+    """Разомкнутый предохранитель пропускает пробный запрос, успех замыкает его"""
+    clock = FakeClock()
+    health = HostHealth(clock=clock)
+    open_breaker(health)
+
+    assert_blocked(health)
+    clock.advance(config.BREAKER_OPEN_SECONDS - 1)
+    assert_blocked(health)
+
+    clock.advance(1)
+    assert health.before_request(URL) is True
+    assert state_of(health) == HALF_OPEN
+    # Пока идет пробный запрос, остальные не пропускаются
+    assert_blocked(health)
+
+    health.record_success(URL, 0.2)
+    health.release_trial(URL)
+    assert state_of(health) == CLOSED
+    assert health.before_request(URL) is False
+
+
+def test_failed_trial_reopens():
+    """Ошибка пробного запроса снова размыкает предохранитель на весь срок"""
+    clock = FakeClock()
+    health = HostHealth(clock=clock)
+    open_breaker(health)
+
+    clock.advance(config.BREAKER_OPEN_SECONDS)
+    assert health.before_request(URL) is True
+    health.record_failure(URL)
+    health.release_trial(URL)
+    assert state_of(health) == OPEN
+    assert health.snapshot()[health.host_of(URL)]["open_until"] == (
+        clock.now + config.BREAKER_OPEN_SECONDS
+    )
+
+    clock.advance(config.BREAKER_OPEN_SECONDS - 1)
+    assert_blocked(health)
+    clock.advance(1)
+    assert health.before_request(URL) is True
+
+
+def test_trial_released_after_exception():
+    """Пробный запрос, прерванный не сетевой ошибкой, не блокирует хост"""
+    clock = FakeClock()
+    health = HostHealth(clock=clock)
+    open_breaker(health)
+    clock.advance(config.BREAKER_OPEN_SECONDS)
+
+    def broken_get(url, **kwargs):
+        raise ValueError("ошибка разбора ответа")
+
+    fetcher = SimpleNamespace(health=health, session=SimpleNamespace(get=broken_get))
+    try:
+        MotorcycleParser._request(fetcher, URL, retries=0)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("ошибка запроса потеряна")
+
+    # Слот пробного запроса освобожден: следующий снова пробный
+    assert state_of(health) == HALF_OPEN
+    assert health.before_request(URL) is True
+
+    # Сетевая ошибка пробного запроса размыкает предохранитель (слот,
+    # занятый проверкой выше, сначала освобождается)
+    health.release_trial(URL)
+
+    def failing_get(url, **kwargs):
+        raise requests.ConnectionError("нет соединения")
+
+    fetcher.session.get = failing_get
+    try:
+        MotorcycleParser._request(fetcher, URL, retries=0)
+    except requests.ConnectionError:
+        pass
+    else:
+        raise AssertionError("ошибка запроса потеряна")
+    assert state_of(health) == OPEN
+
+
+def main():
+    """Главная функция тестирования"""
+    print("🧪 Проверка предохранителя хостов")
+    print("=" * 50)
+
+    try:
+        test_open_half_open_closed()
+        test_failed_trial_reopens()
+        test_trial_released_after_exception()
+    except AssertionError as e:
+        print(f"❌ Ошибка: {e}")
+        return 1
+
+    print("✅ Предохранитель хостов работает верно")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Проверка идентичности объявлений и перевода старой базы на ident
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from conftest import with_database
+from database import AD_IDENT_SIZE, Database, ad_identity, canonical_ad_key
+from extractors import BeautifulSoupBackend
+
+# Схема таблицы объявлений до появления ident
+OLD_SCHEMA = """
+    CREATE TABLE advertisements (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        site_name TEXT NOT NULL,
+        title TEXT NOT NULL,
+        price TEXT,
+        link TEXT NOT NULL,
+        image_url TEXT,
+        description TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        is_new BOOLEAN DEFAULT TRUE,
+        hash TEXT UNIQUE
+    )
+"""
+
+# Одно объявление Куфара во встроенных данных и в разметке выдачи
+KUFAR_ITEM = {
+    "ad_id": 123456,
+    "subject": "Jawa 350 638",
+    "ad_link": "https://auto.kufar.by/vi/123456?searchId=abc",
+    "price_byn": "150000",
+}
+NEXT_DATA_PAGE = (
+    '<html><body><script id="__NEXT_DATA__" type="application/json">'
+    + json.dumps({"props": {"initialState": {"listing": {"ads": [KUFAR_ITEM]}}}})
+    + "</script></body></html>"
+).encode()
+CSS_PAGE = """
+<html><body>
+  <article data-testid="listing-item">
+    <a data-testid="listing-link" href="/vi/123456?rank=1">
+      <h3 data-testid="listing-title">Jawa 350 638</h3>
+      <span data-testid="listing-price">1 500 р.</span>
+    </a>
+  </article>
+</body></html>
+""".encode()
+
+
+def test_canonical_ad_key():
+    """Ссылки одного объявления дают одну запись"""
+    key = canonical_ad_key("https://auto.kufar.by/vi/123")
+    assert key == "auto.kufar.by/vi/123"
+    assert canonical_ad_key("https://WWW.Auto.Kufar.by/vi/123/?utm_source=tg&rank=3") == key
+    assert canonical_ad_key(" http://auto.kufar.by/vi/123?searchId=abc ") == key
+
+    # Значимые параметры сохраняются в одном порядке
+    assert canonical_ad_key("https://abw.by/ad?b=2&id=7") == canonical_ad_key(
+        "https://abw.by/ad?id=7&b=2"
+    )
+    assert canonical_ad_key("https://abw.by/ad?id=7") != canonical_ad_key(
+        "https://abw.by/ad?id=8"
+    )
+
+def test_ad_identity():
+    """Идентичность не зависит от сайта в конфиге, заголовка и меток"""
+    first = {"site_name": "Куфар - Jawa", "title": "Jawa", "link": "https://kufar.by/vi/1"}
+    second = {
+        "site_name": "Куфар - Cezet",
+        "title": "Ява 638",
+        "link": "https://www.kufar.by/vi/1?utm_medium=search",
+    }
+    assert ad_identity(first) == ad_identity(second)
+    assert len(ad_identity(first)) == AD_IDENT_SIZE
+    assert ad_identity(first) != ad_identity(dict(first, link="https://kufar.by/vi/2"))
+
+
+def test_migration_to_ident():
+    """Старая база перестраивается: повторы сливаются, id сохраняются"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "old.db")
+        conn = sqlite3.connect(path)
+        conn.execute(OLD_SCHEMA)
+        conn.executemany(
+            "INSERT INTO advertisements (site_name, title, price, link, hash) VALUES (?, ?, ?, ?, ?)",
+            [
+                ("Куфар - Jawa", "Ява 638", "1 500 р.", "https://kufar.by/vi/1", "a"),
+                ("Куфар - Cezet", "Ява 638", "1 500 р.", "https://kufar.by/vi/1?rank=2", "b"),
+                ("AV.by", "CZ 175", "$400", "https://moto.av.by/2", "c"),
+                ("AV.by", "Jawa 350", "", "https://moto.av.by/3", "d"),
+            ],
+        )
+        # Удаленное последнее объявление: его id не должен выдаться снова
+        conn.execute("DELETE FROM advertisements WHERE id = 4")
+        conn.commit()
+        conn.close()
+
+        db = Database(path)
+        try:
+            rows = db._connection().execute(
+                "SELECT id, site_name, ident FROM advertisements ORDER BY id"
+            ).fetchall()
+            assert [(row["id"], row["site_name"]) for row in rows] == [
+                (1, "Куфар - Jawa"),
+                (3, "AV.by"),
+            ]
+            assert rows[0]["ident"] == ad_identity({"link": "https://kufar.by/vi/1"})
+
+            columns = {
+                row[1] for row in db._connection().execute("PRAGMA table_info(advertisements)")
+            }
+            assert "hash" not in columns
+
+            assert db.get_advertisement(3)["price_minor"] == 40000
+            assert db.get_statistics()["total_ads"] == 2
+            assert [ad["id"] for ad in db.search_advertisements("ява")] == [1]
+
+            # Повтор не добавляется, новое объявление получает новый id
+            assert db.add_advertisements_batch(
+                [{"site_name": "Куфар", "title": "Ява 638", "link": "https://kufar.by/vi/1"}]
+            ) == []
+            (new_ad,) = db.add_advertisements_batch(
+                [{"site_name": "AV.by", "title": "Jawa 634", "link": "https://moto.av.by/5"}]
+            )
+            assert new_ad["id"] == 5
+        finally:
+            db.close()
+
+
+@with_database
+def test_kufar_ad_from_both_extraction_paths(db):
+    """Объявление из встроенных данных и из CSS-разметки - одна запись"""
+    backend = BeautifulSoupBackend({"kufar_jawa": config.PARSING_SITES["kufar_jawa"]})
+    (from_json,), _ = backend.extract_page("kufar_jawa", NEXT_DATA_PAGE)
+    (from_css,), _ = backend.extract_page("kufar_jawa", CSS_PAGE)
+    assert from_json["external_id"] == "123456" and "external_id" not in from_css
+    assert ad_identity(from_json) == ad_identity(from_css)
+
+    assert len(db.add_advertisements_batch([dict(from_json, site_name="Куфар")])) == 1
+    assert db.add_advertisements_batch([dict(from_css, site_name="Куфар")]) == []
+
+
+def old_kufar_ident(external_id: str) -> bytes:
+    """Идентичность по номеру на сайте, как ее хранили раньше"""
+    key = f"auto.kufar.by#{external_id}".encode()
+    return hashlib.blake2b(key, digest_size=AD_IDENT_SIZE).digest()
+
+
+def test_rekey_kufar_ads_by_link():
+    """Объявления Куфара, сохраненные по номеру на сайте, переходят
+    на идентичность по ссылке, а повтор из CSS-разметки удаляется
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "test.db")
+        db = Database(path)
+        db.add_advertisements_batch(
+            [
+                {"site_name": "Куфар", "title": title, "link": f"https://example.com/{number}"}
+                for number, title in enumerate(["Ява 638", "Ява 638", "CZ 175"], 1)
+            ]
+        )
+        # 1 - из CSS-разметки, 2 - то же объявление из встроенных данных
+        with db._connection() as conn:
+            link = "https://auto.kufar.by/vi/7"
+            conn.executemany(
+                "UPDATE advertisements SET link = ?, external_id = ?, ident = ? WHERE id = ?",
+                [
+                    (link, None, ad_identity({"link": link}), 1),
+                    (link + "?searchId=x", "7", old_kufar_ident("7"), 2),
+                    ("https://auto.kufar.by/vi/8", "8", old_kufar_ident("8"), 3),
+                ],
+            )
+        db.close()
+        # Перезапуск: кеши процесса пустые
+        db.state_cache.clear()
+        db.row_cache.clear()
+
+        db = Database(path)
+        try:
+            rows = db._connection().execute(
+                "SELECT id, ident FROM advertisements ORDER BY id"
+            ).fetchall()
+            assert [tuple(row) for row in rows] == [
+                (1, ad_identity({"link": "https://auto.kufar.by/vi/7"})),
+                (3, ad_identity({"link": "https://auto.kufar.by/vi/8"})),
+            ]
+            assert [ad["id"] for ad in db.search_advertisements("ява")] == [1]
+            assert db.add_advertisements_batch(
+                [{"site_name": "Куфар", "title": "CZ 175", "link": "https://auto.kufar.by/vi/8"}]
+            ) == []
+        finally:
+            db.close()
+
+
+def main():
+    """Главная функция тестирования"""
+    print("🧪 Проверка идентичности объявлений")
+    print("=" * 50)
+
+    try:
+        test_canonical_ad_key()
+        test_ad_identity()
+        test_migration_to_ident()
+        test_kufar_ad_from_both_extraction_paths()
+        test_rekey_kufar_ads_by_link()
+    except AssertionError as e:
+        print(f"❌ Ошибка: {e}")
+        return 1
+
+    print("✅ Идентичность объявлений определяется верно")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
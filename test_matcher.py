@@ -0,0 +1,74 @@
+"""
+Тесты поиска ключевых слов
+"""
+
+import random
+import sys
+
+from matcher import KeywordMatcher
+
+KEYWORDS = ["jawa", "jawa 350", "мотоцикл jawa", "ява", "ява 638", "638", "350"]
+
+
+def substring_match(keywords, *texts):
+    """Прежняя проверка каждого слова через ``in``"""
+    text = "\n".join(text for text in texts if text).lower()
+    return {keyword.lower() for keyword in keywords if keyword.lower() in text}
+
+
+def test_overlapping_keywords():
+    """Перекрывающиеся слова находятся все"""
+    matcher = KeywordMatcher(KEYWORDS)
+    assert matcher.match("Мотоцикл Jawa 350") == {"мотоцикл jawa", "jawa", "jawa 350", "350"}
+    assert matcher.match("Ява 638 в хорошем состоянии") == {"ява", "ява 638", "638"}
+    assert matcher.match("Продам велосипед") == set()
+
+
+def test_fields_are_not_glued():
+    """Слово не собирается из конца одного поля и начала другого"""
+    matcher = KeywordMatcher(KEYWORDS)
+    assert matcher.match("мотоцикл", "jawa") == {"jawa"}
+    assert matcher.matches("", None, "ява")
+    assert not matcher.matches("", None)
+
+
+def test_empty_keywords():
+    """Без ключевых слов ничего не находится"""
+    matcher = KeywordMatcher([])
+    assert matcher.match("Мотоцикл Jawa 350") == set()
+    assert not matcher.matches("Мотоцикл Jawa 350")
+
+
+def test_same_as_substring_check():
+    """Результат совпадает с проверкой каждого слова через ``in``"""
+    rng = random.Random(350)
+    alphabet = "ja wv350"
+    for _ in range(300):
+        keywords = ["".join(rng.choices(alphabet, k=rng.randint(1, 4))) for _ in range(6)]
+        keywords = [keyword for keyword in keywords if keyword.strip()]
+        matcher = KeywordMatcher(keywords)
+        texts = ["".join(rng.choices(alphabet, k=rng.randint(0, 20))) for _ in range(2)]
+        assert matcher.match(*texts) == substring_match(keywords, *texts), (keywords, texts)
+        assert matcher.matches(*texts) == bool(substring_match(keywords, *texts))
+
+
+def main():
+    """Главная функция тестирования"""
+    print("🧪 Проверка поиска ключевых слов")
+    print("=" * 50)
+
+    try:
+        test_overlapping_keywords()
+        test_fields_are_not_glued()
+        test_empty_keywords()
+        test_same_as_substring_check()
+    except AssertionError as e:
+        print(f"❌ Ошибка: {e}")
+        return 1
+
+    print("✅ Все ключевые слова находятся")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
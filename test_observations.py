@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Проверка истории изменений объявлений (ad_observations) и кеша состояний
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import with_database
+from database import ad_identity
+
+AD = {
+    "site_name": "Тест",
+    "title": "Jawa 350",
+    "price": "1 500 р.",
+    "link": "https://example.com/ad/1",
+}
+
+
+def wait_for_new_second():
+    # observed_at хранится с точностью до секунды
+    time.sleep(1.05 - time.time() % 1)
+
+
+@with_database
+def test_price_drops(db):
+    """Снижение цены попадает в get_price_drops со старой ценой"""
+    db.add_advertisements_batch([AD])
+    db.add_advertisements_batch([dict(AD, price="1 200 р.")])
+
+    drops = db.get_price_drops(hours=1)
+    assert len(drops) == 1
+    assert drops[0]["price_minor"] == 120000
+    assert drops[0]["old_price_minor"] == 150000
+    assert drops[0]["price_change"] == -30000
+
+
+@with_database
+def test_title_change_in_same_second_keeps_price_drop(db):
+    """Смена заголовка в ту же секунду не обнуляет снижение цены"""
+    db.add_advertisements_batch([AD])
+    wait_for_new_second()
+    db.add_advertisements_batch([dict(AD, price="1 200 р.")])
+    db.add_advertisements_batch([dict(AD, title="Jawa 350 Старушка", price="1 200 р.")])
+
+    drops = db.get_price_drops(hours=1)
+    assert [drop["price_change"] for drop in drops] == [-30000]
+    assert drops[0]["title"] == "Jawa 350 Старушка"
+
+    # Два снижения за одну секунду складываются
+    db.add_advertisements_batch([dict(AD, price="1 000 р.")])
+    drops = db.get_price_drops(hours=1)
+    assert [drop["price_change"] for drop in drops] == [-50000]
+    assert drops[0]["old_price_minor"] == 150000
+
+
+@with_database
+def test_rollback_leaves_state_cache_empty(db):
+    """После отката транзакции кеш состояний не знает об объявлении"""
+    add_bands = db._add_bands
+    other = dict(AD, title="CZ 175", link="https://example.com/ad/2")
+
+    def failing_add_bands(cursor, ad_id, fingerprint):
+        # Первое объявление пачки вставляется, второе - нет
+        if ad_id > 1:
+            raise RuntimeError("сбой записи")
+        add_bands(cursor, ad_id, fingerprint)
+
+    db._add_bands = failing_add_bands
+    try:
+        db.add_advertisements_batch([AD, other])
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("ожидалась ошибка вставки")
+    finally:
+        db._add_bands = add_bands
+
+    assert db.state_cache.get(ad_identity(AD)) is None
+    assert db.filter_new_advertisements([AD]) == [AD]
+    assert len(db.add_advertisements_batch([AD])) == 1
+    assert db.state_cache.get(ad_identity(AD)) is not None
+
+
+def main():
+    """Главная функция тестирования"""
+    print("🧪 Проверка истории изменений объявлений")
+    print("=" * 50)
+
+    try:
+        test_price_drops()
+        test_title_change_in_same_second_keeps_price_drop()
+        test_rollback_leaves_state_cache_empty()
+    except AssertionError as e:
+        print(f"❌ Ошибка: {e}")
+        return 1
+
+    print("✅ История изменений записывается верно")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
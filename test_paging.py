@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Проверка постраничного вывода объявлений
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import add_sample_ads, with_database
+
+with_ads = with_database(setup=add_sample_ads)
+
+
+def ids(ads: list) -> list:
+    return [ad["id"] for ad in ads]
+
+
+def key(ad: dict) -> tuple:
+    return ad["created_at"], ad["id"]
+
+
+@with_ads
+def test_keyset_paging(db):
+    """Страницы по (created_at, id) вперед и назад без пропусков"""
+    first, has_more = db.get_advertisements_page(limit=3)
+    assert ids(first) == [2, 7, 6] and has_more
+
+    second, has_more = db.get_advertisements_page(cursor=key(first[-1]), limit=3)
+    assert ids(second) == [5, 4, 3] and has_more
+
+    third, has_more = db.get_advertisements_page(cursor=key(second[-1]), limit=3)
+    assert ids(third) == [1] and not has_more
+
+    back, has_more = db.get_advertisements_page(
+        cursor=key(third[0]), direction="prev", limit=3
+    )
+    assert ids(back) == [5, 4, 3] and has_more
+
+    back, has_more = db.get_advertisements_page(
+        cursor=key(back[0]), direction="prev", limit=3
+    )
+    assert ids(back) == [2, 7, 6] and not has_more
+
+
+@with_ads
+def test_paging_filters(db):
+    """Фильтры по сайту и цене применяются на каждой странице"""
+    page, has_more = db.get_advertisements_page(site_name="Куфар", limit=2)
+    assert ids(page) == [7, 5] and has_more
+    page, has_more = db.get_advertisements_page(
+        site_name="Куфар", cursor=key(page[-1]), limit=2
+    )
+    assert ids(page) == [3, 1] and not has_more
+
+    page, _ = db.get_advertisements_page(price_range=(250, 550))
+    assert ids(page) == [5, 4, 3]
+
+    # Объявления без цены не отбрасываются фильтром
+    db.add_advertisements_batch(
+        [{"site_name": "AV.by", "title": "Jawa 50", "link": "https://example.com/ad/8"}]
+    )
+    page, _ = db.get_advertisements_page(price_range=(250, 550))
+    assert ids(page) == [8, 5, 4, 3]
+
+
+def main():
+    """Главная функция тестирования"""
+    print("🧪 Проверка страниц объявлений")
+    print("=" * 50)
+
+    try:
+        test_keyset_paging()
+        test_paging_filters()
+    except AssertionError as e:
+        print(f"❌ Ошибка: {e}")
+        return 1
+
+    print("✅ Страницы объявлений работают верно")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
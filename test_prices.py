@@ -0,0 +1,89 @@
+"""
+Тесты разбора цен объявлений
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import temp_database
+from extractors import _kufar_ad
+from prices import format_price, parse_price
+
+CASES = [
+    ("1 250 р.", (125000, "BYN")),
+    ("1 250 руб.", (125000, "BYN")),
+    ("$900", (90000, "USD")),
+    ("900 $", (90000, "USD")),
+    ("1 200 у.е.", (120000, "USD")),
+    ("2 500 €", (250000, "EUR")),
+    ("1.250 $", (125000, "USD")),
+    ("12.500,50 EUR", (1250050, "EUR")),
+    ("1 250,50 р.", (125050, "BYN")),
+    ("900.5 BYN", (90050, "BYN")),
+    ("1500", (150000, "BYN")),
+    # Валюта берется рядом с суммой, а не из любого места текста
+    ("3 500 р. ≈ 1 090 $", (350000, "BYN")),
+    ("1 090 $ (3 500 р.)", (109000, "USD")),
+    ("Договорная", (None, None)),
+    ("Обмен", (None, None)),
+    ("без цены", (None, None)),
+    ("", (None, None)),
+    (None, (None, None)),
+]
+
+
+def test_parse_price():
+    """Сумма и валюта из текста цены"""
+    for text, expected in CASES:
+        assert parse_price(text) == expected, (text, parse_price(text))
+
+
+def test_format_price():
+    """Сумма в копейках/центах текстом"""
+    assert format_price(125000, "BYN") == "1 250 BYN"
+    assert format_price(125050, "USD") == "1 250.50 USD"
+    assert format_price(90000, None) == "900 BYN"
+
+
+def kufar_ad(price_byn: str) -> dict:
+    """Объявление Куфара с ценой в копейках, как во встроенных данных"""
+    item = {"ad_id": 1, "subject": "Jawa 350", "ad_link": "/vi/1", "price_byn": price_byn}
+    return dict(_kufar_ad(item, "https://auto.kufar.by"), site_name="Куфар")
+
+
+def test_negotiable_kufar_price_is_unknown():
+    """"Договорная" на Куфаре - неизвестная цена, а не снижение до нуля"""
+    ad = kufar_ad("0")
+    assert ad["price"] == "Договорная"
+    assert ad["price_minor"] is None and ad["price_currency"] is None
+
+    with temp_database() as db:
+        db.add_advertisements_batch([kufar_ad("300000")])
+        db.add_advertisements_batch([kufar_ad("0")])
+
+        assert db.get_price_drops(hours=1) == []
+        ads, _ = db.get_advertisements_page(price_range=(1000, 5000))
+        assert [a["price"] for a in ads] == ["Договорная"]
+
+
+def main():
+    """Главная функция тестирования"""
+    print("🧪 Проверка разбора цен")
+    print("=" * 50)
+
+    try:
+        test_parse_price()
+        test_format_price()
+        test_negotiable_kufar_price_is_unknown()
+    except AssertionError as e:
+        print(f"❌ Ошибка: {e}")
+        return 1
+
+    print("✅ Цены разбираются верно")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
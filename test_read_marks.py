@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Проверка границ прочитанного и счетчика новых объявлений
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import add_sample_ads, with_database
+
+with_ads = with_database(setup=add_sample_ads)
+
+
+def ids(ads: list) -> list:
+    return [ad["id"] for ad in ads]
+
+
+@with_ads
+def test_read_marks(db):
+    """Граница прочитанного сдвигается только по показанным объявлениям"""
+    assert db.get_last_seen_id(42) == 0
+    assert db.count_unread_advertisements(42) == 7
+
+    page, has_more = db.get_unread_advertisements(42, limit=3)
+    assert ids(page) == [1, 2, 3] and has_more
+    db.mark_read_up_to(42, page[-1]["id"])
+    assert db.get_last_seen_id(42) == 3
+    assert db.count_unread_advertisements(42) == 4
+
+    # Граница не сдвигается назад
+    db.mark_read_up_to(42, 1)
+    assert db.get_last_seen_id(42) == 3
+
+    page, has_more = db.get_unread_advertisements(42, limit=3)
+    assert ids(page) == [4, 5, 6] and has_more
+    page, has_more = db.get_unread_advertisements(42, after_id=6, limit=3)
+    assert ids(page) == [7] and not has_more
+
+    page, _ = db.get_unread_advertisements(42, price_range=(250, 550))
+    assert ids(page) == [4, 5]
+
+    # Отметки у каждого пользователя свои
+    assert db.count_unread_advertisements(7) == 7
+
+    db.mark_all_read(42)
+    assert db.count_unread_advertisements(42) == 0
+    assert db.get_unread_advertisements(42) == ([], False)
+
+
+@with_ads
+def test_new_user_starts_near_latest(db):
+    """Новому пользователю новыми считаются только последние объявления"""
+    db.start_read_mark(42, 3)
+    assert db.get_last_seen_id(42) == 4
+    page, has_more = db.get_unread_advertisements(42)
+    assert ids(page) == [5, 6, 7] and not has_more
+
+    # Поставленная граница не меняется
+    db.mark_read_up_to(42, 6)
+    db.start_read_mark(42, 3)
+    assert db.get_last_seen_id(42) == 6
+
+    # Объявлений меньше, чем страница: новые все
+    db.start_read_mark(7, 10)
+    assert db.count_unread_advertisements(7) == 7
+
+
+@with_ads
+def test_unread_count_matches_feed(db):
+    """Счетчик новых учитывает фильтр цены и кластеры, как /latest"""
+    cross_posted = {"site_name": "AV.by", "price": "300 р.", "link": "https://example.com/ad/8"}
+    db.add_advertisements_batch([dict(cross_posted, title="Ява 638")])
+    db.mark_read_up_to(42, 2)
+
+    for price_range, one_per_cluster in [(None, False), ((250, 550), False), (None, True)]:
+        page, _ = db.get_unread_advertisements(
+            42, price_range=price_range, one_per_cluster=one_per_cluster
+        )
+        count = db.count_unread_advertisements(
+            42, price_range=price_range, one_per_cluster=one_per_cluster
+        )
+        assert count == len(page), (price_range, one_per_cluster, count, ids(page))
+
+
+def main():
+    """Главная функция тестирования"""
+    print("🧪 Проверка границ прочитанного")
+    print("=" * 50)
+
+    try:
+        test_read_marks()
+        test_new_user_starts_near_latest()
+        test_unread_count_matches_feed()
+    except AssertionError as e:
+        print(f"❌ Ошибка: {e}")
+        return 1
+
+    print("✅ Отметки прочитанного работают верно")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
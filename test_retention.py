@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Проверка архивирования и удаления устаревших объявлений
+"""
+
+import gzip
+import io
+import json
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from database import Database, ad_identity
+from retention import ArchiveWriter, run_retention, zstandard
+
+ADS = [
+    {
+        "site_name": "Куфар",
+        "title": title,
+        "price": "1 000 р.",
+        "link": f"https://example.com/ad/{number}",
+    }
+    for number, title in enumerate(
+        ["Jawa 350", "CZ 175", "Ява 638", "Чезет 472", "Jawa 634"], 1
+    )
+]
+
+
+def read_archive(path: str) -> list:
+    """Строки архива (файл из нескольких сжатых кадров)"""
+    with open(path, "rb") as archive:
+        if path.endswith(".gz"):
+            data = gzip.decompress(archive.read())
+        else:
+            reader = zstandard.ZstdDecompressor().stream_reader(
+                archive, read_across_frames=True
+            )
+            data = io.BufferedReader(reader).read()
+    return [json.loads(line) for line in data.decode("utf-8").splitlines()]
+
+
+def test_retention():
+    """Старые объявления архивируются и удаляются вместе со своими данными"""
+    settings = (config.RETENTION_BATCH_SIZE, config.RETENTION_PAUSE)
+    config.RETENTION_BATCH_SIZE, config.RETENTION_PAUSE = 2, 0
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "test.db"))
+        try:
+            db.add_advertisements_batch(ADS)
+            # История цены второго объявления уходит в архив вместе с ним
+            db.add_advertisements_batch([dict(ADS[1], price="900 р.")])
+            with db._connection() as conn:
+                conn.execute(
+                    "UPDATE advertisements SET created_at = '2020-01-0' || id || ' 12:00:00' "
+                    "WHERE id <= 3"
+                )
+            db.recompute_statistics()
+
+            writer = ArchiveWriter(os.path.join(tmp, "archive"))
+            stats = run_retention(db, days=30, writer=writer)
+            assert stats["archived"] == 3
+            assert stats["deleted"] == 3
+
+            conn = db._connection()
+            assert [row[0] for row in conn.execute("SELECT id FROM advertisements")] == [4, 5]
+            for table in ("ad_observations", "ad_simhash_bands"):
+                assert not conn.execute(
+                    f"SELECT 1 FROM {table} WHERE ad_id <= 3"
+                ).fetchall(), table
+            assert db.get_statistics()["total_ads"] == 2
+            assert [ad["id"] for ad in db.search_advertisements("jawa")] == [5]
+            assert db.state_cache.get(ad_identity(ADS[0])) is None
+
+            archived = {}
+            for day in ("2020-01-01", "2020-01-02", "2020-01-03"):
+                rows = read_archive(writer.path_for(day))
+                assert len(rows) == 1, day
+                archived[rows[0]["id"]] = rows[0]
+            assert archived[2]["price"] == "900 р."
+            assert [o["price_change"] for o in archived[2]["observations"]] == [-10000]
+            assert archived[1]["ident"] == ad_identity(ADS[0]).hex()
+
+            # Повторный запуск ничего не трогает
+            assert run_retention(db, days=30, writer=writer)["deleted"] == 0
+
+            # Удаленное объявление снова считается новым
+            assert len(db.add_advertisements_batch([ADS[0]])) == 1
+        finally:
+            db.close()
+            config.RETENTION_BATCH_SIZE, config.RETENTION_PAUSE = settings
+
+
+def main():
+    """Главная функция тестирования"""
+    print("🧪 Проверка очистки старых объявлений")
+    print("=" * 50)
+
+    try:
+        test_retention()
+    except AssertionError as e:
+        print(f"❌ Ошибка: {e}")
+        return 1
+
+    print("✅ Старые объявления архивируются и удаляются")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Проверка полнотекстового поиска объявлений
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from conftest import with_database
+from database import Database, normalize_search_text
+
+# Объявлений в проверке скорости: почти все содержат «jawa» или «cz»
+SCALE_ADS = 50_000
+SCALE_WORDS = (
+    "мотоцикл продам состояние хорошее гараж документы торг обмен запчасти "
+    "двигатель рама колеса новый старый ретро"
+).split()
+
+
+def make_ad(number: int, title: str, description: str = "") -> dict:
+    return {
+        "site_name": "Тест",
+        "title": title,
+        "description": description,
+        "link": f"https://example.com/ad/{number}",
+    }
+
+
+def titles(ads: list) -> list:
+    return [ad["title"] for ad in ads]
+
+
+@with_database
+def test_brand_spellings(db):
+    """«Ява», «Jawa» и «чезет» находятся любым написанием"""
+    db.add_advertisements_batch(
+        [make_ad(1, "Ява 638"), make_ad(2, "Jawa 350"), make_ad(3, "Чезет 175")]
+    )
+    assert sorted(titles(db.search_advertisements("ява"))) == ["Jawa 350", "Ява 638"]
+    assert titles(db.search_advertisements("CZ")) == ["Чезет 175"]
+    assert db.search_advertisements("урал") == []
+    assert db.search_advertisements("!!!") == []
+
+
+@with_database
+def test_title_match_ranks_first(db):
+    """Совпадение в заголовке важнее совпадения в описании"""
+    db.add_advertisements_batch(
+        [
+            make_ad(1, "Мотоцикл Jawa", "есть запчасти от чезет"),
+            make_ad(2, "Мотоцикл CZ 175", "в хорошем состоянии"),
+        ]
+    )
+    assert titles(db.search_advertisements("cz")) == ["Мотоцикл CZ 175", "Мотоцикл Jawa"]
+
+
+@with_database
+def test_title_change_is_searchable(db):
+    """После смены заголовка объявление ищется по новому"""
+    db.add_advertisements_batch([make_ad(1, "Jawa 350")])
+    db.add_advertisements_batch([make_ad(1, "Чезет 175")])
+    assert titles(db.search_advertisements("cz")) == ["Чезет 175"]
+    assert db.search_advertisements("350") == []
+
+
+@with_database
+def test_writes_without_search_function(db):
+    """Запись из соединения без функций Python не ломается"""
+    db.add_advertisements_batch([make_ad(1, "Jawa 350")])
+    conn = sqlite3.connect(db.db_path)
+    try:
+        conn.execute(
+            "UPDATE advertisements SET title = 'Jawa 638', description = 'x' WHERE id = 1"
+        )
+        conn.execute("DELETE FROM advertisements WHERE id = 1")
+        conn.commit()
+    finally:
+        conn.close()
+    assert db.search_advertisements("jawa") == []
+
+
+def fill_synthetic_ads(db: Database, count: int):
+    """Быстрое заполнение базы похожими объявлениями (минуя проверки вставки)"""
+    rng = random.Random(350)
+    rows = [
+        (
+            number,
+            f"{rng.choice(['Jawa', 'Ява', 'CZ', 'Чезет'])} {rng.choice(['350', '638', '175'])} "
+            + " ".join(rng.choices(SCALE_WORDS, k=3)),
+            " ".join(rng.choices(SCALE_WORDS, k=20)),
+            rng.randbytes(16),
+        )
+        for number in range(1, count + 1)
+    ]
+    with db._connection() as conn:
+        conn.executemany(
+            """
+            INSERT INTO advertisements (id, site_name, title, link, description, ident)
+            VALUES (?1, 'Тест', ?2, 'https://example.com/ad/' || ?1, ?3, ?4)
+        """,
+            rows,
+        )
+        conn.executemany(
+            "INSERT INTO advertisements_fts (rowid, title, description) VALUES (?, ?, ?)",
+            [
+                (number, normalize_search_text(title), normalize_search_text(description))
+                for number, title, description, _ in rows
+            ],
+        )
+
+
+def best_time(func, repeat: int = 3) -> float:
+    func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+@with_database
+def test_search_time_is_bounded(db):
+    """Частое слово ранжируется только среди свежих кандидатов.
+
+    bm25() по всем совпадениям растет с размером таблицы; поиск должен
+    быть намного быстрее такого ранжирования и укладываться в десятки мс.
+    """
+    fill_synthetic_ads(db, SCALE_ADS)
+    conn = db._connection()
+
+    for query in ("jawa", "cz", "запчасти"):
+        assert len(db.search_advertisements(query)) == 20
+        search_time = best_time(lambda: db.search_advertisements(query))
+        full_rank_time = best_time(
+            lambda: conn.execute(
+                """
+                SELECT rowid FROM advertisements_fts
+                WHERE advertisements_fts MATCH ?
+                ORDER BY bm25(advertisements_fts)
+                LIMIT ?
+            """,
+                (f'"{query}"', config.SEARCH_CANDIDATES),
+            ).fetchall()
+        )
+        assert search_time * 5 < full_rank_time, (query, search_time, full_rank_time)
+        assert search_time < 0.05, (query, search_time)
+
+
+def main():
+    """Главная функция тестирования"""
+    print("🧪 Проверка поиска объявлений")
+    print("=" * 50)
+
+    try:
+        test_brand_spellings()
+        test_title_match_ranks_first()
+        test_title_change_is_searchable()
+        test_writes_without_search_function()
+        test_search_time_is_bounded()
+    except AssertionError as e:
+        print(f"❌ Ошибка: {e}")
+        return 1
+
+    print("✅ Поиск работает верно")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())